@@ -0,0 +1,15 @@
+from __future__ import annotations
+
+import os
+import secrets
+
+from fastapi import Header, HTTPException
+
+
+def require_admin(x_admin_token: str | None = Header(default=None)) -> None:
+    # Admin routes are disabled entirely unless ML_ADMIN_TOKEN is configured.
+    expected = os.getenv("ML_ADMIN_TOKEN")
+    if not expected:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if x_admin_token is None or not secrets.compare_digest(x_admin_token, expected):
+        raise HTTPException(status_code=403, detail="Admin token required")
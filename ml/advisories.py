@@ -0,0 +1,268 @@
+from __future__ import annotations
+
+import argparse
+import time
+from typing import Mapping, NamedTuple, Sequence
+
+import numpy as np
+
+
+class Rule(NamedTuple):
+    # Fires when `field op threshold`. Within a group only the first firing
+    # rule (in table order) counts; groups are reported in priority order.
+    group: str
+    priority: int
+    field: str
+    op: str  # ">=" or "<="
+    threshold: float
+    # "{value}" is replaced with the field formatted to `precision` decimals
+    # (its absolute value when `absolute` is set).
+    template: str
+    precision: int = 0
+    absolute: bool = False
+
+
+RULES: tuple[Rule, ...] = (
+    Rule(
+        group="water",
+        priority=10,
+        field="waterShortageLevel",
+        op=">=",
+        threshold=70,
+        template="WATER EMERGENCY: With shortage risk near {value}%, enforce rationing, prioritize hospitals and vulnerable settlements, and deploy leak-fixing crews within 24 hours.",
+    ),
+    Rule(
+        group="water",
+        priority=10,
+        field="waterShortageLevel",
+        op=">=",
+        threshold=40,
+        template="WATER CONSERVATION: With shortage risk around {value}%, launch citywide conservation campaign, restrict non-essential use, and fast-track supply network inspections.",
+    ),
+    Rule(
+        group="traffic",
+        priority=20,
+        field="trafficCongestionLevel",
+        op=">=",
+        threshold=70,
+        template="TRAFFIC MANAGEMENT: With congestion near {value}%, activate dynamic signal plans, divert heavy vehicles outside peak hours, and deploy traffic marshals at hotspots.",
+    ),
+    Rule(
+        group="traffic",
+        priority=20,
+        field="trafficCongestionLevel",
+        op=">=",
+        threshold=40,
+        template="MOBILITY OPTIMIZATION: With congestion around {value}%, promote staggered office timings, increase bus frequency on congested corridors, and improve last-mile options.",
+    ),
+    Rule(
+        group="cleanup",
+        priority=30,
+        field="publicCleanupNeeded",
+        op=">=",
+        threshold=60,
+        template="CITY CLEANUP DRIVE: With cleanup risk near {value}%, schedule intensive cleanup and repair in high-risk wards, coordinate sanitation, roads, and drainage teams with a clear 7–14 day timeline.",
+    ),
+    Rule(
+        group="health",
+        priority=40,
+        field="healthStatus",
+        op="<=",
+        threshold=40,
+        template="PUBLIC HEALTH ALERT: With health risk index near {value}, scale up clinic capacity, issue air and water quality advisories, and mobilize outreach in high-risk neighborhoods.",
+    ),
+    Rule(
+        group="energy",
+        priority=50,
+        field="energyPriceChangePercent",
+        op=">=",
+        threshold=10,
+        template="ENERGY STABILITY PLAN: With tariffs rising about {value}%, announce time-of-day tariffs, incentivize large consumers to shift loads off-peak, and expand demand response programs.",
+        precision=1,
+    ),
+    Rule(
+        group="energy",
+        priority=50,
+        field="energyPriceChangePercent",
+        op="<=",
+        threshold=-5,
+        template="ENERGY STABILITY PLAN: With tariffs falling about {value}%, lock in lower bulk procurements while protecting low-income households from volatility.",
+        precision=1,
+        absolute=True,
+    ),
+    Rule(
+        group="food",
+        priority=60,
+        field="foodPriceChangePercent",
+        op=">=",
+        threshold=8,
+        template="FOOD PRICE CONTAINMENT: With staple prices rising about {value}%, release buffer stocks, support wholesale markets, and expand targeted subsidies for low-income households.",
+        precision=1,
+    ),
+    Rule(
+        group="food",
+        priority=60,
+        field="foodPriceChangePercent",
+        op="<=",
+        threshold=-5,
+        template="FOOD MARKET STABILIZATION: With prices dropping about {value}%, stabilize farmer incomes through procurement and storage while keeping retail prices predictable.",
+        precision=1,
+        absolute=True,
+    ),
+)
+
+# Served when no rule fires.
+DEFAULT_ITEMS = (
+    "COORDINATION CELL: Maintain an integrated command center linking water, transport, health, and disaster management for rapid decisions.",
+    "DATA-DRIVEN MONITORING: Track key indicators daily and trigger predefined playbooks when thresholds are crossed.",
+    "COMMUNITY OUTREACH: Use multilingual alerts and ward-level meetings to keep residents informed and engaged in resilience actions.",
+)
+MAX_ITEMS = 3
+# Rendered lines are cached per rule and exact value; model outputs repeat
+# heavily (classifier levels, sensitivity plateaus), so most lines are
+# served without formatting. A rule's cache is dropped at this size.
+CACHE_SIZE = 8192
+# Below this many rows the vector setup costs more than scoring row by row.
+MIN_VECTOR_ROWS = 16
+
+
+class _Template(NamedTuple):
+    # A rule's template split around "{value}" once, at compile time.
+    prefix: str
+    suffix: str
+    spec: str
+    absolute: bool
+
+
+class RuleEngine:
+    def __init__(
+        self, rules: Sequence[Rule] = RULES, defaults: Sequence[str] = DEFAULT_ITEMS, max_items: int = MAX_ITEMS
+    ) -> None:
+        for rule in rules:
+            if rule.op not in (">=", "<="):
+                raise ValueError(f"Rule {rule.group}: unsupported operator {rule.op!r}")
+            if rule.template.count("{value}") != 1:
+                raise ValueError(f"Rule {rule.group}: template needs exactly one {{value}}")
+        # Stable sort keeps table order inside a group, which decides the
+        # first-match precedence.
+        ordered = sorted(rules, key=lambda rule: rule.priority)
+        groups = [rule.group for rule in ordered]
+        for index, group in enumerate(groups):
+            if group in groups[:index] and groups[index - 1] != group:
+                raise ValueError(f"Rules of group {group} must share one priority")
+        self.rules = tuple(ordered)
+        self.max_items = max_items
+        self.default_text = "\n".join(f"- {text}" for text in defaults[:max_items])
+        self.fields = tuple(dict.fromkeys(rule.field for rule in self.rules))
+        self._templates = []
+        for rule in self.rules:
+            prefix, suffix = rule.template.split("{value}")
+            self._templates.append(_Template("- " + prefix, suffix, f".{rule.precision}f", rule.absolute))
+        # Scalar form: (index, field, is ">=", threshold) per rule, by group.
+        self._groups: list[list[tuple[int, str, bool, float]]] = []
+        for index, rule in enumerate(self.rules):
+            if index == 0 or groups[index - 1] != rule.group:
+                self._groups.append([])
+            self._groups[-1].append((index, rule.field, rule.op == ">=", rule.threshold))
+        # Vectorised form: one column per rule, plus a (rules, rules) matrix
+        # marking the earlier rules of the same group that shadow each one.
+        self._columns = np.array([self.fields.index(rule.field) for rule in self.rules])
+        self._thresholds = np.array([rule.threshold for rule in self.rules], dtype=np.float64)
+        self._ge = np.array([rule.op == ">=" for rule in self.rules])
+        n = len(self.rules)
+        self._shadows = np.array(
+            [[k < j and groups[k] == groups[j] for j in range(n)] for k in range(n)], dtype=np.int64
+        )
+        self._caches: list[dict[float, str]] = [{} for _ in self.rules]
+
+    def _render(self, index: int, value: float) -> str:
+        template = self._templates[index]
+        value = abs(value) if template.absolute else value
+        return template.prefix + format(value, template.spec) + template.suffix
+
+    def _line(self, index: int, value: float) -> str:
+        cache = self._caches[index]
+        line = cache.get(value)
+        if line is None:
+            line = self._render(index, value)
+            # 0.0 and -0.0 share a dict key but format differently, so zero
+            # is never cached.
+            if value:
+                if len(cache) >= CACHE_SIZE:
+                    cache.clear()
+                cache[value] = line
+        return line
+
+    def recommend(self, outputs: Mapping[str, float]) -> str:
+        # One row, without numpy: the LLM fallback path.
+        lines: list[str] = []
+        for group in self._groups:
+            for index, field, ge, threshold in group:
+                value = outputs[field]
+                if value >= threshold if ge else value <= threshold:
+                    lines.append(self._line(index, value))
+                    break
+            else:
+                continue
+            if len(lines) == self.max_items:
+                break
+        return "\n".join(lines) if lines else self.default_text
+
+    def recommend_batch(self, outputs: Mapping[str, Sequence[float] | np.ndarray]) -> list[str]:
+        # ModelOutputs field -> values for every row; one text per row,
+        # identical to recommend() on that row.
+        X = np.column_stack([np.asarray(outputs[field], dtype=np.float64) for field in self.fields])
+        if len(X) < MIN_VECTOR_ROWS:
+            return [self.recommend(dict(zip(self.fields, row))) for row in X.tolist()]
+        values = X[:, self._columns]
+        hits = np.where(self._ge, values >= self._thresholds, values <= self._thresholds)
+        selected = hits & ((hits.astype(np.int64) @ self._shadows) == 0)
+        selected &= np.cumsum(selected, axis=1) <= self.max_items
+        texts = [self.default_text] * len(X)
+        rows, rules = np.nonzero(selected)
+        if not len(rows):
+            return texts
+        caches, line = self._caches, self._line
+        lines = [
+            caches[index].get(value) or line(index, value)
+            for index, value in zip(rules.tolist(), values[rows, rules].tolist())
+        ]
+        # np.nonzero is row-major, so each row's lines are consecutive and
+        # already in priority order.
+        starts = np.flatnonzero(np.r_[True, rows[1:] != rows[:-1]])
+        ends = np.r_[starts[1:], len(rows)]
+        join = "\n".join
+        for row, start, end in zip(rows[starts].tolist(), starts.tolist(), ends.tolist()):
+            texts[row] = join(lines[start:end])
+        return texts
+
+
+ENGINE = RuleEngine()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time the rule-based recommendations on random model outputs.")
+    parser.add_argument("--rows", type=int, default=100000)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    outputs = {
+        "waterShortageLevel": rng.integers(0, 101, args.rows).astype(float),
+        "trafficCongestionLevel": np.round(rng.uniform(0, 100, args.rows), 2),
+        "foodPriceChangePercent": np.round(rng.uniform(-10, 15, args.rows), 2),
+        "energyPriceChangePercent": np.round(rng.uniform(-10, 20, args.rows), 2),
+        "publicCleanupNeeded": rng.choice([0.0, 1.0, 2.0, 3.0, 66.0], args.rows),
+        "healthStatus": rng.choice([0.0, 33.0, 66.0, 100.0], args.rows),
+    }
+    rows = [{field: float(values[i]) for field, values in outputs.items()} for i in range(args.rows)]
+    start = time.perf_counter()
+    single = [ENGINE.recommend(row) for row in rows]
+    single_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    batch = ENGINE.recommend_batch(outputs)
+    batch_seconds = time.perf_counter() - start
+    assert single == batch
+    print(
+        f"{args.rows:,} rows: per-row {single_seconds / args.rows * 1e6:.2f} us, "
+        f"batch {batch_seconds / args.rows * 1e6:.2f} us/row"
+    )
@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import json
+import re
+from datetime import datetime
+from typing import Any, Iterable, Sequence
+
+import numpy as np
+
+from ml.inference import OUTPUT_FIELDS
+from ml.uncertainty import StreamingQuantiles
+
+# Bucket width in seconds; a rollup row exists per (granularity, bucket, output).
+GRANULARITIES = {"hour": 3600, "day": 86400}
+# Windows up to this long are served from hourly buckets by default.
+HOURLY_WINDOW_LIMIT = 7 * 86400
+MAX_WINDOW_BUCKETS = 2000
+SKETCH_CENTROIDS = 128
+
+OUTPUT_NAMES = tuple(OUTPUT_FIELDS.values())
+_WINDOW_UNITS = {"m": 60, "h": 3600, "d": 86400, "w": 7 * 86400}
+
+# (granularity, bucket_start, output)
+RollupKey = tuple[str, int, str]
+
+
+def parse_window(text: str) -> int:
+    match = re.fullmatch(r"(\d+)([mhdw])", text.strip())
+    if match is None or int(match.group(1)) == 0:
+        raise ValueError(f"window must look like 90m, 24h, 7d or 4w, got {text!r}")
+    return int(match.group(1)) * _WINDOW_UNITS[match.group(2)]
+
+
+def bucket_start(timestamp: float, granularity: str) -> int:
+    width = GRANULARITIES[granularity]
+    return int(timestamp // width) * width
+
+
+def bucket_rows(rows: Iterable[Sequence[str]]) -> dict[RollupKey, np.ndarray]:
+    # Groups the six outputs of logged /predict-all and /predict-batch rows
+    # (created_at ISO timestamp, inputs JSON, outputs JSON) by bucket for
+    # every granularity.
+    # Rows whose outputs are not a ModelOutputs are skipped.
+    grouped: dict[RollupKey, list[float]] = {}
+    for created_at, _, outputs_json in rows:
+        outputs = json.loads(outputs_json)
+        if not isinstance(outputs, dict) or outputs.keys() != set(OUTPUT_NAMES):
+            continue
+        timestamp = datetime.fromisoformat(created_at).timestamp()
+        for granularity in GRANULARITIES:
+            bucket = bucket_start(timestamp, granularity)
+            for output in OUTPUT_NAMES:
+                grouped.setdefault((granularity, bucket, output), []).append(float(outputs[output]))
+    return {key: np.asarray(values) for key, values in grouped.items()}
+
+
+def load_sketch(state: str | dict[str, Any] | None) -> StreamingQuantiles:
+    sketch = StreamingQuantiles(SKETCH_CENTROIDS)
+    if not state:
+        return sketch
+    data = json.loads(state) if isinstance(state, str) else state
+    sketch.count = data["count"]
+    sketch.total = data["sum"]
+    sketch.total_sq = data["sumSq"]
+    sketch.low = data["min"]
+    sketch.high = data["max"]
+    sketch.means = np.asarray(data["means"], dtype=np.float64)
+    sketch.weights = np.asarray(data["weights"], dtype=np.float64)
+    return sketch
+
+
+def dump_sketch(sketch: StreamingQuantiles) -> str:
+    return json.dumps(
+        {
+            "count": sketch.count,
+            "sum": sketch.total,
+            "sumSq": sketch.total_sq,
+            "min": sketch.low,
+            "max": sketch.high,
+            "means": sketch.means.tolist(),
+            "weights": sketch.weights.tolist(),
+        }
+    )
+
+
+def merge_state(state: str | dict[str, Any] | None, values: np.ndarray) -> str:
+    sketch = load_sketch(state)
+    sketch.update(values)
+    return dump_sketch(sketch)
+
+
+def update_rollups(cursor: Any, rows: list[Sequence[str]], param: str, lock: str = "") -> None:
+    # Folds a batch into prediction_output_rollups inside the caller's
+    # transaction. The empty row is created first so the SELECT can lock it
+    # (lock=" FOR UPDATE" on Postgres) against concurrent writers. Keys are
+    # visited in sorted order so every writer takes the row locks in the same
+    # order; batch order interleaves hour and day buckets, and two workers
+    # flushing across an hour boundary could otherwise deadlock.
+    for key, values in sorted(bucket_rows(rows).items()):
+        where = f"granularity = {param} AND bucket_start = {param} AND output = {param}"
+        cursor.execute(
+            "INSERT INTO prediction_output_rollups (granularity, bucket_start, output) "
+            f"VALUES ({param}, {param}, {param}) ON CONFLICT DO NOTHING",
+            key,
+        )
+        cursor.execute(f"SELECT state FROM prediction_output_rollups WHERE {where}{lock}", key)
+        state = merge_state(cursor.fetchone()[0], values)
+        cursor.execute(f"UPDATE prediction_output_rollups SET state = {param} WHERE {where}", (state, *key))
+
+
+def read_rollups(cursor: Any, granularity: str, start: int, end: int, param: str) -> list[tuple[int, str, Any]]:
+    # Primary-key range scan: one row per output per bucket in [start, end].
+    cursor.execute(
+        "SELECT bucket_start, output, state FROM prediction_output_rollups "
+        f"WHERE granularity = {param} AND bucket_start BETWEEN {param} AND {param} AND state IS NOT NULL "
+        "ORDER BY bucket_start",
+        (granularity, start, end),
+    )
+    return cursor.fetchall()
+
+
+def _summary(sketch: StreamingQuantiles) -> dict[str, float]:
+    return {
+        "count": sketch.count,
+        "min": sketch.low,
+        "mean": sketch.mean(),
+        "max": sketch.high,
+        "p95": float(sketch.quantiles([0.95])[0]),
+    }
+
+
+def summarize_rollups(rows: list[tuple[int, str, Any]]) -> tuple[list[dict[str, Any]], dict[str, dict[str, float]]]:
+    # Per-bucket summaries plus the whole window, merged from the bucket sketches.
+    buckets: dict[int, dict[str, dict[str, float]]] = {}
+    totals = {output: StreamingQuantiles(SKETCH_CENTROIDS) for output in OUTPUT_NAMES}
+    for start, output, state in rows:
+        sketch = load_sketch(state)
+        buckets.setdefault(int(start), {})[output] = _summary(sketch)
+        totals[output].merge(sketch)
+    series = [{"bucketStart": start, "outputs": outputs} for start, outputs in sorted(buckets.items())]
+    return series, {output: _summary(sketch) for output, sketch in totals.items() if sketch.count}
@@ -1,17 +1,52 @@
 from __future__ import annotations
 
+import atexit
 import os
-from typing import Literal
-
-import joblib
-import numpy as np
-import pandas as pd
-from fastapi import FastAPI
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Literal
+
+from fastapi import Depends, FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-import re
+from fastapi.responses import JSONResponse, Response
+from pydantic import BaseModel, Field, ValidationError
+import numpy as np
 
-from ml.weather_data_pipeline import fetch_openweather_sample
+from ml import analytics
+from ml.advisories import ENGINE as ADVISORIES
+from ml.batch_codec import ARROW_CONTENT_TYPE, BINARY_CONTENT_TYPES, NPY_CONTENT_TYPE, decode_features, encode_outputs
+from ml.drift import DriftMonitor
+from ml.executors import Overloaded, WorkloadExecutor
+from ml.inference import (
+    FALLBACK_OUTPUTS,
+    FIELD_COLUMNS,
+    MODEL_NAMES,
+    OUTPUT_FIELDS,
+    LoadedModel,
+    city_feature_row,
+    feature_matrix,
+    predict_batch,
+    predict_outputs,
+    required_columns,
+)
+from ml.logging_setup import get_logger
+from ml.llm_output import GENERATIONS, TOKENS, OutputValidator, StreamStop, validate_output
+from ml.lookup_table import LookupTable, load_tables, lookup
+from ml.optimizer import MAX_EVALUATIONS, MAX_TOP_K, Control, Objective, optimize
+from ml.prediction_log import PredictionLog
+from ml.metrics import CACHE_REQUESTS, CONTENT_TYPE, FALLBACKS, REGISTRY, STAGE_SECONDS, Gauge
+from ml.model_status import LatencyWindow, ModelStatus, load_all, required_models
+from ml.profiler import ProfilingMiddleware
+from ml.profiler import router as profiler_router
+from ml.result_cache import CacheBusy, SharedResultCache
+from ml.sensitivity import MAX_GRID_POINTS, grid_values, is_binary_column, partial_dependence
+from ml.simulation import STATE_COLUMNS, Event, SimulationConfig, simulate, summarize
+from ml.uncertainty import MAX_SAMPLES, bernoulli_sampler, monte_carlo, normal_sampler, uniform_sampler
+
+logger = get_logger("ml.api_server")
 
 
 class TransportationIn(BaseModel):
@@ -72,6 +107,219 @@ class ModelOutputs(BaseModel):
     healthStatus: float
 
 
+class SensitivityField(BaseModel):
+    field: str
+    low: float
+    high: float
+    steps: int = 20
+
+
+class SensitivityIn(BaseModel):
+    city: CityInput
+    fields: list[SensitivityField]
+    # Attach the rule-based recommendations for the base point and every
+    # grid point.
+    advisories: bool = False
+
+
+class SensitivityCurve(BaseModel):
+    field: str
+    values: list[float]
+    outputs: dict[str, list[float]]
+    recommendations: list[str] | None = None
+
+
+class SensitivityOut(BaseModel):
+    base: ModelOutputs
+    curves: list[SensitivityCurve]
+    baseRecommendations: str | None = None
+
+
+class FieldDistribution(BaseModel):
+    field: str
+    distribution: Literal["normal", "uniform", "bernoulli"] = "normal"
+    # normal: mean defaults to the city's value, samples are clipped to
+    # low/high when given. uniform: low/high. bernoulli: mean is P(1).
+    mean: float | None = None
+    std: float = 0.0
+    low: float | None = None
+    high: float | None = None
+
+
+class DistributionIn(BaseModel):
+    city: CityInput
+    fields: list[FieldDistribution]
+    samples: int = 10000
+    quantiles: list[float] = [0.05, 0.25, 0.5, 0.75, 0.95]
+    seed: int | None = None
+    treeVariance: bool = False
+
+
+class OutputDistribution(BaseModel):
+    mean: float
+    std: float
+    quantiles: dict[str, float]
+    treeVariance: float | None = None
+
+
+class DistributionOut(BaseModel):
+    samples: int
+    outputs: dict[str, OutputDistribution]
+
+
+class SimulationEvent(BaseModel):
+    field: str
+    startDay: int
+    days: int = 1
+    value: float | None = None
+    delta: float | None = None
+
+
+class SimulationIn(BaseModel):
+    city: CityInput
+    scenarios: int = 100
+    days: int = 30
+    seed: int | None = None
+    events: list[SimulationEvent] = []
+
+
+class SimulationOut(BaseModel):
+    days: int
+    scenarios: int
+    # output / state name -> {"mean": [...], "p10": [...], "p50": [...], "p90": [...]} per day
+    outputs: dict[str, dict[str, list[float]]]
+    state: dict[str, dict[str, list[float]]]
+
+
+class ControlField(BaseModel):
+    field: str
+    low: float
+    high: float
+    costPerUnit: float = 0.0
+
+
+class OptimizationObjective(BaseModel):
+    output: str
+    weight: float = 1.0
+    threshold: float | None = None
+
+
+class OptimizeIn(BaseModel):
+    city: CityInput
+    controls: list[ControlField]
+    objectives: list[OptimizationObjective]
+    budget: float | None = None
+    population: int = 256
+    generations: int = 30
+    maxEvaluations: int = 20000
+    patience: int = 5
+    timeLimitSeconds: float | None = 5.0
+    topK: int = 5
+    seed: int | None = None
+
+
+class Intervention(BaseModel):
+    changes: dict[str, float]
+    cost: float
+    score: float
+    outputs: ModelOutputs
+
+
+class OptimizeOut(BaseModel):
+    best: list[Intervention]
+    evaluations: int
+    generations: int
+    evaluationsPerSecond: float
+    stoppedBy: str
+
+
+class OutputRollup(BaseModel):
+    count: int
+    min: float
+    mean: float
+    max: float
+    p95: float
+
+
+class AnalyticsBucket(BaseModel):
+    bucketStart: int  # Unix seconds, UTC
+    outputs: dict[str, OutputRollup]
+
+
+class AnalyticsOut(BaseModel):
+    window: int  # seconds
+    granularity: str
+    buckets: list[AnalyticsBucket]
+    totals: dict[str, OutputRollup]
+
+
+MAX_BATCH_ROWS = 200000
+# Body cap checked before a /predict-batch body is parsed: a pretty-printed
+# CityInput is about 1 KB, and a binary row is far smaller.
+MAX_BATCH_ROW_BYTES = 2048
+MAX_BATCH_BYTES = MAX_BATCH_ROWS * MAX_BATCH_ROW_BYTES
+
+
+class PredictBatchIn(BaseModel):
+    cities: list[CityInput] = Field(max_length=MAX_BATCH_ROWS)
+    advisories: bool = False
+
+
+class PredictBatchOut(BaseModel):
+    outputs: list[ModelOutputs]
+    recommendations: list[str] | None = None
+
+
+class HealthOut(BaseModel):
+    status: Literal["ok"]
+    pid: int
+    modelsLoaded: int
+    modelsTotal: int
+
+
+class ReadyOut(BaseModel):
+    status: Literal["ready", "loading", "degraded", "failed"]
+    missing: list[str]
+    error: str | None = None
+
+
+class ModelLatency(BaseModel):
+    count: int
+    window: int
+    p50Ms: float | None = None
+    p95Ms: float | None = None
+    p99Ms: float | None = None
+
+
+class ModelStatusOut(BaseModel):
+    name: str
+    required: bool
+    state: Literal["loading", "loaded", "missing", "failed"]
+    backend: str | None = None
+    path: str | None = None
+    version: str | None = None
+    modifiedAt: str | None = None
+    loadSeconds: float | None = None
+    memoryBytes: int | None = None
+    lookupTable: bool = False
+    latency: ModelLatency
+    error: str | None = None
+
+
+class LlmStatusOut(BaseModel):
+    modelId: str
+    state: Literal["not_loaded", "loaded", "failed"]
+    error: str | None = None
+
+
+class ModelsOut(BaseModel):
+    pid: int
+    ready: bool
+    loadSeconds: float | None = None
+    models: list[ModelStatusOut]
+    llm: LlmStatusOut
+
+
 class LlmRecommendationsIn(BaseModel):
     waterShortageLevel: float
     trafficCongestionLevel: float
@@ -85,7 +333,70 @@ class LlmRecommendationsOut(BaseModel):
     recommendations: str
 
 
-app = FastAPI()
+STARTUP_SECONDS = REGISTRY.register(
+    Gauge("ml_startup_seconds", "Seconds spent in each startup phase of this process.", ("phase",))
+)
+MODEL_LOADED = REGISTRY.register(
+    Gauge("ml_model_loaded", "1 when the model is loaded in this process, 0 when it serves fallbacks.", ("model",))
+)
+
+# Models and lookup tables load in the lifespan hook on a background thread,
+# so the port binds straight away: /healthz answers during the load, while
+# /readyz and the model routes return 503 until it has finished.
+models: dict[str, LoadedModel | None] = {}
+# Dense output tables for the discrete-input classifiers (python -m
+# ml.lookup_table); inputs off the table's lattice run the model.
+lookup_tables: dict[str, LookupTable] = {}
+model_status: dict[str, ModelStatus] = {}
+model_latency = {name: LatencyWindow() for name in MODEL_NAMES}
+REQUIRED_MODELS = required_models()
+models_ready = threading.Event()
+model_load_error: str | None = None
+models_load_seconds: float | None = None
+_model_load_lock = threading.Lock()
+MODEL_LOAD_THREADS = int(os.getenv("ML_MODEL_LOAD_THREADS", str(min(len(MODEL_NAMES), os.cpu_count() or 1))))
+
+
+def load_serving_state() -> None:
+    # Idempotent. ml.serve calls it in the pre-fork parent, so forked workers
+    # share the loaded forests and start ready.
+    global model_load_error, models_load_seconds
+    with _model_load_lock:
+        if models_ready.is_set():
+            return
+        start = time.perf_counter()
+        try:
+            for name, (model, status) in load_all(MODEL_LOAD_THREADS).items():
+                models[name] = model
+                model_status[name] = status
+                MODEL_LOADED.set(1.0 if model is not None else 0.0, model=name)
+                if model is None:
+                    logger.warning("Model %s not loaded (%s); serving fallback outputs.", name, status.error)
+            lookup_tables.update(load_tables())
+        except Exception as exc:
+            model_load_error = f"{type(exc).__name__}: {exc}"
+            logger.exception("Model loading failed; the server stays unready.")
+            return
+        seconds = models_load_seconds = time.perf_counter() - start
+        STARTUP_SECONDS.set(seconds, phase="models")
+        models_ready.set()
+        loaded = sum(model is not None for model in models.values())
+        logger.info("Loaded %d/%d models in %.2fs.", loaded, len(models), seconds)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    if not models_ready.is_set():
+        threading.Thread(target=load_serving_state, name="model-load", daemon=True).start()
+    yield
+
+
+async def require_models() -> None:
+    if not models_ready.is_set():
+        raise HTTPException(status_code=503, detail="Models are still loading", headers={"Retry-After": "1"})
+
+
+app = FastAPI(lifespan=lifespan)
 
 origins = [
     "http://localhost:8080",
@@ -100,21 +411,102 @@ app.add_middleware(
     allow_credentials=False,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Input-Warnings"],
 )
+app.add_middleware(ProfilingMiddleware)
+app.include_router(profiler_router)
+
+# Cheap model scoring and slow LLM generation get separate, explicitly sized
+# executors so a burst on one cannot starve the other. Requests beyond
+# workers + queue are rejected with 429 and a Retry-After hint.
+predict_executor = WorkloadExecutor(
+    "predict",
+    max_workers=int(os.getenv("ML_PREDICT_WORKERS", "4")),
+    max_queue=int(os.getenv("ML_PREDICT_QUEUE", "64")),
+)
+llm_executor = WorkloadExecutor(
+    "llm",
+    max_workers=int(os.getenv("ML_LLM_WORKERS", "1")),
+    max_queue=int(os.getenv("ML_LLM_QUEUE", "8")),
+)
+
+
+@app.exception_handler(Overloaded)
+async def overloaded_handler(request: Request, exc: Overloaded) -> JSONResponse:
+    return JSONResponse(
+        status_code=exc.status_code,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
 
 
-def _load_model(path: str):
-    if not os.path.exists(path):
-        return None
-    return joblib.load(path)
+# Shared across pre-forked workers (see ml/serve.py); identical /predict-all
+# inputs are answered from the cache without touching the predict executor.
+# Off unless ML_RESULT_CACHE_SLOTS is set or the app runs under ml.serve.
+result_cache = SharedResultCache.from_env()
+if result_cache is not None:
+    result_cache.register_metrics()
 
+# Live /predict-all inputs against the training profiles stored next to the
+# model artifacts (python -m ml.drift); drift is exported through /metrics.
+drift_monitor = DriftMonitor.from_env()
+if drift_monitor is not None:
+    drift_monitor.register_metrics()
 
-water_model = _load_model("ml/models/water_shortage_random_forest.joblib")
-traffic_model = _load_model("ml/models/traffic_random_forest.joblib")
-food_model = _load_model("ml/models/food_price_random_forest.joblib")
-energy_model = _load_model("ml/models/energy_price_random_forest.joblib")
-public_model = _load_model("ml/models/public_services_random_forest.joblib")
-health_model = _load_model("ml/models/health_random_forest.joblib")
+# Server-side predictions are written behind to prediction_logs; disabled
+# unless ML_PREDICTION_LOG_URL is set.
+prediction_log = PredictionLog.from_env()
+if prediction_log is not None:
+    atexit.register(prediction_log.close)
+
+
+def _log_prediction(inputs: BaseModel, outputs: BaseModel) -> None:
+    if prediction_log is not None:
+        prediction_log.record(inputs, outputs)
+
+
+# Fraction of /predict-batch rows written to the prediction log, one record
+# per sampled row; lower it when large batches would crowd out the queue.
+BATCH_LOG_SAMPLE = float(os.getenv("ML_PREDICTION_LOG_BATCH_SAMPLE", "1.0"))
+
+
+def _batch_rows_to_log(n_rows: int) -> list[int]:
+    if prediction_log is None or BATCH_LOG_SAMPLE <= 0.0:
+        return []
+    if BATCH_LOG_SAMPLE >= 1.0:
+        return list(range(n_rows))
+    return [row for row in range(n_rows) if random.random() < BATCH_LOG_SAMPLE]
+
+# "sequential" evaluates the six models one after another in the request
+# thread; "fanout" dispatches them to a shared bounded thread pool (forest
+# predict releases the GIL during tree traversal).
+PREDICT_MODE = os.getenv("ML_PREDICT_MODE", "sequential")
+PREDICT_THREADS = int(os.getenv("ML_PREDICT_THREADS", str(len(MODEL_NAMES))))
+_predict_pool: ThreadPoolExecutor | None = None
+
+
+def _get_predict_pool() -> ThreadPoolExecutor:
+    global _predict_pool
+    if _predict_pool is None:
+        _predict_pool = ThreadPoolExecutor(max_workers=PREDICT_THREADS, thread_name_prefix="predict")
+    return _predict_pool
+
+
+def _predict_one(name: str, row: dict[str, float]) -> float:
+    model = models.get(name)
+    if model is None:
+        FALLBACKS.inc(kind="model_missing", source=name)
+        return FALLBACK_OUTPUTS[name]
+    table = lookup_tables.get(name)
+    if table is not None:
+        value = lookup(table, row)
+        if value is not None:
+            return value
+    start = time.perf_counter()
+    with STAGE_SECONDS.time(stage=f"predict_{name}"):
+        value = float(predict_outputs(model, feature_matrix(model.feature_columns, row))[0])
+    model_latency[name].observe(time.perf_counter() - start)
+    return value
 
 
 class WeatherOut(BaseModel):
@@ -144,10 +536,16 @@ def current_weather() -> WeatherOut:
     )
 
     if not api_key:
+        FALLBACKS.inc(kind="weather_default", source="no_api_key")
         return fallback
 
+    # Imported here: the pipeline pulls in pandas and requests, which nothing
+    # else on the serving path needs.
+    from ml.weather_data_pipeline import fetch_openweather_sample
+
     try:
-        temperature, humidity, wind_speed, rainfall, aqi = fetch_openweather_sample(api_key, city)
+        with STAGE_SECONDS.time(stage="openweather_fetch"):
+            temperature, humidity, wind_speed, rainfall, aqi = fetch_openweather_sample(api_key, city)
         rainfall_last_12 = [50.0] * 12
         recent_storm_or_flood = rainfall > 40.0
         return WeatherOut(
@@ -160,172 +558,390 @@ def current_weather() -> WeatherOut:
             aqi=aqi,
         )
     except Exception:
+        logger.debug("OpenWeather fetch failed; serving fallback weather.", exc_info=True)
+        FALLBACKS.inc(kind="weather_default", source="fetch_error")
         return fallback
 
 
-@app.post("/predict-all", response_model=ModelOutputs)
-def predict_all(city: CityInput) -> ModelOutputs:
-    w = city.weather
-    t = city.transportation
-    a = city.agriculture
-    e = city.energy
-    p = city.publicServices
-
-    rainfall_last_12 = float(sum(w.rainfallLast12Months))
-    recent_storm_flag = 1 if w.recentStormOrFlood else 0
-
-    congested_routes = set(t.busRoutesCongested)
-    congested_west = 1 if "west" in congested_routes else 0
-    congested_south = 1 if "south" in congested_routes else 0
-    congested_east = 1 if "east" in congested_routes else 0
-    congested_north = 1 if "north" in congested_routes else 0
-    congested_central = 1 if "central" in congested_routes else 0
-
-    water_features = pd.DataFrame(
-        [
-            {
-                "rainfall_last_12_months_mm": rainfall_last_12,
-                "rainfall_mm": w.currentRainfall,
-                "recent_storm_or_flood": recent_storm_flag,
-                "water_supply_level": p.waterSupplyLevel,
-            }
-        ]
-    )
-    if water_model is not None:
-        water_shortage_level = float(water_model.predict(water_features)[0])
-    else:
-        water_shortage_level = 15.0
-
-    traffic_features = pd.DataFrame(
-        [
-            {
-                "wind_speed_kmh": w.windSpeed,
-                "rainfall_mm": w.currentRainfall,
-                "recent_storm_or_flood": recent_storm_flag,
-                "aqi": w.aqi,
-                "buses_operating": t.busesOperating,
-                "avg_vehicles_per_hour": t.avgVehiclesPerHour,
-                "peak_hour_multiplier": t.peakHourMultiplier,
-                "congested_west": congested_west,
-                "congested_south": congested_south,
-                "congested_east": congested_east,
-                "congested_north": congested_north,
-                "congested_central": congested_central,
-                "roads_needing_repair": p.roadsNeedingRepair,
-            }
-        ]
-    )
-    if traffic_model is not None:
-        traffic_congestion_level = float(traffic_model.predict(traffic_features)[0])
-    else:
-        traffic_congestion_level = 40.0
-
-    food_features = pd.DataFrame(
-        [
-            {
-                "rainfall_mm": w.currentRainfall,
-                "rainfall_last_12_months_mm": rainfall_last_12,
-                "crop_yield_last_year": a.cropYieldLastYear,
-                "current_stock_level": a.currentStockLevel,
-                "supply_chain_efficiency": a.supplyChainEfficiency,
-                "import_dependency": a.importDependency,
-                "recent_storm_or_flood": recent_storm_flag,
-            }
-        ]
-    )
-    if food_model is not None:
-        food_price_change_percent = float(food_model.predict(food_features)[0])
-    else:
-        food_price_change_percent = 0.0
-
-    energy_features = pd.DataFrame(
-        [
-            {
-                "current_usage_mw": e.currentUsageMW,
-                "avg_usage_last_year": e.avgUsageLastYear,
-                "peak_demand_mw": e.peakDemandMW,
-                "grid_stability": e.gridStability,
-                "renewable_percentage": e.renewablePercentage,
-                "recent_storm_or_flood": recent_storm_flag,
-            }
-        ]
-    )
-    if energy_model is not None:
-        energy_price_change_percent = float(energy_model.predict(energy_features)[0])
+@app.post("/predict-all", response_model=ModelOutputs, dependencies=[Depends(require_models)])
+async def predict_all(city: CityInput, response: Response) -> ModelOutputs:
+    if drift_monitor is not None:
+        # Monitoring must never fail the prediction itself.
+        try:
+            flags = drift_monitor.observe(city_feature_row(city))
+        except Exception:
+            logger.warning("Drift monitor failed to observe a request.", exc_info=True)
+            flags = []
+        if flags:
+            response.headers["X-Input-Warnings"] = ",".join(f"{column}={flag}" for column, flag in flags)
+    outputs = await _predict_all_cached(city)
+    _log_prediction(city, outputs)
+    return outputs
+
+
+async def _predict_all_cached(city: CityInput) -> ModelOutputs:
+    if result_cache is None:
+        return await predict_executor.run(_predict_all, city)
+    key = city.model_dump_json().encode()
+    try:
+        cached = result_cache.get("predict-all", key)
+    except CacheBusy:
+        # Counted apart from misses so a wedged lock shows up on /metrics.
+        CACHE_REQUESTS.inc(cache="predict_all", result="lock_busy")
     else:
-        energy_price_change_percent = 0.0
-
-    public_features = pd.DataFrame(
-        [
-            {
-                "roads_needing_repair": p.roadsNeedingRepair,
-                "water_supply_level": p.waterSupplyLevel,
-                "sewer_system_health": p.sewerSystemHealth,
-                "emergency_response_time": p.emergencyResponseTime,
-                "pending_maintenance_tasks": p.pendingMaintenanceTasks,
-                "recent_storm_or_flood": recent_storm_flag,
-            }
-        ]
-    )
-    public_feature_order = [
-        "roads_needing_repair",
-        "water_supply_level",
-        "sewer_system_health",
-        "emergency_response_time",
-        "pending_maintenance_tasks",
-        "recent_storm_or_flood",
-    ]
-    public_features = public_features[public_feature_order]
-    if public_model is not None:
-        public_proba = public_model.predict_proba(public_features)[0]
-        classes = list(public_model.classes_)
-        if 1 in classes:
-            idx = classes.index(1)
-            public_cleanup_needed = float(public_proba[idx] * 100.0)
-        else:
-            public_cleanup_needed = float(public_proba.max() * 100.0)
+        if cached is not None:
+            CACHE_REQUESTS.inc(cache="predict_all", result="hit")
+            return ModelOutputs.model_validate_json(cached)
+        CACHE_REQUESTS.inc(cache="predict_all", result="miss")
+    outputs = await predict_executor.run(_predict_all, city)
+    result_cache.put("predict-all", key, outputs.model_dump_json().encode())
+    return outputs
+
+
+def _predict_all(city: CityInput) -> ModelOutputs:
+    with STAGE_SECONDS.time(stage="feature_assembly"):
+        row = city_feature_row(city)
+
+    if PREDICT_MODE == "fanout":
+        pool = _get_predict_pool()
+        futures = {name: pool.submit(_predict_one, name, row) for name in MODEL_NAMES}
+        outputs = {name: future.result() for name, future in futures.items()}
     else:
-        public_cleanup_needed = 0.0
-
-    health_features = pd.DataFrame(
-        [
-            {
-                "temperature_c": w.currentTemperature,
-                "rainfall_mm": w.currentRainfall,
-                "aqi": w.aqi,
-                "recent_storm_or_flood": recent_storm_flag,
-                "sewer_system_health": p.sewerSystemHealth,
-                "emergency_response_time": p.emergencyResponseTime,
-            }
+        outputs = {name: _predict_one(name, row) for name in MODEL_NAMES}
+
+    return ModelOutputs(**{OUTPUT_FIELDS[name]: value for name, value in outputs.items()})
+
+
+
+
+
+
+
+
+@app.post("/sensitivity", response_model=SensitivityOut, dependencies=[Depends(require_models)])
+async def sensitivity(inputs: SensitivityIn) -> SensitivityOut:
+    for item in inputs.fields:
+        if item.field not in FIELD_COLUMNS:
+            raise HTTPException(status_code=422, detail=f"{item.field} is not a model input")
+        if item.steps < 2:
+            raise HTTPException(status_code=422, detail="steps must be at least 2")
+    points = sum(2 if is_binary_column(FIELD_COLUMNS[item.field]) else item.steps for item in inputs.fields)
+    if points > MAX_GRID_POINTS:
+        raise HTTPException(status_code=422, detail=f"At most {MAX_GRID_POINTS} grid points per request")
+    return await predict_executor.run(_sensitivity, inputs)
+
+
+def _sensitivity(inputs: SensitivityIn) -> SensitivityOut:
+    with STAGE_SECONDS.time(stage="feature_assembly"):
+        row = city_feature_row(inputs.city)
+        grids = [
+            (FIELD_COLUMNS[item.field], grid_values(FIELD_COLUMNS[item.field], item.low, item.high, item.steps))
+            for item in inputs.fields
         ]
+    with STAGE_SECONDS.time(stage="sensitivity_predict"):
+        base, curves = partial_dependence(models, row, grids)
+    out = SensitivityOut(
+        base=ModelOutputs(**{OUTPUT_FIELDS[name]: value for name, value in base.items()}),
+        curves=[
+            SensitivityCurve(
+                field=item.field,
+                values=values.tolist(),
+                outputs={OUTPUT_FIELDS[name]: curve[name].tolist() for name in MODEL_NAMES},
+            )
+            for item, (_, values), curve in zip(inputs.fields, grids, curves)
+        ],
     )
-    if health_model is not None:
-        health_class = int(health_model.predict(health_features)[0])
-        if health_class <= 0:
-            health_status_pred = 0.0
-        elif health_class == 1:
-            health_status_pred = 33.0
-        elif health_class == 2:
-            health_status_pred = 66.0
-        else:
-            health_status_pred = 100.0
-    else:
-        health_status_pred = 0.0
-
-    return ModelOutputs(
-        waterShortageLevel=water_shortage_level,
-        trafficCongestionLevel=traffic_congestion_level,
-        foodPriceChangePercent=food_price_change_percent,
-        energyPriceChangePercent=energy_price_change_percent,
-        publicCleanupNeeded=public_cleanup_needed,
-        healthStatus=health_status_pred,
+    if inputs.advisories:
+        with STAGE_SECONDS.time(stage="advisories"):
+            out.baseRecommendations = ADVISORIES.recommend(out.base.model_dump())
+            for curve in out.curves:
+                curve.recommendations = ADVISORIES.recommend_batch(curve.outputs)
+    return out
+
+
+@app.post("/predict-distribution", response_model=DistributionOut, dependencies=[Depends(require_models)])
+async def predict_distribution(inputs: DistributionIn) -> DistributionOut:
+    if not 1 <= inputs.samples <= MAX_SAMPLES:
+        raise HTTPException(status_code=422, detail=f"samples must be between 1 and {MAX_SAMPLES}")
+    if any(not 0.0 <= q <= 1.0 for q in inputs.quantiles):
+        raise HTTPException(status_code=422, detail="quantiles must be within [0, 1]")
+    for item in inputs.fields:
+        if item.field not in FIELD_COLUMNS:
+            raise HTTPException(status_code=422, detail=f"{item.field} is not a model input")
+        if item.distribution == "uniform" and (item.low is None or item.high is None or item.low > item.high):
+            raise HTTPException(status_code=422, detail=f"{item.field}: uniform needs low <= high")
+        if item.distribution == "bernoulli" and not (item.mean is not None and 0.0 <= item.mean <= 1.0):
+            raise HTTPException(status_code=422, detail=f"{item.field}: bernoulli needs mean in [0, 1]")
+        if item.std < 0:
+            raise HTTPException(status_code=422, detail=f"{item.field}: std must be non-negative")
+    return await predict_executor.run(_predict_distribution, inputs)
+
+
+def _predict_distribution(inputs: DistributionIn) -> DistributionOut:
+    with STAGE_SECONDS.time(stage="feature_assembly"):
+        row = city_feature_row(inputs.city)
+        samplers = {}
+        for item in inputs.fields:
+            column = FIELD_COLUMNS[item.field]
+            if item.distribution == "uniform":
+                samplers[column] = uniform_sampler(item.low, item.high)
+            elif item.distribution == "bernoulli":
+                samplers[column] = bernoulli_sampler(item.mean)
+            else:
+                mean = row[column] if item.mean is None else item.mean
+                samplers[column] = normal_sampler(mean, item.std, item.low, item.high)
+    with STAGE_SECONDS.time(stage="monte_carlo"):
+        sketches, tree_variance = monte_carlo(
+            models, row, samplers, inputs.samples, seed=inputs.seed, tree_variance=inputs.treeVariance
+        )
+    outputs = {}
+    for name in MODEL_NAMES:
+        sketch = sketches[name]
+        outputs[OUTPUT_FIELDS[name]] = OutputDistribution(
+            mean=sketch.mean(),
+            std=sketch.std(),
+            quantiles={f"{q:g}": float(v) for q, v in zip(inputs.quantiles, sketch.quantiles(inputs.quantiles))},
+            treeVariance=tree_variance[name] if inputs.treeVariance else None,
+        )
+    return DistributionOut(samples=inputs.samples, outputs=outputs)
+
+
+
+@app.post(
+    "/predict-batch",
+    response_model=PredictBatchOut,
+    dependencies=[Depends(require_models)],
+    openapi_extra={
+        "requestBody": {
+            "content": {
+                "application/json": {"schema": {"$ref": "#/components/schemas/PredictBatchIn"}},
+                NPY_CONTENT_TYPE: {"schema": {"type": "string", "format": "binary"}},
+                ARROW_CONTENT_TYPE: {"schema": {"type": "string", "format": "binary"}},
+            },
+            "required": True,
+        }
+    },
+)
+async def predict_batch_endpoint(request: Request) -> Response:
+    # JSON takes {"cities": [CityInput, ...]}. The binary content types take
+    # one column per input (feature names or CityInput paths) and answer in
+    # the same format with one column per ModelOutputs field.
+    content_type = request.headers.get("content-type", "application/json").split(";")[0].strip().lower()
+    body = await _read_batch_body(request)
+    if content_type in BINARY_CONTENT_TYPES:
+        return await predict_executor.run(_predict_batch_binary, body, content_type)
+    if content_type != "application/json":
+        supported = ", ".join(("application/json",) + BINARY_CONTENT_TYPES)
+        raise HTTPException(status_code=415, detail=f"Unsupported content type {content_type}; send one of {supported}")
+    return await predict_executor.run(_predict_batch_json, body)
+
+
+async def _read_batch_body(request: Request) -> bytes:
+    # Oversized bodies are refused before they are buffered or parsed.
+    too_large = HTTPException(status_code=413, detail=f"batch bodies are limited to {MAX_BATCH_BYTES} bytes")
+    declared = request.headers.get("content-length", "")
+    if declared.isdigit() and int(declared) > MAX_BATCH_BYTES:
+        raise too_large
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > MAX_BATCH_BYTES:
+            raise too_large
+    return bytes(body)
+
+
+def _predict_batch_json(body: bytes) -> Response:
+    with STAGE_SECONDS.time(stage="batch_decode_json"):
+        try:
+            batch = PredictBatchIn.model_validate_json(body)
+        except ValidationError as exc:
+            errors = exc.errors(include_url=False, include_input=False, include_context=False)
+            raise HTTPException(status_code=422, detail=errors) from None
+        cities = batch.cities
+        if not cities:
+            empty = PredictBatchOut(outputs=[], recommendations=[] if batch.advisories else None)
+            return Response(content=empty.model_dump_json(), media_type="application/json")
+        rows = [city_feature_row(city) for city in cities]
+        values = {column: np.array([row[column] for row in rows]) for column in rows[0]}
+    with STAGE_SECONDS.time(stage="batch_predict"):
+        outputs = predict_batch(models, values, len(cities))
+    recommendations = None
+    if batch.advisories:
+        with STAGE_SECONDS.time(stage="advisories"):
+            recommendations = ADVISORIES.recommend_batch(
+                {OUTPUT_FIELDS[name]: values for name, values in outputs.items()}
+            )
+    with STAGE_SECONDS.time(stage="batch_encode_json"):
+        columns = [OUTPUT_FIELDS[name] for name in outputs]
+        results = [ModelOutputs(**dict(zip(columns, row))) for row in zip(*(v.tolist() for v in outputs.values()))]
+        body = PredictBatchOut(outputs=results, recommendations=recommendations).model_dump_json()
+    for row in _batch_rows_to_log(len(cities)):
+        _log_prediction(cities[row], results[row])
+    return Response(content=body, media_type="application/json")
+
+
+def _predict_batch_binary(body: bytes, content_type: str) -> Response:
+    with STAGE_SECONDS.time(stage="batch_decode_binary"):
+        try:
+            values, n_rows = decode_features(body, content_type, required_columns(models))
+        except ValueError as exc:
+            raise HTTPException(status_code=422, detail=str(exc)) from None
+        if n_rows > MAX_BATCH_ROWS:
+            raise HTTPException(status_code=422, detail=f"batches are limited to {MAX_BATCH_ROWS} rows")
+    with STAGE_SECONDS.time(stage="batch_predict"):
+        outputs = predict_batch(models, values, n_rows)
+    with STAGE_SECONDS.time(stage="batch_encode_binary"):
+        content = encode_outputs(outputs, content_type)
+    logged = _batch_rows_to_log(n_rows)
+    if logged and prediction_log is not None:
+        # Feature rows in, ModelOutputs-shaped dicts out, like /predict-all.
+        inputs = {column: column_values[logged].tolist() for column, column_values in values.items()}
+        results = {OUTPUT_FIELDS[name]: output[logged].tolist() for name, output in outputs.items()}
+        for index in range(len(logged)):
+            prediction_log.record(
+                {column: column_values[index] for column, column_values in inputs.items()},
+                {field: field_values[index] for field, field_values in results.items()},
+            )
+    return Response(content=content, media_type=content_type)
+
+
+@app.get("/analytics/outputs", response_model=AnalyticsOut)
+def output_analytics(window: str = "24h", granularity: str | None = None) -> AnalyticsOut:
+    # Served from the rollups the prediction log maintains as it inserts,
+    # one primary-key row per output per bucket; prediction_logs is not scanned.
+    if prediction_log is None:
+        raise HTTPException(status_code=503, detail="Prediction log is disabled; set ML_PREDICTION_LOG_URL.")
+    try:
+        seconds = analytics.parse_window(window)
+    except ValueError as exc:
+        raise HTTPException(status_code=422, detail=str(exc)) from exc
+    if granularity is None:
+        granularity = "hour" if seconds <= analytics.HOURLY_WINDOW_LIMIT else "day"
+    if granularity not in analytics.GRANULARITIES:
+        raise HTTPException(status_code=422, detail=f"granularity must be one of {', '.join(analytics.GRANULARITIES)}")
+    now = time.time()
+    start = analytics.bucket_start(now - seconds, granularity)
+    end = analytics.bucket_start(now, granularity)
+    if (end - start) // analytics.GRANULARITIES[granularity] >= analytics.MAX_WINDOW_BUCKETS:
+        raise HTTPException(status_code=422, detail=f"window spans more than {analytics.MAX_WINDOW_BUCKETS} buckets")
+    with STAGE_SECONDS.time(stage="analytics_rollups"):
+        series, totals = analytics.summarize_rollups(prediction_log.sink.read_rollups(granularity, start, end))
+    return AnalyticsOut(
+        window=seconds,
+        granularity=granularity,
+        buckets=[AnalyticsBucket(**bucket) for bucket in series],
+        totals=totals,
     )
 
 
+MAX_SIMULATION_SCENARIO_DAYS = 400000
 
 
+@app.post("/simulate", response_model=SimulationOut, dependencies=[Depends(require_models)])
+async def simulate_city(inputs: SimulationIn) -> SimulationOut:
+    if inputs.scenarios < 1 or inputs.days < 1:
+        raise HTTPException(status_code=422, detail="scenarios and days must be positive")
+    if inputs.scenarios * inputs.days > MAX_SIMULATION_SCENARIO_DAYS:
+        raise HTTPException(
+            status_code=422, detail=f"scenarios x days must not exceed {MAX_SIMULATION_SCENARIO_DAYS}"
+        )
+    for event in inputs.events:
+        if event.field not in FIELD_COLUMNS:
+            raise HTTPException(status_code=422, detail=f"{event.field} is not a model input")
+    return await predict_executor.run(_simulate_city, inputs)
+
+
+def _simulate_city(inputs: SimulationIn) -> SimulationOut:
+    events = [
+        Event(FIELD_COLUMNS[event.field], event.startDay, event.days, event.value, event.delta)
+        for event in inputs.events
+    ]
+    with STAGE_SECONDS.time(stage="simulation"):
+        result = simulate(
+            models,
+            city_feature_row(inputs.city),
+            inputs.scenarios,
+            SimulationConfig(days=inputs.days),
+            events,
+            seed=inputs.seed,
+        )
+    state_fields = {column: field for field, column in FIELD_COLUMNS.items()}
+    return SimulationOut(
+        days=inputs.days,
+        scenarios=inputs.scenarios,
+        outputs={
+            OUTPUT_FIELDS[name]: {key: values.tolist() for key, values in summarize(series).items()}
+            for name, series in result.outputs.items()
+        },
+        state={
+            state_fields[column]: {key: values.tolist() for key, values in summarize(result.state[column]).items()}
+            for column in STATE_COLUMNS
+        },
+    )
 
 
+@app.post("/optimize", response_model=OptimizeOut, dependencies=[Depends(require_models)])
+async def optimize_interventions(inputs: OptimizeIn) -> OptimizeOut:
+    output_models = {field: name for name, field in OUTPUT_FIELDS.items()}
+    if not inputs.controls or not inputs.objectives:
+        raise HTTPException(status_code=422, detail="At least one control and one objective are required")
+    for control in inputs.controls:
+        if control.field not in FIELD_COLUMNS:
+            raise HTTPException(status_code=422, detail=f"{control.field} is not a model input")
+        if control.low > control.high or control.costPerUnit < 0:
+            raise HTTPException(status_code=422, detail=f"{control.field}: need low <= high and costPerUnit >= 0")
+    for objective in inputs.objectives:
+        if objective.output not in output_models:
+            raise HTTPException(status_code=422, detail=f"Unknown output {objective.output}")
+    if not 1 <= inputs.maxEvaluations <= MAX_EVALUATIONS:
+        raise HTTPException(status_code=422, detail=f"maxEvaluations must be between 1 and {MAX_EVALUATIONS}")
+    # The first generation is allocated in full before maxEvaluations applies.
+    if not 4 <= inputs.population <= inputs.maxEvaluations:
+        raise HTTPException(status_code=422, detail="population must be between 4 and maxEvaluations")
+    if inputs.generations < 1:
+        raise HTTPException(status_code=422, detail="generations must be at least 1")
+    if not 1 <= inputs.topK <= MAX_TOP_K:
+        raise HTTPException(status_code=422, detail=f"topK must be between 1 and {MAX_TOP_K}")
+    if inputs.budget is not None and inputs.budget < 0:
+        raise HTTPException(status_code=422, detail="budget must be non-negative")
+    return await predict_executor.run(_optimize_interventions, inputs)
+
+
+def _optimize_interventions(inputs: OptimizeIn) -> OptimizeOut:
+    output_models = {field: name for name, field in OUTPUT_FIELDS.items()}
+    with STAGE_SECONDS.time(stage="optimize"):
+        result = optimize(
+            models,
+            city_feature_row(inputs.city),
+            [Control(FIELD_COLUMNS[c.field], c.low, c.high, c.costPerUnit) for c in inputs.controls],
+            [Objective(output_models[o.output], o.weight, o.threshold) for o in inputs.objectives],
+            budget=inputs.budget,
+            population=inputs.population,
+            generations=inputs.generations,
+            max_evaluations=inputs.maxEvaluations,
+            patience=inputs.patience,
+            time_limit=inputs.timeLimitSeconds,
+            top_k=inputs.topK,
+            seed=inputs.seed,
+        )
+    best = [
+        Intervention(
+            changes={control.field: float(value) for control, value in zip(inputs.controls, values)},
+            cost=float(result.costs[index]),
+            score=float(result.scores[index]),
+            outputs=ModelOutputs(
+                **{OUTPUT_FIELDS[name]: float(result.outputs[name][index]) for name in MODEL_NAMES}
+            ),
+        )
+        for index, values in enumerate(result.values)
+    ]
+    return OptimizeOut(
+        best=best,
+        evaluations=result.evaluations,
+        generations=result.generations,
+        evaluationsPerSecond=result.evaluations / result.elapsed if result.elapsed > 0 else 0.0,
+        stoppedBy=result.stopped_by,
+    )
 
 
 def _build_llm_prompt(inputs: LlmRecommendationsIn) -> list[dict[str, str]]:
@@ -373,6 +989,12 @@ def _build_llm_prompt(inputs: LlmRecommendationsIn) -> list[dict[str, str]]:
 
 
 LOCAL_LLM_MODEL_ID = os.getenv("LOCAL_LLM_MODEL_ID", "TinyLlama/TinyLlama-1.1B-Chat-v1.0")
+# Wall-clock budget for one /llm-recommendations call, first attempt and
+# retry together; generation is cut off (max_time) when it runs out.
+LLM_BUDGET_SECONDS = float(os.getenv("ML_LLM_BUDGET_SECONDS", "30"))
+# Roughly three bullet lines: a retry is only started when the budget left
+# covers this many tokens at the first attempt's rate.
+LLM_RETRY_MIN_TOKENS = 96
 
 _local_llm_model = None
 _local_llm_tokenizer = None
@@ -381,42 +1003,47 @@ _local_llm_error: str | None = None
 
 def _ensure_local_llm_loaded() -> bool:
     global _local_llm_model, _local_llm_tokenizer, _local_llm_error
-    print("DEBUG: _ensure_local_llm_loaded called.")
+    logger.debug("_ensure_local_llm_loaded called.")
     if _local_llm_model is not None and _local_llm_tokenizer is not None:
+        CACHE_REQUESTS.inc(cache="llm_model", result="hit")
         return True
+    CACHE_REQUESTS.inc(cache="llm_model", result="miss")
     try:
         import torch
         from transformers import AutoModelForCausalLM, AutoTokenizer
     except Exception as exc:
-        print(f"DEBUG: Import failed: {exc}")
+        logger.debug("Import failed: %s", exc)
         _local_llm_error = str(exc)
         return False
     model_id = LOCAL_LLM_MODEL_ID
-    print(f"DEBUG: Loading model {model_id}...")
+    logger.debug("Loading model %s...", model_id)
     try:
         tokenizer = AutoTokenizer.from_pretrained(model_id)
         if torch.cuda.is_available():
-            print("DEBUG: CUDA available, loading to CUDA explicitly")
+            logger.debug("CUDA available, loading to CUDA explicitly")
             model = AutoModelForCausalLM.from_pretrained(
                 model_id,
                 torch_dtype=torch.float16,
             ).to("cuda")
         else:
-            print("DEBUG: Loading on CPU")
+            logger.debug("Loading on CPU")
             model = AutoModelForCausalLM.from_pretrained(model_id)
     except Exception as exc:
-        print(f"DEBUG: Model fail to load: {exc}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Model fail to load: %s", exc)
         _local_llm_error = str(exc)
         return False
     _local_llm_model = model
     _local_llm_tokenizer = tokenizer
-    print("DEBUG: Model loaded successfully.")
+    logger.debug("Model loaded successfully.")
     return True
 
 
-def _call_local_llm(messages: list[dict[str, str]] | str) -> str:
+def _call_local_llm(
+    messages: list[dict[str, str]] | str,
+    validator: OutputValidator | None = None,
+    seed: int | None = None,
+    max_time: float | None = None,
+) -> str:
     import torch
 
     if not _ensure_local_llm_loaded():
@@ -426,162 +1053,177 @@ def _call_local_llm(messages: list[dict[str, str]] | str) -> str:
     tokenizer = _local_llm_tokenizer
     model = _local_llm_model
     
-    if isinstance(messages, str):
-        prompt = messages
-    else:
-        prompt = tokenizer.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
-        
-    inputs = tokenizer(prompt, return_tensors="pt", truncation=True, max_length=1024)
-    if torch.cuda.is_available():
-        inputs = {k: v.to(model.device) for k, v in inputs.items()}
-    output_ids = model.generate(
-        **inputs,
-        max_new_tokens=256,
-        temperature=0.7,
-        do_sample=True,
-        pad_token_id=tokenizer.eos_token_id,
-    )
-    generated_ids = output_ids[0][inputs["input_ids"].shape[1] :]
-    text = tokenizer.decode(generated_ids, skip_special_tokens=True)
-    return text.strip()
-
+    with STAGE_SECONDS.time(stage="tokenize"):
+        if isinstance(messages, str):
+            prompt = messages
+        else:
+            prompt = tokenizer.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
 
+        inputs = tokenizer(prompt, return_tensors="pt", truncation=True, max_length=1024)
+        if torch.cuda.is_available():
+            inputs = {k: v.to(model.device) for k, v in inputs.items()}
+    stopping_criteria = None
+    if validator is not None:
+        from transformers import StoppingCriteriaList
+
+        # Stops as soon as the streamed lines decide the outcome: three
+        # kept lines, a prompt echo, or a certain validation failure.
+        stopping_criteria = StoppingCriteriaList([StreamStop(tokenizer, inputs["input_ids"].shape[1], validator)])
+    if seed is not None:
+        torch.manual_seed(seed)
+    with STAGE_SECONDS.time(stage="generate"):
+        output_ids = model.generate(
+            **inputs,
+            max_new_tokens=256,
+            temperature=0.7,
+            do_sample=True,
+            pad_token_id=tokenizer.eos_token_id,
+            stopping_criteria=stopping_criteria,
+            max_time=max_time,
+        )
+    with STAGE_SECONDS.time(stage="decode"):
+        generated_ids = output_ids[0][inputs["input_ids"].shape[1] :]
+        text = tokenizer.decode(generated_ids, skip_special_tokens=True)
+    if validator is not None:
+        validator.tokens = len(generated_ids)
+    return text.strip()
 
 
 
-def _is_valid_llm_recommendations(text: str) -> bool:
-    lines = [line.strip() for line in text.splitlines() if line.strip()]
-    bullet_lines = [
-        line
-        for line in lines
-        if line.startswith(("-", "•")) or re.match(r"^\d+\.", line)
-    ]
-    if len(bullet_lines) < 2:
-        print(f"DEBUG: Validation failed - Not enough bullets. Found {len(bullet_lines)}.")
-        return False
-    meta_keywords = ["bullet", "bullets", "line", "lines", "format", "example", "instruction"]
-    for line in bullet_lines:
-        if any(k in line.lower() for k in meta_keywords):
-             print(f"DEBUG: Validation failed - Meta keyword found in line: {line}")
-             return False
-    return True
+def _build_rule_based_recommendations(inputs: LlmRecommendationsIn) -> str:
+    logger.debug("Using RULE-BASED fallback recommendations.")
+    return ADVISORIES.recommend(inputs.model_dump())
 
 
-def _build_rule_based_recommendations(inputs: LlmRecommendationsIn) -> str:
-    print("DEBUG: Using RULE-BASED fallback recommendations.")
-    items: list[str] = []
-    if inputs.waterShortageLevel >= 70:
-        items.append(
-            f"WATER EMERGENCY: With shortage risk near {inputs.waterShortageLevel:.0f}%, enforce rationing, prioritize hospitals and vulnerable settlements, and deploy leak-fixing crews within 24 hours."
-        )
-    elif inputs.waterShortageLevel >= 40:
-        items.append(
-            f"WATER CONSERVATION: With shortage risk around {inputs.waterShortageLevel:.0f}%, launch citywide conservation campaign, restrict non-essential use, and fast-track supply network inspections."
-        )
-    if inputs.trafficCongestionLevel >= 70:
-        items.append(
-            f"TRAFFIC MANAGEMENT: With congestion near {inputs.trafficCongestionLevel:.0f}%, activate dynamic signal plans, divert heavy vehicles outside peak hours, and deploy traffic marshals at hotspots."
-        )
-    elif inputs.trafficCongestionLevel >= 40:
-        items.append(
-            f"MOBILITY OPTIMIZATION: With congestion around {inputs.trafficCongestionLevel:.0f}%, promote staggered office timings, increase bus frequency on congested corridors, and improve last-mile options."
-        )
-    if inputs.publicCleanupNeeded >= 60:
-        items.append(
-            f"CITY CLEANUP DRIVE: With cleanup risk near {inputs.publicCleanupNeeded:.0f}%, schedule intensive cleanup and repair in high-risk wards, coordinate sanitation, roads, and drainage teams with a clear 7–14 day timeline."
-        )
-    if inputs.healthStatus <= 40:
-        items.append(
-            f"PUBLIC HEALTH ALERT: With health risk index near {inputs.healthStatus:.0f}, scale up clinic capacity, issue air and water quality advisories, and mobilize outreach in high-risk neighborhoods."
-        )
-    if inputs.energyPriceChangePercent >= 10 or inputs.energyPriceChangePercent <= -5:
-        if inputs.energyPriceChangePercent >= 10:
-            items.append(
-                f"ENERGY STABILITY PLAN: With tariffs rising about {inputs.energyPriceChangePercent:.1f}%, announce time-of-day tariffs, incentivize large consumers to shift loads off-peak, and expand demand response programs."
-            )
+@app.post("/llm-recommendations", response_model=LlmRecommendationsOut)
+async def llm_recommendations(inputs: LlmRecommendationsIn) -> LlmRecommendationsOut:
+    return await llm_executor.run(_llm_recommendations, inputs)
+
+
+def _llm_recommendations(inputs: LlmRecommendationsIn) -> LlmRecommendationsOut:
+    logger.debug("Received LLM recommendation request.")
+    with STAGE_SECONDS.time(stage="prompt_build"):
+        prompt = _build_llm_prompt(inputs)
+    deadline = time.monotonic() + LLM_BUDGET_SECONDS
+    retry_seconds = 0.0
+    fallback_source = None
+    for attempt in ("first", "retry"):
+        remaining = deadline - time.monotonic()
+        if attempt == "retry" and remaining < retry_seconds:
+            GENERATIONS.inc(attempt=attempt, result="skipped_budget")
+            break
+        # The retry samples with a fresh seed; the same seed would likely
+        # reproduce the rejected text.
+        seed = None if attempt == "first" else random.getrandbits(31)
+        validator = OutputValidator()
+        start = time.monotonic()
+        try:
+            text = _call_local_llm(prompt, validator=validator, seed=seed, max_time=remaining)
+        except Exception as e:
+            logger.debug("Exception during LLM generation: %s", e, exc_info=True)
+            GENERATIONS.inc(attempt=attempt, result="error")
+            fallback_source = "llm_error"
+            break
+        elapsed = time.monotonic() - start
+        logger.debug("Raw LLM Output (%s attempt):\n%s", attempt, text)
+
+        with STAGE_SECONDS.time(stage="clean_validate"):
+            text, failure = validate_output(text)
+        logger.debug("Cleaned LLM Output:\n%s", text)
+        GENERATIONS.inc(attempt=attempt, result=failure or "valid")
+        TOKENS.inc(validator.tokens, use="wasted" if failure else "served")
+        if failure is None:
+            logger.debug("Output is VALID.")
+            return LlmRecommendationsOut(recommendations=text)
+        logger.debug("Validation failed - %s.", failure)
+        fallback_source = "empty_output" if failure == "empty_output" else "invalid_output"
+        if validator.tokens:
+            retry_seconds = elapsed / validator.tokens * LLM_RETRY_MIN_TOKENS
         else:
-            items.append(
-                f"ENERGY STABILITY PLAN: With tariffs falling about {abs(inputs.energyPriceChangePercent):.1f}%, lock in lower bulk procurements while protecting low-income households from volatility."
-            )
-    if inputs.foodPriceChangePercent >= 8:
-        items.append(
-            f"FOOD PRICE CONTAINMENT: With staple prices rising about {inputs.foodPriceChangePercent:.1f}%, release buffer stocks, support wholesale markets, and expand targeted subsidies for low-income households."
-        )
-    elif inputs.foodPriceChangePercent <= -5:
-        items.append(
-            f"FOOD MARKET STABILIZATION: With prices dropping about {abs(inputs.foodPriceChangePercent):.1f}%, stabilize farmer incomes through procurement and storage while keeping retail prices predictable."
-        )
-    if not items:
-        items = [
-            "COORDINATION CELL: Maintain an integrated command center linking water, transport, health, and disaster management for rapid decisions.",
-            "DATA-DRIVEN MONITORING: Track key indicators daily and trigger predefined playbooks when thresholds are crossed.",
-            "COMMUNITY OUTREACH: Use multilingual alerts and ward-level meetings to keep residents informed and engaged in resilience actions.",
-        ]
-    lines = []
-
-    for text in items[:3]:
-        lines.append(f"- {text}")
-    return "\n".join(lines)
+            retry_seconds = elapsed
+    FALLBACKS.inc(kind="rule_based", source=fallback_source)
+    return LlmRecommendationsOut(recommendations=_build_rule_based_recommendations(inputs))
 
 
+@app.get("/metrics")
+def metrics() -> Response:
+    return Response(content=REGISTRY.render(), media_type=CONTENT_TYPE)
 
-def _clean_llm_output(text: str) -> str:
-    lines = text.splitlines()
-    cleaned_lines = []
-    for line in lines:
-        l = line.strip()
-        if not l:
-            continue
-        # STOP processing if we see prompt artifacts
-        if "example input" in l.lower() or "example output" in l.lower():
-            break
-            
-        # Remove lines that look like meta-commentary
-        if l.lower().startswith(("example:", "note:", "here are", "sure", "output:", "status:")):
-            continue
-        # Remove lines that are just "Water Conservation:" without content
-        if l.endswith(":") and len(l.split()) < 5:
-            continue
-            
-        cleaned_lines.append(line)
-        
-        # STRICTLY LIMIT to 3 lines
-        if len(cleaned_lines) >= 3:
-            break
-            
-    return "\n".join(cleaned_lines)
 
+def missing_required_models() -> list[str]:
+    return [name for name in REQUIRED_MODELS if models.get(name) is None]
 
-@app.post("/llm-recommendations", response_model=LlmRecommendationsOut)
-def llm_recommendations(inputs: LlmRecommendationsIn) -> LlmRecommendationsOut:
-    print("DEBUG: Received LLM recommendation request.")
-    prompt = _build_llm_prompt(inputs)
-    try:
-        text = _call_local_llm(prompt)
-        print("DEBUG: Raw LLM Output start ---")
-        print(text)
-        print("DEBUG: Raw LLM Output end ---")
-        
-        # Clean the output first
-        text = _clean_llm_output(text)
-        print("DEBUG: Cleaned LLM Output start ---")
-        print(text)
-        print("DEBUG: Cleaned LLM Output end ---")
-
-        if not isinstance(text, str) or not text.strip():
-             print("DEBUG: Validation failed - Empty or non-string output.")
-             text = _build_rule_based_recommendations(inputs)
-        elif not _is_valid_llm_recommendations(text):
-             print("DEBUG: Validation failed - _is_valid_llm_recommendations returned False.")
-             text = _build_rule_based_recommendations(inputs)
-        else:
-             print("DEBUG: Output is VALID.")
 
-    except Exception as e:
-        print(f"DEBUG: Exception during LLM generation: {e}")
-        import traceback
-        traceback.print_exc()
-        text = _build_rule_based_recommendations(inputs)
-    return LlmRecommendationsOut(recommendations=text)
+def llm_status() -> LlmStatusOut:
+    # The local LLM loads on the first /llm-recommendations call and is not
+    # required for readiness: failures fall back to the rule-based text.
+    if _local_llm_model is not None:
+        state = "loaded"
+    elif _local_llm_error is not None:
+        state = "failed"
+    else:
+        state = "not_loaded"
+    return LlmStatusOut(modelId=LOCAL_LLM_MODEL_ID, state=state, error=_local_llm_error)
+
+
+@app.get("/healthz", response_model=HealthOut)
+async def healthz() -> HealthOut:
+    # Liveness only: answers as soon as the port is bound, even mid-load.
+    return HealthOut(
+        status="ok",
+        pid=os.getpid(),
+        modelsLoaded=sum(model is not None for model in models.values()),
+        modelsTotal=len(MODEL_NAMES),
+    )
 
 
+@app.get("/readyz", response_model=ReadyOut)
+async def readyz() -> JSONResponse:
+    # 503 until loading finishes, and afterwards whenever a required model
+    # (ML_REQUIRED_MODELS, default all) is missing or failed to load, so the
+    # load balancer stops routing to a worker that would serve fallbacks.
+    missing = missing_required_models() if models_ready.is_set() else []
+    if models_ready.is_set() and not missing:
+        status, error = "ready", None
+    elif models_ready.is_set():
+        status = "degraded"
+        error = "; ".join(f"{name}: {model_status[name].error}" for name in missing)
+    else:
+        status = "failed" if model_load_error is not None else "loading"
+        error = model_load_error
+    body = ReadyOut(status=status, missing=missing, error=error)
+    return JSONResponse(status_code=200 if status == "ready" else 503, content=body.model_dump())
+
+
+@app.get("/models", response_model=ModelsOut)
+async def model_statuses() -> ModelsOut:
+    items = []
+    for name in MODEL_NAMES:
+        status = model_status.get(name)
+        latency = ModelLatency(**model_latency[name].summary())
+        if status is None:
+            items.append(ModelStatusOut(name=name, required=name in REQUIRED_MODELS, state="loading", latency=latency))
+            continue
+        items.append(
+            ModelStatusOut(
+                name=name,
+                required=name in REQUIRED_MODELS,
+                state=status.state,
+                backend=status.backend,
+                path=status.path,
+                version=status.version,
+                modifiedAt=status.modified_at,
+                loadSeconds=status.load_seconds,
+                memoryBytes=status.memory_bytes,
+                lookupTable=name in lookup_tables,
+                latency=latency,
+                error=status.error,
+            )
+        )
+    return ModelsOut(
+        pid=os.getpid(),
+        ready=models_ready.is_set() and not missing_required_models(),
+        loadSeconds=models_load_seconds,
+        models=items,
+        llm=llm_status(),
+    )
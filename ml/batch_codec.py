@@ -0,0 +1,114 @@
+from __future__ import annotations
+
+import io
+import math
+from typing import Any, Mapping
+
+import numpy as np
+
+from ml.inference import OUTPUT_FIELDS
+
+NPY_CONTENT_TYPE = "application/x-npy"
+ARROW_CONTENT_TYPE = "application/vnd.apache.arrow.stream"
+BINARY_CONTENT_TYPES = (NPY_CONTENT_TYPE, ARROW_CONTENT_TYPE)
+
+
+def decode_npy(body: bytes) -> np.ndarray:
+    # A 1-D structured .npy array with one field per input column. Only the
+    # header is parsed; the records are a view over the request body.
+    stream = io.BytesIO(body)
+    try:
+        version = np.lib.format.read_magic(stream)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(stream)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(stream)
+    except ValueError as exc:
+        raise ValueError(f"Invalid .npy payload: {exc}") from exc
+    if dtype.names is None or len(shape) != 1 or fortran_order:
+        raise ValueError("The .npy payload must be a 1-D structured array with one field per input column")
+    if dtype.hasobject:
+        raise ValueError("The .npy payload must not contain Python objects")
+    count = math.prod(shape)
+    if len(body) - stream.tell() < count * dtype.itemsize:
+        raise ValueError("The .npy payload is truncated")
+    return np.frombuffer(body, dtype=dtype, count=count, offset=stream.tell())
+
+
+def encode_npy(columns: Mapping[str, np.ndarray]) -> bytes:
+    n_rows = len(next(iter(columns.values())))
+    records = np.empty(n_rows, dtype=[(name, "<f8") for name in columns])
+    for name, values in columns.items():
+        records[name] = values
+    buffer = io.BytesIO()
+    np.lib.format.write_array(buffer, records, allow_pickle=False)
+    return buffer.getvalue()
+
+
+def _pyarrow() -> Any:
+    try:
+        import pyarrow
+        import pyarrow.ipc
+    except ImportError:
+        raise ValueError("Arrow payloads need pyarrow on the server; send application/x-npy instead") from None
+    return pyarrow
+
+
+def decode_arrow(body: bytes) -> dict[str, np.ndarray]:
+    # One Arrow IPC stream; numeric columns without nulls convert zero-copy.
+    pa = _pyarrow()
+    table = pa.ipc.open_stream(pa.py_buffer(body)).read_all().combine_chunks()
+    columns = {}
+    for name, column in zip(table.column_names, table.columns):
+        if column.null_count:
+            raise ValueError(f"{name}: {column.null_count} null values")
+        columns[name] = column.to_numpy()
+    return columns
+
+
+def encode_arrow(columns: Mapping[str, np.ndarray]) -> bytes:
+    pa = _pyarrow()
+    table = pa.table({name: np.asarray(values, dtype=np.float64) for name, values in columns.items()})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def decode_features(body: bytes, content_type: str, required: set[str]) -> tuple[dict[str, np.ndarray], int]:
+    # Payload columns -> model feature arrays, validated column-wise across
+    # the whole batch. Raises ValueError with every problem found.
+    from ml.score import frame_feature_values
+
+    if content_type == NPY_CONTENT_TYPE:
+        records = decode_npy(body)
+        columns: Mapping[str, Any] = {name: records[name] for name in records.dtype.names}
+        n_rows = len(records)
+    else:
+        columns = decode_arrow(body)
+        n_rows = len(next(iter(columns.values()))) if columns else 0
+    values = frame_feature_values(columns)
+    problems = []
+    missing = required - set(values)
+    if missing:
+        problems.append(f"missing columns: {', '.join(sorted(missing))}")
+    for column in sorted(required & set(values)):
+        array = values[column]
+        if array.dtype.kind not in "biuf":
+            problems.append(f"{column}: expected a numeric column, got {array.dtype}")
+            continue
+        if array.dtype.kind == "f":
+            bad = np.flatnonzero(~np.isfinite(array))
+            if len(bad):
+                problems.append(f"{column}: {len(bad)} non-finite values (first at row {bad[0]})")
+    if problems:
+        raise ValueError("; ".join(problems))
+    return values, n_rows
+
+
+def encode_outputs(outputs: Mapping[str, np.ndarray], content_type: str) -> bytes:
+    # Model name -> outputs, returned under the ModelOutputs field names.
+    columns = {OUTPUT_FIELDS[name]: values for name, values in outputs.items()}
+    if content_type == NPY_CONTENT_TYPE:
+        return encode_npy(columns)
+    return encode_arrow(columns)
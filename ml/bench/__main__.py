@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import argparse
+import sys
+
+from ml.bench.results import RESULTS_DIR, compare, save_results
+
+SUITES = ("models", "endpoints", "overhead", "isolation", "batch", "startup")
+DEFAULT_SUITES = ("models", "endpoints", "overhead")
+
+
+def _run(args: argparse.Namespace) -> int:
+    suites = args.suite or list(DEFAULT_SUITES)
+    results = {}
+    if "models" in suites:
+        from ml.bench.models import bench_models
+
+        results["models"] = bench_models(
+            repeats=args.repeats, batch_size=args.batch_size, backends=tuple(args.backend.split(","))
+        )
+        for name, stats in results["models"].items():
+            if stats["status"] != "ok":
+                print(f"{name:15s} {stats['status']} ({stats['path']})")
+                continue
+            print(
+                f"{name:15s} load={stats['load_ms']:8.1f}ms rss=+{stats['load_rss_bytes'] / 2**20:6.1f}MiB "
+                f"p50={stats['single_row_p50_ms']:6.2f}ms p99={stats['single_row_p99_ms']:6.2f}ms "
+                f"batch={stats['batch_rows_per_second']:10.0f} rows/s"
+            )
+    if "endpoints" in suites:
+        from ml.bench.endpoints import bench_endpoints
+
+        results["endpoints"] = bench_endpoints(
+            [int(level) for level in args.concurrency.split(",")],
+            total_requests=args.requests,
+            endpoints=args.endpoint,
+            llm_delay_seconds=args.llm_delay,
+            weather_delay_seconds=args.weather_delay,
+            predict_modes=args.predict_mode.split(",") if args.predict_mode else None,
+        )
+    if "overhead" in suites:
+        from ml.bench.overhead import bench_profiler_overhead
+
+        results["overhead"] = bench_profiler_overhead()
+        print(f"profiler middleware (off): {results['overhead']['profiler_off_overhead_ns']:.0f} ns/request")
+    if "isolation" in suites:
+        from ml.bench.isolation import bench_isolation
+
+        results["isolation"] = bench_isolation(llm_delay_seconds=args.llm_delay or 1.0)
+    if "batch" in suites:
+        from ml.bench.batch import bench_batch
+
+        results["batch"] = bench_batch(tuple(int(size) for size in args.batch_rows.split(",")))
+    if "startup" in suites:
+        from ml.bench.startup import bench_startup
+
+        results["startup"] = bench_startup(repeats=args.startup_repeats, budget_seconds=args.startup_budget)
+    print(f"Saved results to {save_results(results, args.output_dir)}")
+    if "startup" in results and not results["startup"]["within_budget"]:
+        return 1
+    return 0
+
+
+def _compare(args: argparse.Namespace) -> int:
+    regressions = compare(args.baseline, args.candidate, threshold=args.threshold)
+    print(f"{len(regressions)} regression(s) above {args.threshold:.0%}")
+    return 1 if regressions else 0
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m ml.bench", description="Offline ML service benchmarks.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run = subparsers.add_parser("run", help="run benchmark suites and save JSON results")
+    run.add_argument("--suite", action="append", choices=SUITES)
+    run.add_argument("--endpoint", action="append", help="limit the endpoint suite to these endpoints")
+    run.add_argument("--concurrency", default="1,8,32", help="comma-separated client concurrency levels")
+    run.add_argument("--requests", type=int, default=400, help="requests per endpoint and concurrency level")
+    run.add_argument("--llm-delay", type=float, default=0.0, help="seconds the stub LLM sleeps per call")
+    run.add_argument("--weather-delay", type=float, default=0.0, help="seconds the stub OpenWeather server sleeps")
+    run.add_argument("--predict-mode", help="comma-separated /predict-all modes to compare, e.g. sequential,fanout")
+    run.add_argument("--repeats", type=int, default=200, help="single-row predict repeats per model")
+    run.add_argument("--batch-size", type=int, default=10000)
+    run.add_argument("--batch-rows", default="100,1000,10000", help="comma-separated /predict-batch sizes")
+    run.add_argument("--startup-repeats", type=int, default=5, help="fresh processes per startup measurement")
+    run.add_argument("--startup-budget", type=float, default=2.0, help="seconds from spawn to a healthy /healthz")
+    run.add_argument("--backend", default="joblib", help="comma-separated model backends, e.g. joblib,onnx")
+    run.add_argument("--output-dir", default=RESULTS_DIR)
+    run.set_defaults(handler=_run)
+
+    diff = subparsers.add_parser("compare", help="compare two saved result files")
+    diff.add_argument("baseline")
+    diff.add_argument("candidate")
+    diff.add_argument("--threshold", type=float, default=0.10)
+    diff.set_defaults(handler=_compare)
+
+    argv = list(sys.argv[1:] if argv is None else argv)
+    if not argv or (argv[0] not in subparsers.choices and argv[0] not in ("-h", "--help")):
+        argv.insert(0, "run")
+    args = parser.parse_args(argv)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
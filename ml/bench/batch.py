@@ -0,0 +1,87 @@
+from __future__ import annotations
+
+import copy
+import io
+import json
+from typing import Any
+
+import numpy as np
+
+from ml.batch_codec import NPY_CONTENT_TYPE, decode_npy
+from ml.bench.load import run_load, start_api_server, stop_api_server
+from ml.bench.stubs import SAMPLE_CITY
+
+
+def sample_cities(n_rows: int, seed: int = 0) -> list[dict[str, Any]]:
+    rng = np.random.default_rng(seed)
+    cities = []
+    for rainfall, aqi, vehicles in zip(
+        rng.integers(0, 200, n_rows), rng.integers(0, 500, n_rows), rng.integers(3000, 9000, n_rows)
+    ):
+        city = copy.deepcopy(SAMPLE_CITY)
+        city["weather"]["currentRainfall"] = float(rainfall)
+        city["weather"]["aqi"] = float(aqi)
+        city["transportation"]["avgVehiclesPerHour"] = int(vehicles)
+        cities.append(city)
+    return cities
+
+
+def npy_payload(cities: list[dict[str, Any]]) -> bytes:
+    # Same rows as the JSON payload, one float32 field per model feature.
+    from ml.api_server import CityInput
+    from ml.inference import city_feature_row
+
+    rows = [city_feature_row(CityInput.model_validate(city)) for city in cities]
+    records = np.empty(len(rows), dtype=[(column, "<f4") for column in rows[0]])
+    for column in rows[0]:
+        records[column] = [row[column] for row in rows]
+    buffer = io.BytesIO()
+    np.save(buffer, records)
+    return buffer.getvalue()
+
+
+def bench_batch(batch_sizes: tuple[int, ...] = (100, 1000, 10000), requests_per_size: int = 20) -> dict[str, Any]:
+    # End-to-end /predict-batch throughput (client send, server decode,
+    # predict, encode) for the same rows as JSON and as .npy columns.
+    import requests
+
+    server, thread, base_url = start_api_server()
+    url = base_url + "/predict-batch"
+    results: dict[str, Any] = {}
+    try:
+        for batch_size in batch_sizes:
+            cities = sample_cities(batch_size)
+            json_body = json.dumps({"cities": cities}).encode()
+            npy_body = npy_payload(cities)
+
+            # Both encodings must score identically before timing them.
+            json_out = requests.post(url, data=json_body, headers={"Content-Type": "application/json"}).json()
+            npy_out = decode_npy(requests.post(url, data=npy_body, headers={"Content-Type": NPY_CONTENT_TYPE}).content)
+            for field in npy_out.dtype.names:
+                expected = np.array([row[field] for row in json_out["outputs"]])
+                assert np.array_equal(expected, npy_out[field]), f"{field} differs between JSON and .npy"
+
+            results[f"b{batch_size}"] = {}
+            for label, body, content_type in (
+                ("json", json_body, "application/json"),
+                ("npy", npy_body, NPY_CONTENT_TYPE),
+            ):
+                stats = run_load(
+                    "POST",
+                    url,
+                    data=body,
+                    headers={"Content-Type": content_type},
+                    concurrency=1,
+                    total_requests=requests_per_size,
+                    warmup_requests=2,
+                )
+                stats["request_bytes"] = len(body)
+                stats["rows_per_second"] = stats["rps"] * batch_size
+                results[f"b{batch_size}"][label] = stats
+                print(
+                    f"batch={batch_size:<6d} {label:5s} {stats['rows_per_second']:12,.0f} rows/s "
+                    f"p50={stats['p50_ms']:9.2f}ms request={len(body) / 1024:9.1f} KiB"
+                )
+    finally:
+        stop_api_server(server, thread)
+    return results
@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+import os
+from typing import Any
+
+from ml.bench.load import run_load, start_api_server, stop_api_server
+from ml.bench.stubs import SAMPLE_CITY, SAMPLE_OUTPUTS, install_stub_llm, start_stub_openweather
+
+ENDPOINTS: dict[str, tuple[str, str, Any]] = {
+    "predict_all": ("POST", "/predict-all", SAMPLE_CITY),
+    "llm_recommendations": ("POST", "/llm-recommendations", SAMPLE_OUTPUTS),
+    "current_weather": ("GET", "/current-weather", None),
+}
+
+
+def bench_endpoints(
+    concurrency_levels: list[int],
+    total_requests: int = 400,
+    endpoints: list[str] | None = None,
+    llm_delay_seconds: float = 0.0,
+    weather_delay_seconds: float = 0.0,
+    predict_modes: list[str] | None = None,
+) -> dict[str, Any]:
+    from ml import api_server
+
+    # Every request repeats one payload; bypass the result cache so the
+    # numbers reflect model inference.
+    api_server.result_cache = None
+    install_stub_llm(delay_seconds=llm_delay_seconds)
+    weather_server, weather_url = start_stub_openweather(delay_seconds=weather_delay_seconds)
+    os.environ["OPENWEATHER_API_KEY"] = "bench"
+    os.environ["OPENWEATHER_BASE_URL"] = weather_url
+    server, thread, base_url = start_api_server()
+    results: dict[str, Any] = {}
+    try:
+        runs = []
+        for name in endpoints or list(ENDPOINTS):
+            if name == "predict_all" and predict_modes:
+                runs.extend((f"{name}_{mode}", name, mode) for mode in predict_modes)
+            else:
+                runs.append((name, name, None))
+        for label, name, mode in runs:
+            if mode is not None:
+                api_server.PREDICT_MODE = mode
+            method, path, payload = ENDPOINTS[name]
+            results[label] = {}
+            for concurrency in concurrency_levels:
+                stats = run_load(
+                    method,
+                    base_url + path,
+                    payload=payload,
+                    concurrency=concurrency,
+                    total_requests=total_requests,
+                )
+                results[label][f"c{concurrency}"] = stats
+                print(
+                    f"{label:28s} c={concurrency:<4d} rps={stats['rps']:9.1f} "
+                    f"p50={stats['p50_ms']:8.2f}ms p95={stats['p95_ms']:8.2f}ms p99={stats['p99_ms']:8.2f}ms "
+                    f"rejected={stats['rejected']} errors={stats['errors']}"
+                )
+    finally:
+        stop_api_server(server, thread)
+        weather_server.shutdown()
+    return results
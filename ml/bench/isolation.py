@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import threading
+import time
+from typing import Any
+
+from ml.bench.load import run_load, start_api_server, stop_api_server
+from ml.bench.stubs import SAMPLE_CITY, SAMPLE_OUTPUTS, install_stub_llm
+
+
+def bench_isolation(
+    llm_delay_seconds: float = 1.0,
+    llm_concurrency: int = 32,
+    llm_requests: int = 128,
+    predict_concurrency: int = 4,
+    predict_requests: int = 200,
+) -> dict[str, Any]:
+    # Measures /predict-all latency alone and again while a burst of slow
+    # /llm-recommendations calls saturates the LLM workload.
+    from ml import api_server
+
+    api_server.result_cache = None
+    install_stub_llm(delay_seconds=llm_delay_seconds)
+    server, thread, base_url = start_api_server()
+    results: dict[str, Any] = {}
+    try:
+        results["predict_alone"] = run_load(
+            "POST",
+            base_url + "/predict-all",
+            payload=SAMPLE_CITY,
+            concurrency=predict_concurrency,
+            total_requests=predict_requests,
+        )
+
+        burst: dict[str, Any] = {}
+
+        def llm_burst() -> None:
+            burst.update(
+                run_load(
+                    "POST",
+                    base_url + "/llm-recommendations",
+                    payload=SAMPLE_OUTPUTS,
+                    concurrency=llm_concurrency,
+                    total_requests=llm_requests,
+                    warmup_requests=0,
+                )
+            )
+
+        burst_thread = threading.Thread(target=llm_burst)
+        burst_thread.start()
+        time.sleep(0.2)
+        results["predict_during_llm_burst"] = run_load(
+            "POST",
+            base_url + "/predict-all",
+            payload=SAMPLE_CITY,
+            concurrency=predict_concurrency,
+            total_requests=predict_requests,
+            warmup_requests=0,
+        )
+        burst_thread.join()
+        results["llm_burst"] = burst
+    finally:
+        stop_api_server(server, thread)
+    for name, stats in results.items():
+        print(
+            f"{name:26s} rps={stats['rps']:8.1f} p50={stats['p50_ms']:8.2f}ms p99={stats['p99_ms']:8.2f}ms "
+            f"rejected={stats['rejected']} errors={stats['errors']}"
+        )
+    return results
@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+import threading
+import time
+from typing import Any
+
+import requests
+import uvicorn
+
+
+# Benches time serving, not the readiness policy: once loading has finished
+# the server counts as up even when /readyz reports "degraded" because some
+# required model files are absent (they serve fallback outputs).
+LOADED_STATES = ("ready", "degraded")
+
+
+def load_state(base_url: str) -> str | None:
+    # /readyz status ("loading", "ready", "degraded", "failed"), or None
+    # while the port is not answering yet.
+    try:
+        return requests.get(base_url + "/readyz", timeout=5).json().get("status")
+    except requests.ConnectionError:
+        return None
+
+
+def wait_ready(base_url: str, timeout: float = 120.0) -> float:
+    # Seconds until model loading has finished; models load after the port binds.
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        state = load_state(base_url)
+        if state in LOADED_STATES:
+            return time.perf_counter() - start
+        if state == "failed":
+            raise RuntimeError(f"{base_url} failed to load its models")
+        time.sleep(0.01)
+    raise TimeoutError(f"{base_url} not ready after {timeout:.0f}s")
+
+
+def start_api_server(app: Any = None) -> tuple[uvicorn.Server, threading.Thread, str]:
+    wait = app is None
+    if app is None:
+        from ml.api_server import app
+    config = uvicorn.Config(app, host="127.0.0.1", port=0, log_level="warning", access_log=False)
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.01)
+    host, port = server.servers[0].sockets[0].getsockname()[:2]
+    base_url = f"http://{host}:{port}"
+    if wait:
+        wait_ready(base_url)
+    return server, thread, base_url
+
+
+def stop_api_server(server: uvicorn.Server, thread: threading.Thread) -> None:
+    server.should_exit = True
+    thread.join(timeout=10)
+
+
+def percentile(sorted_values: list[float], q: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, int(round(q * (len(sorted_values) - 1)))))
+    return sorted_values[index]
+
+
+def summarize(latencies: list[float], errors: int, elapsed: float, rejected: int = 0) -> dict[str, float]:
+    ordered = sorted(latencies)
+    return {
+        "requests": len(latencies) + errors + rejected,
+        "errors": errors,
+        "rejected": rejected,
+        "rps": len(latencies) / elapsed if elapsed > 0 else 0.0,
+        "mean_ms": (sum(ordered) / len(ordered) * 1000.0) if ordered else 0.0,
+        "p50_ms": percentile(ordered, 0.50) * 1000.0,
+        "p95_ms": percentile(ordered, 0.95) * 1000.0,
+        "p99_ms": percentile(ordered, 0.99) * 1000.0,
+    }
+
+
+def run_load(
+    method: str,
+    url: str,
+    payload: Any = None,
+    concurrency: int = 8,
+    total_requests: int = 400,
+    warmup_requests: int = 10,
+    headers: dict[str, str] | None = None,
+    data: bytes | None = None,
+) -> dict[str, float]:
+    warmup = requests.Session()
+    for _ in range(warmup_requests):
+        warmup.request(method, url, json=payload, data=data, headers=headers, timeout=60)
+    warmup.close()
+
+    latencies: list[float] = []
+    errors = 0
+    rejected = 0
+    lock = threading.Lock()
+    per_worker = max(1, total_requests // concurrency)
+
+    def worker() -> None:
+        nonlocal errors, rejected
+        session = requests.Session()
+        local_latencies = []
+        local_errors = 0
+        local_rejected = 0
+        for _ in range(per_worker):
+            start = time.perf_counter()
+            try:
+                status = session.request(
+                    method, url, json=payload, data=data, headers=headers, timeout=60
+                ).status_code
+            except requests.RequestException:
+                status = 0
+            if 0 < status < 400:
+                local_latencies.append(time.perf_counter() - start)
+            elif status in (429, 503):
+                local_rejected += 1
+            else:
+                local_errors += 1
+        session.close()
+        with lock:
+            latencies.extend(local_latencies)
+            errors += local_errors
+            rejected += local_rejected
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    result = summarize(latencies, errors, elapsed, rejected)
+    result["concurrency"] = concurrency
+    return result
@@ -0,0 +1,76 @@
+from __future__ import annotations
+
+import os
+import time
+from typing import Any
+
+import numpy as np
+
+from ml.bench.load import summarize
+from ml.domains import DOMAINS, Domain
+from ml.inference import load_model, predict_outputs
+from ml.schema import FEATURE_DTYPE, column_spec
+from ml.serve import process_memory
+
+
+def sample_features(columns: tuple[str, ...], n_rows: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    X = np.empty((n_rows, len(columns)), dtype=FEATURE_DTYPE)
+    for index, column in enumerate(columns):
+        spec = column_spec(column)
+        X[:, index] = rng.integers(spec.low, spec.high, size=n_rows, endpoint=True)
+    return X
+
+
+def bench_model(domain: Domain, repeats: int = 200, batch_size: int = 10000, backend: str = "joblib") -> dict[str, Any]:
+    path = domain.model_path
+    if backend == "onnx":
+        from ml.onnx_backend import onnx_path, session_options
+
+        path = onnx_path(path)
+        session_options()  # import onnxruntime outside the load timing and RSS delta
+    if not os.path.exists(path):
+        return {"status": "missing", "path": path}
+    rss_before = process_memory(os.getpid())["rss"]
+    start = time.perf_counter()
+    model = load_model(domain.name, backend=backend)
+    load_seconds = time.perf_counter() - start
+    rss_delta = process_memory(os.getpid())["rss"] - rss_before
+
+    single = sample_features(model.feature_columns, 1)
+    predict_outputs(model, single)
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        predict_outputs(model, single)
+        timings.append(time.perf_counter() - start)
+    single_stats = summarize(timings, 0, sum(timings))
+
+    batch = sample_features(model.feature_columns, batch_size, seed=1)
+    start = time.perf_counter()
+    predict_outputs(model, batch)
+    batch_seconds = time.perf_counter() - start
+
+    return {
+        "status": "ok",
+        "path": path,
+        "file_bytes": os.path.getsize(path),
+        "load_ms": load_seconds * 1000.0,
+        "load_rss_bytes": rss_delta,
+        "n_estimators": int(getattr(model.estimator, "n_estimators", 0)),
+        "single_row_p50_ms": single_stats["p50_ms"],
+        "single_row_p95_ms": single_stats["p95_ms"],
+        "single_row_p99_ms": single_stats["p99_ms"],
+        "batch_rows": batch_size,
+        "batch_rows_per_second": batch_size / batch_seconds if batch_seconds > 0 else 0.0,
+    }
+
+
+def bench_models(repeats: int = 200, batch_size: int = 10000, backends: tuple[str, ...] = ("joblib",)) -> dict[str, Any]:
+    # Keys are the model name for joblib and name:backend otherwise, so
+    # results from before the ONNX backend still compare.
+    return {
+        name if backend == "joblib" else f"{name}:{backend}": bench_model(domain, repeats, batch_size, backend)
+        for backend in backends
+        for name, domain in DOMAINS.items()
+    }
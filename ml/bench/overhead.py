@@ -0,0 +1,29 @@
+from __future__ import annotations
+
+import asyncio
+import time
+from typing import Any
+
+from ml.profiler import ProfilingMiddleware
+
+
+async def _noop_app(scope, receive, send) -> None:
+    return None
+
+
+async def _time_calls(app, scope: dict[str, Any], iterations: int) -> float:
+    start = time.perf_counter()
+    for _ in range(iterations):
+        await app(scope, None, None)
+    return (time.perf_counter() - start) / iterations
+
+
+def bench_profiler_overhead(iterations: int = 200000) -> dict[str, float]:
+    scope = {"type": "http", "path": "/predict-all"}
+    direct = asyncio.run(_time_calls(_noop_app, scope, iterations))
+    wrapped = asyncio.run(_time_calls(ProfilingMiddleware(_noop_app), scope, iterations))
+    return {
+        "direct_call_ns": direct * 1e9,
+        "profiler_off_call_ns": wrapped * 1e9,
+        "profiler_off_overhead_ns": (wrapped - direct) * 1e9,
+    }
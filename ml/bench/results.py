@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import json
+import os
+import platform
+import subprocess
+import time
+from typing import Any
+
+RESULTS_DIR = "ml/bench/results"
+
+# Metrics where a larger value is a regression; every other numeric metric
+# (rps, rows_per_second) regresses when it drops.
+LOWER_IS_BETTER = ("_ms", "_seconds", "_bytes", "errors")
+
+
+def _git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def environment() -> dict[str, Any]:
+    info: dict[str, Any] = {
+        "git_revision": _git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+    }
+    for module in ("numpy", "sklearn", "fastapi", "onnxruntime"):
+        try:
+            info[module] = __import__(module).__version__
+        except ImportError:
+            info[module] = None
+    return info
+
+
+def save_results(results: dict[str, Any], output_dir: str = RESULTS_DIR) -> str:
+    os.makedirs(output_dir, exist_ok=True)
+    env = environment()
+    path = os.path.join(output_dir, f"{time.strftime('%Y%m%dT%H%M%S')}-{env['git_revision']}.json")
+    with open(path, "w") as handle:
+        json.dump({"environment": env, "results": results}, handle, indent=2, sort_keys=True)
+    return path
+
+
+def flatten(results: Any, prefix: str = "") -> dict[str, float]:
+    flat: dict[str, float] = {}
+    if isinstance(results, dict):
+        for key, value in results.items():
+            flat.update(flatten(value, f"{prefix}.{key}" if prefix else str(key)))
+    elif isinstance(results, (int, float)) and not isinstance(results, bool):
+        flat[prefix] = float(results)
+    return flat
+
+
+def compare(baseline_path: str, candidate_path: str, threshold: float = 0.10) -> list[str]:
+    with open(baseline_path) as handle:
+        baseline = flatten(json.load(handle)["results"])
+    with open(candidate_path) as handle:
+        candidate = flatten(json.load(handle)["results"])
+    regressions = []
+    for key in sorted(baseline.keys() & candidate.keys()):
+        before, after = baseline[key], candidate[key]
+        if before == 0:
+            continue
+        change = (after - before) / abs(before)
+        lower_is_better = key.endswith(LOWER_IS_BETTER)
+        regressed = change > threshold if lower_is_better else change < -threshold
+        marker = "REGRESSION" if regressed else ""
+        print(f"{key:70s} {before:14.3f} -> {after:14.3f} ({change:+.1%}) {marker}")
+        if regressed:
+            regressions.append(key)
+    return regressions
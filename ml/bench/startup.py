@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any
+
+import requests
+
+from ml.bench.load import wait_ready
+
+# Modules the serving import path should not pull in; each is imported on
+# first use by the route or loader that needs it.
+DEFERRED_MODULES = ("pandas", "sklearn", "joblib", "requests", "scipy")
+
+IMPORT_SCRIPT = """
+import sys, time
+start = time.perf_counter()
+import ml.api_server
+print(time.perf_counter() - start)
+print(",".join(m for m in {modules!r} if m in sys.modules))
+"""
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _poll(url: str, deadline: float) -> bool:
+    while time.perf_counter() < deadline:
+        try:
+            if requests.get(url, timeout=1).status_code == 200:
+                return True
+        except requests.ConnectionError:
+            pass
+        time.sleep(0.005)
+    return False
+
+
+def measure_import() -> tuple[float, list[str]]:
+    script = IMPORT_SCRIPT.format(modules=DEFERRED_MODULES)
+    output = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True).stdout
+    seconds, loaded = output.splitlines()[:2]
+    return float(seconds), [module for module in loaded.split(",") if module]
+
+
+def measure_cold_start(timeout: float = 120.0) -> dict[str, float]:
+    # Wall time from spawning a uvicorn process to the first 200 from
+    # /healthz (port bound) and to model loading finishing (/readyz ready or
+    # degraded).
+    port = _free_port()
+    command = [sys.executable, "-m", "uvicorn", "ml.api_server:app", "--port", str(port), "--log-level", "warning"]
+    start = time.perf_counter()
+    process = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        base_url = f"http://127.0.0.1:{port}"
+        if not _poll(base_url + "/healthz", start + timeout):
+            raise TimeoutError(f"uvicorn did not answer /healthz within {timeout:.0f}s")
+        live = time.perf_counter() - start
+        wait_ready(base_url, start + timeout - time.perf_counter())
+        ready = time.perf_counter() - start
+    finally:
+        process.terminate()
+        process.wait(timeout=30)
+    return {"live_seconds": live, "ready_seconds": ready}
+
+
+def bench_startup(repeats: int = 5, budget_seconds: float = 2.0) -> dict[str, Any]:
+    # Medians over fresh processes; the budget applies to time-to-healthy,
+    # which is what an orchestrator's startup probe waits for.
+    imports, colds, leaked = [], [], set()
+    for _ in range(repeats):
+        seconds, loaded = measure_import()
+        imports.append(seconds)
+        leaked.update(loaded)
+        colds.append(measure_cold_start())
+    results = {
+        "import_seconds": statistics.median(imports),
+        "live_seconds": statistics.median(run["live_seconds"] for run in colds),
+        "ready_seconds": statistics.median(run["ready_seconds"] for run in colds),
+        "budget_seconds": budget_seconds,
+        "eager_imports": sorted(leaked),
+    }
+    results["within_budget"] = results["live_seconds"] <= budget_seconds
+    print(
+        f"import {results['import_seconds']:.2f}s  healthy {results['live_seconds']:.2f}s  "
+        f"ready {results['ready_seconds']:.2f}s  (budget {budget_seconds:.1f}s to healthy: "
+        f"{'ok' if results['within_budget'] else 'OVER'})"
+    )
+    if leaked:
+        print(f"serving import pulled in: {', '.join(sorted(leaked))}")
+    return results
@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SAMPLE_CITY = {
+    "weather": {
+        "currentTemperature": 31.0,
+        "humidity": 62.0,
+        "windSpeed": 12.0,
+        "currentRainfall": 8.0,
+        "rainfallLast12Months": [120.0] * 12,
+        "recentStormOrFlood": False,
+        "aqi": 165.0,
+    },
+    "transportation": {
+        "busesOperating": 240,
+        "totalBuses": 300,
+        "busRoutesCongested": ["west", "central"],
+        "avgVehiclesPerHour": 6800,
+        "peakHourMultiplier": 1.6,
+    },
+    "agriculture": {
+        "cropYieldLastYear": 85.0,
+        "currentStockLevel": 55.0,
+        "supplyChainEfficiency": 78.0,
+        "importDependency": 18.0,
+    },
+    "energy": {
+        "currentUsageMW": 1050.0,
+        "avgUsageLastYear": 920.0,
+        "peakDemandMW": 1250.0,
+        "gridStability": 88.0,
+        "renewablePercentage": 24.0,
+    },
+    "publicServices": {
+        "roadsNeedingRepair": 22,
+        "waterSupplyLevel": 64.0,
+        "sewerSystemHealth": 78.0,
+        "emergencyResponseTime": 14.0,
+        "pendingMaintenanceTasks": 35,
+    },
+}
+
+SAMPLE_OUTPUTS = {
+    "waterShortageLevel": 60.0,
+    "trafficCongestionLevel": 72.0,
+    "foodPriceChangePercent": 12.5,
+    "energyPriceChangePercent": 11.0,
+    "publicCleanupNeeded": 65.0,
+    "healthStatus": 33.0,
+}
+
+STUB_LLM_TEXT = (
+    "- WATER RATIONING: Supply cut to 4 hours daily; tanker schedule activated.\n"
+    "- TRAVEL ADVISORY: Heavy congestion on west and central corridors; use public transit.\n"
+    "- ENERGY NOTICE: Shift heavy appliance use outside the evening peak."
+)
+
+STUB_WEATHER = {
+    "coord": {"lat": 28.61, "lon": 77.21},
+    "main": {"temp": 31.0, "humidity": 62},
+    "wind": {"speed": 3.2},
+    "rain": {"1h": 2.5},
+}
+
+STUB_AIR_POLLUTION = {"list": [{"main": {"aqi": 3}}]}
+
+
+def install_stub_llm(delay_seconds: float = 0.0) -> None:
+    from ml import api_server
+
+    def _stub_call_local_llm(messages, **kwargs):
+        if delay_seconds:
+            time.sleep(delay_seconds)
+        return STUB_LLM_TEXT
+
+    api_server._call_local_llm = _stub_call_local_llm
+
+
+class _OpenWeatherHandler(BaseHTTPRequestHandler):
+    delay_seconds = 0.0
+
+    def do_GET(self) -> None:
+        if self.delay_seconds:
+            time.sleep(self.delay_seconds)
+        if self.path.startswith("/data/2.5/weather"):
+            body = STUB_WEATHER
+        elif self.path.startswith("/data/2.5/air_pollution"):
+            body = STUB_AIR_POLLUTION
+        else:
+            self.send_error(404)
+            return
+        payload = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format: str, *args) -> None:
+        pass
+
+
+def start_stub_openweather(delay_seconds: float = 0.0) -> tuple[ThreadingHTTPServer, str]:
+    handler = type("StubOpenWeatherHandler", (_OpenWeatherHandler,), {"delay_seconds": delay_seconds})
+    server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address[:2]
+    return server, f"http://{host}:{port}"
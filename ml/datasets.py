@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import os
+from typing import Callable, Iterator, NamedTuple
+
+import numpy as np
+import pandas as pd
+
+from ml.generate_agriculture_data import build_agriculture_dataset, generate_synthetic_agriculture_rows
+from ml.generate_energy_data import build_energy_dataset, generate_synthetic_energy_rows
+from ml.generate_public_services_data import (
+    build_public_services_dataset,
+    generate_synthetic_public_services_rows,
+)
+from ml.generate_transportation_data import (
+    build_transportation_dataset,
+    generate_synthetic_transportation_rows,
+)
+from ml.schema import read_table
+from ml.weather_data_pipeline import build_weather_dataset, generate_synthetic_weather_rows
+
+
+class DatasetSource(NamedTuple):
+    name: str
+    path: str
+    builder: Callable[..., pd.DataFrame]
+    row_generator: Callable[..., pd.DataFrame]
+
+
+DATASETS: dict[str, DatasetSource] = {
+    "weather": DatasetSource(
+        "weather", "ml/data/weather_data.csv", build_weather_dataset, generate_synthetic_weather_rows
+    ),
+    "transportation": DatasetSource(
+        "transportation",
+        "ml/data/transportation_data.csv",
+        build_transportation_dataset,
+        generate_synthetic_transportation_rows,
+    ),
+    "agriculture": DatasetSource(
+        "agriculture",
+        "ml/data/agriculture_data.csv",
+        build_agriculture_dataset,
+        generate_synthetic_agriculture_rows,
+    ),
+    "energy": DatasetSource(
+        "energy", "ml/data/energy_data.csv", build_energy_dataset, generate_synthetic_energy_rows
+    ),
+    "public_services": DatasetSource(
+        "public_services",
+        "ml/data/public_services_data.csv",
+        build_public_services_dataset,
+        generate_synthetic_public_services_rows,
+    ),
+}
+
+
+def ensure_dataset(name: str) -> str:
+    source = DATASETS[name]
+    if not os.path.exists(source.path):
+        seed = os.getenv("ML_DATASET_SEED")
+        if seed:
+            from ml.parallel_generation import build_dataset_parallel
+
+            build_dataset_parallel(name, master_seed=int(seed), output_path=source.path)
+        else:
+            source.builder(output_path=source.path)
+    return source.path
+
+
+def count_rows(path: str) -> int:
+    rows = 0
+    with open(path, "rb") as handle:
+        for block in iter(lambda: handle.read(1 << 20), b""):
+            rows += block.count(b"\n")
+    # Header line is not a sample.
+    return max(rows - 1, 0)
+
+
+def hash_sample_ids(sample_ids: np.ndarray) -> np.ndarray:
+    # Multiplicative hash of sample_id into [0, 2**32): stable index-based
+    # splits and folds without shuffling or copying the dataset.
+    return (sample_ids.astype(np.uint64) * np.uint64(2654435761)) & np.uint64(0xFFFFFFFF)
+
+
+def iter_merged_chunks(sources: tuple[str, ...], chunksize: int) -> Iterator[pd.DataFrame]:
+    # Every generator writes sample_id 0..n-1 in order, so the k-th chunk of each
+    # source covers the same sample_id range and can be merged without a global join.
+    readers = [read_table(ensure_dataset(name), name, chunksize=chunksize) for name in sources]
+    try:
+        for parts in zip(*readers):
+            merged = parts[0]
+            for part in parts[1:]:
+                merged = pd.merge(merged, part, on="sample_id", how="inner")
+            yield merged
+    finally:
+        for reader in readers:
+            reader.close()
@@ -0,0 +1,155 @@
+from __future__ import annotations
+
+import importlib
+from typing import Callable, Literal, NamedTuple
+
+
+class Domain(NamedTuple):
+    name: str
+    task: Literal["regression", "classification"]
+    sources: tuple[str, ...]
+    feature_columns: tuple[str, ...]
+    label_column: str
+    trainer_module: str
+    label_function: str
+    model_path: str
+    classes: tuple[int, ...] = ()
+
+
+WATER_FEATURES = (
+    "rainfall_last_12_months_mm",
+    "rainfall_mm",
+    "recent_storm_or_flood",
+    "water_supply_level",
+)
+
+TRAFFIC_FEATURES = (
+    "wind_speed_kmh",
+    "rainfall_mm",
+    "recent_storm_or_flood",
+    "aqi",
+    "buses_operating",
+    "avg_vehicles_per_hour",
+    "peak_hour_multiplier",
+    "congested_west",
+    "congested_south",
+    "congested_east",
+    "congested_north",
+    "congested_central",
+    "roads_needing_repair",
+)
+
+FOOD_FEATURES = (
+    "rainfall_mm",
+    "rainfall_last_12_months_mm",
+    "crop_yield_last_year",
+    "current_stock_level",
+    "supply_chain_efficiency",
+    "import_dependency",
+    "recent_storm_or_flood",
+)
+
+ENERGY_FEATURES = (
+    "current_usage_mw",
+    "avg_usage_last_year",
+    "peak_demand_mw",
+    "grid_stability",
+    "renewable_percentage",
+    "recent_storm_or_flood",
+)
+
+PUBLIC_FEATURES = (
+    "roads_needing_repair",
+    "water_supply_level",
+    "sewer_system_health",
+    "emergency_response_time",
+    "pending_maintenance_tasks",
+    "recent_storm_or_flood",
+)
+
+HEALTH_FEATURES = (
+    "temperature_c",
+    "rainfall_mm",
+    "aqi",
+    "recent_storm_or_flood",
+    "sewer_system_health",
+    "emergency_response_time",
+)
+
+
+DOMAINS: dict[str, Domain] = {
+    "water": Domain(
+        name="water",
+        task="regression",
+        sources=("weather", "public_services"),
+        feature_columns=WATER_FEATURES,
+        label_column="shortage_level",
+        trainer_module="ml.train_water_model",
+        label_function="compute_water_shortage_level",
+        model_path="ml/models/water_shortage_random_forest.joblib",
+    ),
+    "traffic": Domain(
+        name="traffic",
+        task="regression",
+        sources=("weather", "transportation", "public_services"),
+        feature_columns=TRAFFIC_FEATURES,
+        label_column="congestion_level",
+        trainer_module="ml.train_traffic_model",
+        label_function="compute_congestion_label",
+        model_path="ml/models/traffic_random_forest.joblib",
+    ),
+    "food": Domain(
+        name="food",
+        task="regression",
+        sources=("weather", "agriculture", "public_services"),
+        feature_columns=FOOD_FEATURES,
+        label_column="price_change_percent",
+        trainer_module="ml.train_food_price_model",
+        label_function="compute_food_price_change",
+        model_path="ml/models/food_price_random_forest.joblib",
+    ),
+    "energy": Domain(
+        name="energy",
+        task="regression",
+        sources=("energy", "weather"),
+        feature_columns=ENERGY_FEATURES,
+        label_column="price_change_percent",
+        trainer_module="ml.train_energy_price_model",
+        label_function="compute_energy_price_change",
+        model_path="ml/models/energy_price_random_forest.joblib",
+    ),
+    "public": Domain(
+        name="public",
+        task="classification",
+        sources=("weather", "public_services"),
+        feature_columns=PUBLIC_FEATURES,
+        label_column="cleanup_needed",
+        trainer_module="ml.train_public_services_model",
+        label_function="compute_cleanup_needed",
+        model_path="ml/models/public_services_random_forest.joblib",
+        classes=(0, 1),
+    ),
+    "health": Domain(
+        name="health",
+        task="classification",
+        sources=("weather", "public_services"),
+        feature_columns=HEALTH_FEATURES,
+        label_column="health_status",
+        trainer_module="ml.train_health_model",
+        label_function="compute_health_status",
+        model_path="ml/models/health_random_forest.joblib",
+        classes=(0, 1, 2, 3),
+    ),
+}
+
+
+def get_domain(name: str) -> Domain:
+    try:
+        return DOMAINS[name]
+    except KeyError:
+        raise ValueError(f"Unknown domain {name!r}; expected one of {sorted(DOMAINS)}") from None
+
+
+def load_label_function(domain: Domain) -> Callable:
+    module = importlib.import_module(domain.trainer_module)
+    return getattr(module, domain.label_function)
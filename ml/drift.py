@@ -0,0 +1,308 @@
+from __future__ import annotations
+
+import argparse
+import json
+import math
+import operator
+import os
+import threading
+import time
+from typing import Any, Mapping
+
+import numpy as np
+
+from ml.domains import DOMAINS, Domain, get_domain
+from ml.metrics import REGISTRY, CallbackMetric, Counter
+from ml.schema import column_spec
+
+N_BINS = 20
+# Population stability index above this marks a feature as drifted (the
+# usual "significant shift" cut-off).
+PSI_THRESHOLD = 0.2
+# A request value landing in a bin that held less than this share of the
+# training rows is flagged as rare.
+RARE_FRACTION = 0.001
+
+INPUT_REQUESTS = REGISTRY.register(
+    Counter("ml_input_requests_total", "Monitored requests by whether any input was flagged.", ("result",))
+)
+INPUT_FLAGS = REGISTRY.register(
+    Counter("ml_input_flags_total", "Request inputs outside the schema range or rare in training.", ("feature", "flag"))
+)
+
+
+class FeatureSketch:
+    # Running moments plus N_BINS fixed-width bins over the schema range,
+    # with one underflow and one overflow bin at either end. NaN and inf
+    # count in the overflow bin but stay out of the moments.
+
+    def __init__(self, low: float, high: float, bins: int = N_BINS) -> None:
+        self.low = float(low)
+        self.high = float(high)
+        self.bins = bins
+        self.scale = bins / (self.high - self.low) if self.high > self.low else 0.0
+        self.counts = [0] * (bins + 2)
+        self.count = 0
+        self.total = 0.0
+        self.total_sq = 0.0
+
+    def bin_of(self, value: float) -> int:
+        if not math.isfinite(value):
+            return self.bins + 1
+        if value < self.low:
+            return 0
+        if value > self.high:
+            return self.bins + 1
+        return 1 + min(int((value - self.low) * self.scale), self.bins - 1)
+
+    def add(self, value: float) -> int:
+        index = self.bin_of(value)
+        self.counts[index] += 1
+        self.count += 1
+        if math.isfinite(value):
+            self.total += value
+            self.total_sq += value * value
+        return index
+
+    def update(self, values: np.ndarray) -> None:
+        values = np.asarray(values, dtype=np.float64)
+        finite = np.isfinite(values)
+        values = np.where(finite, values, self.low)
+        index = np.clip(((values - self.low) * self.scale).astype(np.int64), 0, self.bins - 1) + 1
+        index[values < self.low] = 0
+        index[(values > self.high) | ~finite] = self.bins + 1
+        added = np.bincount(index, minlength=self.bins + 2).tolist()
+        self.counts = [a + b for a, b in zip(self.counts, added)]
+        self.count += len(values)
+        values = values[finite]
+        self.total += float(values.sum())
+        self.total_sq += float(np.square(values).sum())
+
+    def merge(self, other: FeatureSketch) -> None:
+        self.counts = [a + b for a, b in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.total += other.total
+        self.total_sq += other.total_sq
+
+    def mean(self) -> float:
+        return self.total / self.count if self.count else float("nan")
+
+    def std(self) -> float:
+        if not self.count:
+            return float("nan")
+        return math.sqrt(max(self.total_sq / self.count - self.mean() ** 2, 0.0))
+
+    def fractions(self) -> np.ndarray:
+        counts = np.asarray(self.counts, dtype=np.float64)
+        return counts / counts.sum() if self.count else counts
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "low": self.low,
+            "high": self.high,
+            "counts": self.counts,
+            "count": self.count,
+            "sum": self.total,
+            "sumSq": self.total_sq,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Mapping[str, Any]) -> FeatureSketch:
+        sketch = cls(data["low"], data["high"], len(data["counts"]) - 2)
+        sketch.counts = list(data["counts"])
+        sketch.count = data["count"]
+        sketch.total = data["sum"]
+        sketch.total_sq = data["sumSq"]
+        return sketch
+
+
+def empty_sketch(column: str) -> FeatureSketch:
+    spec = column_spec(column)
+    return FeatureSketch(spec.low, spec.high)
+
+
+def psi(expected: FeatureSketch, actual: FeatureSketch, floor: float = 1e-4) -> float:
+    # Population stability index over the shared bins; empty bins are floored
+    # so a bin missing on one side does not make the index infinite.
+    e = np.maximum(expected.fractions(), floor)
+    a = np.maximum(actual.fractions(), floor)
+    return float(np.sum((a - e) * np.log(a / e)))
+
+
+def profile_path(model_path: str) -> str:
+    # Stored next to the model artifact, e.g. ml/models/traffic_random_forest.profile.json.
+    return os.path.splitext(model_path)[0] + ".profile.json"
+
+
+def build_profile(domain: Domain, chunksize: int = 200000) -> dict[str, FeatureSketch]:
+    from ml.datasets import iter_merged_chunks
+
+    sketches = {column: empty_sketch(column) for column in domain.feature_columns}
+    for chunk in iter_merged_chunks(domain.sources, chunksize):
+        for column, sketch in sketches.items():
+            sketch.update(chunk[column].to_numpy())
+    return sketches
+
+
+def write_profile(domain: Domain, chunksize: int = 200000, model_path: str | None = None) -> str:
+    path = profile_path(model_path or domain.model_path)
+    sketches = build_profile(domain, chunksize)
+    with open(path, "w", encoding="utf-8") as handle:
+        json.dump({"model": domain.name, "columns": {c: s.to_dict() for c, s in sketches.items()}}, handle)
+    return path
+
+
+def load_profiles() -> dict[str, FeatureSketch]:
+    # Training sketch per feature column, taken from the first model whose
+    # profile covers it (models sharing a column were trained on the same table).
+    reference: dict[str, FeatureSketch] = {}
+    for domain in DOMAINS.values():
+        path = profile_path(domain.model_path)
+        if not os.path.exists(path):
+            continue
+        with open(path, encoding="utf-8") as handle:
+            columns = json.load(handle)["columns"]
+        for column, data in columns.items():
+            reference.setdefault(column, FeatureSketch.from_dict(data))
+    return reference
+
+
+class DriftMonitor:
+    # Folds every request's feature row into live sketches and flags values
+    # outside the schema range or in bins that were (nearly) empty in
+    # training. Live sketches cover the current and the previous window, so
+    # drift reflects recent traffic rather than everything since start-up.
+
+    def __init__(self, reference: Mapping[str, FeatureSketch], window_seconds: float = 3600.0) -> None:
+        self.reference = dict(reference)
+        self.columns = tuple(sorted({column for domain in DOMAINS.values() for column in domain.feature_columns}))
+        self.window_seconds = window_seconds
+        self._values_of = operator.itemgetter(*self.columns)
+        # Live windows are (columns, bins) count arrays plus per-column sums,
+        # so a request is binned and folded in with a handful of vector ops.
+        sketches = [empty_sketch(column) for column in self.columns]
+        self._low = np.array([sketch.low for sketch in sketches])
+        self._high = np.array([sketch.high for sketch in sketches])
+        self._scale = np.array([sketch.scale for sketch in sketches])
+        self._rows = np.arange(len(self.columns))
+        self._flag_bins = np.zeros((len(self.columns), N_BINS + 2), dtype=bool)
+        self._flag_bins[:, [0, -1]] = True
+        for row, column in enumerate(self.columns):
+            if column in self.reference:
+                self._flag_bins[row] |= self.reference[column].fractions() < RARE_FRACTION
+        self._lock = threading.Lock()
+        self._current = self._empty_window()
+        self._previous = self._empty_window()
+        self._rotate_at = time.monotonic() + window_seconds
+
+    def _empty_window(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        n = len(self.columns)
+        return np.zeros((n, N_BINS + 2), dtype=np.int64), np.zeros(n), np.zeros(n)
+
+    @classmethod
+    def from_env(cls) -> DriftMonitor | None:
+        if os.getenv("ML_DRIFT_MONITOR", "1") == "0":
+            return None
+        return cls(load_profiles(), float(os.getenv("ML_DRIFT_WINDOW_SECONDS", "3600")))
+
+    def observe(self, row: Mapping[str, float]) -> list[tuple[str, str]]:
+        values = np.array(self._values_of(row), dtype=np.float64)
+        # NaN and inf go to the overflow bin and are flagged as non_finite;
+        # they are left out of the moments so one request cannot poison them.
+        finite = np.isfinite(values)
+        if not finite.all():
+            values = np.where(finite, values, self._low)
+        index = np.minimum(((values - self._low) * self._scale).astype(np.int64), N_BINS - 1) + 1
+        index[values < self._low] = 0
+        index[(values > self._high) | ~finite] = N_BINS + 1
+        with self._lock:
+            if time.monotonic() >= self._rotate_at:
+                self._previous = self._current
+                self._current = self._empty_window()
+                self._rotate_at = time.monotonic() + self.window_seconds
+            counts, totals, totals_sq = self._current
+            counts[self._rows, index] += 1
+            totals += np.where(finite, values, 0.0)
+            totals_sq += np.where(finite, values * values, 0.0)
+        flags = []
+        for row_index in np.flatnonzero(self._flag_bins[self._rows, index]).tolist():
+            column = self.columns[row_index]
+            if not finite[row_index]:
+                flag = "non_finite"
+            elif index[row_index] in (0, N_BINS + 1):
+                flag = "out_of_range"
+            else:
+                flag = "rare"
+            flags.append((column, flag))
+            INPUT_FLAGS.inc(feature=column, flag=flag)
+        INPUT_REQUESTS.inc(result="flagged" if flags else "clean")
+        return flags
+
+    def live(self) -> dict[str, FeatureSketch]:
+        with self._lock:
+            counts = self._current[0] + self._previous[0]
+            totals = self._current[1] + self._previous[1]
+            totals_sq = self._current[2] + self._previous[2]
+        live = {}
+        for row, column in enumerate(self.columns):
+            sketch = live[column] = empty_sketch(column)
+            sketch.counts = counts[row].tolist()
+            sketch.count = int(counts[row].sum())
+            sketch.total = float(totals[row])
+            sketch.total_sq = float(totals_sq[row])
+        return live
+
+    def report(self) -> dict[str, dict[str, float]]:
+        live = self.live()
+        report = {}
+        for column, reference in self.reference.items():
+            sketch = live[column]
+            if not sketch.count:
+                continue
+            std = reference.std()
+            report[column] = {
+                "psi": psi(reference, sketch),
+                "meanShift": (sketch.mean() - reference.mean()) / std if std > 0 else 0.0,
+                "outOfRangeFraction": (sketch.counts[0] + sketch.counts[-1]) / sketch.count,
+            }
+        return report
+
+    def register_metrics(self) -> None:
+        REGISTRY.register(
+            CallbackMetric(
+                "ml_input_drift_psi",
+                "Population stability index of recent inputs against the training profile.",
+                "gauge",
+                ("feature",),
+                lambda: [((column,), stats["psi"]) for column, stats in self.report().items()],
+            )
+        )
+        REGISTRY.register(
+            CallbackMetric(
+                "ml_input_mean_shift",
+                "Recent input mean minus training mean, in training standard deviations.",
+                "gauge",
+                ("feature",),
+                lambda: [((column,), stats["meanShift"]) for column, stats in self.report().items()],
+            )
+        )
+        REGISTRY.register(
+            CallbackMetric(
+                "ml_input_drifted_features",
+                f"Features whose recent PSI exceeds {PSI_THRESHOLD}.",
+                "gauge",
+                (),
+                lambda: [((), sum(stats["psi"] > PSI_THRESHOLD for stats in self.report().values()))],
+            )
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write training-data input profiles next to the model artifacts.")
+    parser.add_argument("domains", nargs="*", default=sorted(DOMAINS), help="default: all")
+    parser.add_argument("--chunksize", type=int, default=200000)
+    args = parser.parse_args()
+    for name in args.domains:
+        start = time.perf_counter()
+        path = write_profile(get_domain(name), args.chunksize)
+        print(f"Wrote {path} in {time.perf_counter() - start:.1f}s")
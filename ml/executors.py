@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import asyncio
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+from ml.metrics import REGISTRY, Counter, Gauge
+
+ADMISSION_REJECTED = REGISTRY.register(
+    Counter("ml_admission_rejected_total", "Requests rejected by admission control.", ("workload",))
+)
+EXECUTOR_PENDING = REGISTRY.register(
+    Gauge("ml_executor_pending", "Admitted requests running or queued per workload.", ("workload",))
+)
+
+
+class Overloaded(Exception):
+    def __init__(self, workload: str, status_code: int, retry_after: int) -> None:
+        super().__init__(f"{workload} workload is at capacity")
+        self.workload = workload
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class WorkloadExecutor:
+    # A dedicated thread pool per workload class with a bounded queue. Work
+    # beyond max_workers + max_queue is rejected up front (429 + Retry-After)
+    # instead of waiting behind other workloads in Starlette's shared pool.
+
+    def __init__(self, name: str, max_workers: int, max_queue: int) -> None:
+        self.name = name
+        self.max_workers = max_workers
+        self.capacity = max_workers + max_queue
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"{name}-worker")
+        self._pending = 0
+        self._avg_seconds = 0.0
+        self._closed = False
+        self._lock = threading.Lock()
+
+    def _retry_after(self) -> int:
+        backlog = max(self._pending - self.max_workers + 1, 1)
+        return max(1, math.ceil(self._avg_seconds * backlog / self.max_workers))
+
+    def _admit(self) -> None:
+        with self._lock:
+            if self._closed:
+                raise Overloaded(self.name, 503, self._retry_after())
+            if self._pending >= self.capacity:
+                ADMISSION_REJECTED.inc(workload=self.name)
+                raise Overloaded(self.name, 429, self._retry_after())
+            self._pending += 1
+            EXECUTOR_PENDING.set(self._pending, workload=self.name)
+
+    def _release(self, seconds: float | None) -> None:
+        with self._lock:
+            self._pending -= 1
+            EXECUTOR_PENDING.set(self._pending, workload=self.name)
+            if seconds is not None:
+                self._avg_seconds = seconds if self._avg_seconds == 0.0 else 0.9 * self._avg_seconds + 0.1 * seconds
+
+    @staticmethod
+    def _timed(fn: Callable[..., Any], timing: list[float], *args: Any) -> Any:
+        start = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            timing.append(time.perf_counter() - start)
+
+    async def run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        self._admit()
+        timing: list[float] = []
+        try:
+            future = self._pool.submit(self._timed, fn, timing, *args)
+        except RuntimeError:
+            self._release(None)
+            raise Overloaded(self.name, 503, 1) from None
+        # Released once the future settles, including when it is cancelled
+        # while still queued (client disconnect, shutdown(cancel_futures=True))
+        # and _timed never runs.
+        future.add_done_callback(lambda _: self._release(timing[0] if timing else None))
+        return await asyncio.wrap_future(future)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            self._closed = True
+        self._pool.shutdown(wait=False, cancel_futures=True)
@@ -1,19 +1,25 @@
 import os
 import random
+from typing import Optional
 
 import pandas as pd
 
+from ml.schema import apply_schema, violation_mode
 
-def generate_synthetic_agriculture_rows(n_rows: int) -> pd.DataFrame:
+
+def generate_synthetic_agriculture_rows(
+    n_rows: int, rng: Optional[random.Random] = None, start_id: int = 0
+) -> pd.DataFrame:
+    rng = random if rng is None else rng
     rows = []
     for i in range(n_rows):
-        crop_yield_last_year = random.randint(50, 110)
-        current_stock_level = random.randint(20, 100)
-        supply_chain_efficiency = random.randint(50, 100)
-        import_dependency = random.randint(5, 40)
+        crop_yield_last_year = rng.randint(50, 110)
+        current_stock_level = rng.randint(20, 100)
+        supply_chain_efficiency = rng.randint(50, 100)
+        import_dependency = rng.randint(5, 40)
         rows.append(
             {
-                "sample_id": i,
+                "sample_id": start_id + i,
                 "crop_yield_last_year": crop_yield_last_year,
                 "current_stock_level": current_stock_level,
                 "supply_chain_efficiency": supply_chain_efficiency,
@@ -28,6 +34,7 @@ def build_agriculture_dataset(
 ) -> pd.DataFrame:
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
     df = generate_synthetic_agriculture_rows(n_rows)
+    df = apply_schema(df, "agriculture", on_violation=violation_mode())
     df.to_csv(output_path, index=False)
     return df
 
@@ -1,20 +1,26 @@
 import os
 import random
+from typing import Optional
 
 import pandas as pd
 
+from ml.schema import apply_schema, violation_mode
 
-def generate_synthetic_energy_rows(n_rows: int) -> pd.DataFrame:
+
+def generate_synthetic_energy_rows(
+    n_rows: int, rng: Optional[random.Random] = None, start_id: int = 0
+) -> pd.DataFrame:
+    rng = random if rng is None else rng
     rows = []
     for i in range(n_rows):
-        avg_usage_last_year = random.randint(700, 1100)
-        current_usage_mw = random.randint(600, 1300)
-        peak_demand_mw = random.randint(900, 1500)
-        grid_stability = random.randint(75, 100)
-        renewable_percentage = random.randint(10, 40)
+        avg_usage_last_year = rng.randint(700, 1100)
+        current_usage_mw = rng.randint(600, 1300)
+        peak_demand_mw = rng.randint(900, 1500)
+        grid_stability = rng.randint(75, 100)
+        renewable_percentage = rng.randint(10, 40)
         rows.append(
             {
-                "sample_id": i,
+                "sample_id": start_id + i,
                 "current_usage_mw": current_usage_mw,
                 "avg_usage_last_year": avg_usage_last_year,
                 "peak_demand_mw": peak_demand_mw,
@@ -28,6 +34,7 @@ def generate_synthetic_energy_rows(n_rows: int) -> pd.DataFrame:
 def build_energy_dataset(n_rows: int = 200000, output_path: str = "ml/data/energy_data.csv") -> pd.DataFrame:
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
     df = generate_synthetic_energy_rows(n_rows)
+    df = apply_schema(df, "energy", on_violation=violation_mode())
     df.to_csv(output_path, index=False)
     return df
 
@@ -1,20 +1,26 @@
 import os
 import random
+from typing import Optional
 
 import pandas as pd
 
+from ml.schema import apply_schema, violation_mode
 
-def generate_synthetic_public_services_rows(n_rows: int) -> pd.DataFrame:
+
+def generate_synthetic_public_services_rows(
+    n_rows: int, rng: Optional[random.Random] = None, start_id: int = 0
+) -> pd.DataFrame:
+    rng = random if rng is None else rng
     rows = []
     for i in range(n_rows):
-        roads_needing_repair = random.randint(5, 50)
-        water_supply_level = random.randint(20, 100)
-        sewer_system_health = random.randint(60, 100)
-        emergency_response_time = random.randint(5, 25)
-        pending_maintenance_tasks = random.randint(10, 70)
+        roads_needing_repair = rng.randint(5, 50)
+        water_supply_level = rng.randint(20, 100)
+        sewer_system_health = rng.randint(60, 100)
+        emergency_response_time = rng.randint(5, 25)
+        pending_maintenance_tasks = rng.randint(10, 70)
         rows.append(
             {
-                "sample_id": i,
+                "sample_id": start_id + i,
                 "roads_needing_repair": roads_needing_repair,
                 "water_supply_level": water_supply_level,
                 "sewer_system_health": sewer_system_health,
@@ -28,6 +34,7 @@ def generate_synthetic_public_services_rows(n_rows: int) -> pd.DataFrame:
 def build_public_services_dataset(n_rows: int = 200000, output_path: str = "ml/data/public_services_data.csv") -> pd.DataFrame:
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
     df = generate_synthetic_public_services_rows(n_rows)
+    df = apply_schema(df, "public_services", on_violation=violation_mode())
     df.to_csv(output_path, index=False)
     return df
 
@@ -1,23 +1,29 @@
 import os
 import random
+from typing import Optional
 
 import pandas as pd
 
+from ml.schema import apply_schema, violation_mode
 
-def generate_synthetic_transportation_rows(n_rows: int) -> pd.DataFrame:
+
+def generate_synthetic_transportation_rows(
+    n_rows: int, rng: Optional[random.Random] = None, start_id: int = 0
+) -> pd.DataFrame:
+    rng = random if rng is None else rng
     rows = []
     for i in range(n_rows):
         total_buses = 300
-        buses_operating = random.randint(120, 280)
-        avg_vehicles = random.randint(3000, 9000)
-        peak_multiplier = random.randint(12, 22)
+        buses_operating = rng.randint(120, 280)
+        avg_vehicles = rng.randint(3000, 9000)
+        peak_multiplier = rng.randint(12, 22)
         routes = ["west", "south", "east", "north", "central"]
-        congested = {route: 1 if random.random() < 0.5 else 0 for route in routes}
+        congested = {route: 1 if rng.random() < 0.5 else 0 for route in routes}
         if sum(congested.values()) == 0:
-            congested[random.choice(routes)] = 1
+            congested[rng.choice(routes)] = 1
         rows.append(
             {
-                "sample_id": i,
+                "sample_id": start_id + i,
                 "buses_operating": buses_operating,
                 "total_buses": total_buses,
                 "avg_vehicles_per_hour": avg_vehicles,
@@ -35,6 +41,7 @@ def generate_synthetic_transportation_rows(n_rows: int) -> pd.DataFrame:
 def build_transportation_dataset(n_rows: int = 200000, output_path: str = "ml/data/transportation_data.csv") -> pd.DataFrame:
     os.makedirs(os.path.dirname(output_path), exist_ok=True)
     df = generate_synthetic_transportation_rows(n_rows)
+    df = apply_schema(df, "transportation", on_violation=violation_mode())
     df.to_csv(output_path, index=False)
     return df
 
@@ -0,0 +1,246 @@
+from __future__ import annotations
+
+import os
+from typing import Any, Mapping, NamedTuple
+
+import numpy as np
+
+from ml.domains import DOMAINS
+from ml.schema import FEATURE_DTYPE
+
+MODEL_NAMES = tuple(DOMAINS)
+
+OUTPUT_FIELDS = {
+    "water": "waterShortageLevel",
+    "traffic": "trafficCongestionLevel",
+    "food": "foodPriceChangePercent",
+    "energy": "energyPriceChangePercent",
+    "public": "publicCleanupNeeded",
+    "health": "healthStatus",
+}
+
+# Served when a model file is missing, matching the historical constants.
+FALLBACK_OUTPUTS = {
+    "water": 15.0,
+    "traffic": 40.0,
+    "food": 0.0,
+    "energy": 0.0,
+    "public": 0.0,
+    "health": 0.0,
+}
+
+HEALTH_STATUS_LEVELS = np.array([0.0, 33.0, 66.0, 100.0])
+
+CONGESTION_ROUTES = ("west", "south", "east", "north", "central")
+
+# CityInput field path -> model feature column. rainfallLast12Months maps to
+# its yearly total and busRoutesCongested to the five congested_* flags.
+FIELD_COLUMNS = {
+    "weather.currentTemperature": "temperature_c",
+    "weather.windSpeed": "wind_speed_kmh",
+    "weather.currentRainfall": "rainfall_mm",
+    "weather.rainfallLast12Months": "rainfall_last_12_months_mm",
+    "weather.recentStormOrFlood": "recent_storm_or_flood",
+    "weather.aqi": "aqi",
+    "transportation.busesOperating": "buses_operating",
+    "transportation.avgVehiclesPerHour": "avg_vehicles_per_hour",
+    "transportation.peakHourMultiplier": "peak_hour_multiplier",
+    "agriculture.cropYieldLastYear": "crop_yield_last_year",
+    "agriculture.currentStockLevel": "current_stock_level",
+    "agriculture.supplyChainEfficiency": "supply_chain_efficiency",
+    "agriculture.importDependency": "import_dependency",
+    "energy.currentUsageMW": "current_usage_mw",
+    "energy.avgUsageLastYear": "avg_usage_last_year",
+    "energy.peakDemandMW": "peak_demand_mw",
+    "energy.gridStability": "grid_stability",
+    "energy.renewablePercentage": "renewable_percentage",
+    "publicServices.roadsNeedingRepair": "roads_needing_repair",
+    "publicServices.waterSupplyLevel": "water_supply_level",
+    "publicServices.sewerSystemHealth": "sewer_system_health",
+    "publicServices.emergencyResponseTime": "emergency_response_time",
+    "publicServices.pendingMaintenanceTasks": "pending_maintenance_tasks",
+}
+
+
+class LoadedModel(NamedTuple):
+    name: str
+    estimator: Any
+    feature_columns: tuple[str, ...]
+    # Set for single-output sklearn forests scored in the calling thread.
+    trees: tuple[Any, ...] | None = None
+
+
+def load_model(name: str, path: str | None = None, backend: str | None = None) -> LoadedModel | None:
+    import joblib
+
+    # ML_MODEL_BACKEND=onnx serves the graphs exported by ml.onnx_backend,
+    # falling back to joblib for a model that has not been exported.
+    if (backend or os.getenv("ML_MODEL_BACKEND", "joblib")) == "onnx":
+        from ml.onnx_backend import load_onnx_model
+
+        model = load_onnx_model(name, path)
+        if model is not None:
+            return model
+    path = path or DOMAINS[name].model_path
+    if not os.path.exists(path):
+        return None
+    estimator = joblib.load(path)
+    # Trainers fit with n_jobs=-1, which makes every single-row predict pay
+    # for a joblib thread-pool dispatch. Serving parallelism lives outside
+    # the model, so predict runs in the calling thread.
+    if hasattr(estimator, "n_jobs"):
+        estimator.n_jobs = int(os.getenv("ML_MODEL_N_JOBS", "1"))
+    columns = tuple(getattr(estimator, "feature_names_in_", DOMAINS[name].feature_columns))
+    # Predict takes plain float32 arrays in `columns` order; dropping the fitted
+    # names avoids building a DataFrame per request just to silence the
+    # feature-name check.
+    if hasattr(estimator, "feature_names_in_"):
+        del estimator.feature_names_in_
+    return LoadedModel(name, estimator, columns, _forest_trees(estimator))
+
+
+def _forest_trees(estimator: Any) -> tuple[Any, ...] | None:
+    # Forest predict dispatches every tree through joblib even with n_jobs=1,
+    # about 0.1ms per tree; walking the trees directly makes a single-row
+    # predict of a 200-tree forest ~10x cheaper with identical results.
+    from sklearn.ensemble import (
+        ExtraTreesClassifier,
+        ExtraTreesRegressor,
+        RandomForestClassifier,
+        RandomForestRegressor,
+    )
+
+    forest_types = (RandomForestClassifier, RandomForestRegressor, ExtraTreesClassifier, ExtraTreesRegressor)
+    if not isinstance(estimator, forest_types) or estimator.n_outputs_ != 1:
+        return None
+    if estimator.n_jobs not in (None, 1):
+        return None
+    return tuple(estimator.estimators_)
+
+
+def load_models() -> dict[str, LoadedModel | None]:
+    return {name: load_model(name) for name in MODEL_NAMES}
+
+
+def required_columns(models: dict[str, LoadedModel | None]) -> set[str]:
+    return {column for model in models.values() if model is not None for column in model.feature_columns}
+
+
+def city_feature_row(city: Any) -> dict[str, float]:
+    w = city.weather
+    t = city.transportation
+    a = city.agriculture
+    e = city.energy
+    p = city.publicServices
+    congested_routes = set(t.busRoutesCongested)
+    row = {
+        "temperature_c": w.currentTemperature,
+        "wind_speed_kmh": w.windSpeed,
+        "rainfall_mm": w.currentRainfall,
+        "rainfall_last_12_months_mm": float(sum(w.rainfallLast12Months)),
+        "recent_storm_or_flood": 1 if w.recentStormOrFlood else 0,
+        "aqi": w.aqi,
+        "buses_operating": t.busesOperating,
+        "avg_vehicles_per_hour": t.avgVehiclesPerHour,
+        "peak_hour_multiplier": t.peakHourMultiplier,
+        "crop_yield_last_year": a.cropYieldLastYear,
+        "current_stock_level": a.currentStockLevel,
+        "supply_chain_efficiency": a.supplyChainEfficiency,
+        "import_dependency": a.importDependency,
+        "current_usage_mw": e.currentUsageMW,
+        "avg_usage_last_year": e.avgUsageLastYear,
+        "peak_demand_mw": e.peakDemandMW,
+        "grid_stability": e.gridStability,
+        "renewable_percentage": e.renewablePercentage,
+        "roads_needing_repair": p.roadsNeedingRepair,
+        "water_supply_level": p.waterSupplyLevel,
+        "sewer_system_health": p.sewerSystemHealth,
+        "emergency_response_time": p.emergencyResponseTime,
+        "pending_maintenance_tasks": p.pendingMaintenanceTasks,
+    }
+    for route in CONGESTION_ROUTES:
+        row[f"congested_{route}"] = 1 if route in congested_routes else 0
+    return row
+
+
+def feature_matrix(columns: tuple[str, ...], values: Mapping[str, Any], n_rows: int = 1) -> np.ndarray:
+    # values maps a feature column to a scalar (broadcast) or an (n_rows,) array.
+    X = np.empty((n_rows, len(columns)), dtype=FEATURE_DTYPE)
+    for index, column in enumerate(columns):
+        X[:, index] = values[column]
+    return X
+
+
+def _predict_proba(model: LoadedModel, X: np.ndarray) -> np.ndarray:
+    if model.trees is None:
+        return model.estimator.predict_proba(X)
+    # Same accumulation order as ForestClassifier.predict_proba.
+    proba = np.zeros((X.shape[0], len(model.estimator.classes_)), dtype=np.float64)
+    for tree in model.trees:
+        proba += tree.predict_proba(X, check_input=False)
+    proba /= len(model.trees)
+    return proba
+
+
+def _predict(model: LoadedModel, X: np.ndarray) -> np.ndarray:
+    if model.trees is None:
+        return np.asarray(model.estimator.predict(X))
+    if hasattr(model.estimator, "classes_"):
+        return model.estimator.classes_.take(np.argmax(_predict_proba(model, X), axis=1), axis=0)
+    # Same accumulation order as ForestRegressor.predict; a single-output
+    # regression tree's predict is tree_.predict(X)[:, 0].
+    y = np.zeros(X.shape[0], dtype=np.float64)
+    for tree in model.trees:
+        y += tree.tree_.predict(X)[:, 0]
+    y /= len(model.trees)
+    return y
+
+
+def predict_outputs(model: LoadedModel, X: np.ndarray) -> np.ndarray:
+    estimator = model.estimator
+    if model.name == "public":
+        proba = _predict_proba(model, X)
+        classes = list(estimator.classes_)
+        if 1 in classes:
+            return proba[:, classes.index(1)] * 100.0
+        return proba.max(axis=1) * 100.0
+    if model.name == "health":
+        health_class = _predict(model, X).astype(np.int64)
+        return HEALTH_STATUS_LEVELS[np.clip(health_class, 0, 3)]
+    return np.asarray(_predict(model, X), dtype=np.float64)
+
+
+def per_tree_outputs(model: LoadedModel, X: np.ndarray) -> np.ndarray:
+    # (n_trees, n_rows) outputs of the individual trees, mapped the same way
+    # as predict_outputs. Trees inside a forest predict encoded class indices.
+    estimator = model.estimator
+    trees = getattr(estimator, "estimators_", None)
+    if trees is None:
+        return predict_outputs(model, X)[np.newaxis, :]
+    if model.name == "public":
+        classes = list(estimator.classes_)
+        if 1 in classes:
+            column = classes.index(1)
+            return np.stack([tree.predict_proba(X, check_input=False)[:, column] for tree in trees]) * 100.0
+        return np.stack([tree.predict_proba(X, check_input=False).max(axis=1) for tree in trees]) * 100.0
+    if model.name == "health":
+        encoded = np.stack([tree.predict(X, check_input=False) for tree in trees]).astype(np.int64)
+        health_class = np.asarray(estimator.classes_)[encoded].astype(np.int64)
+        return HEALTH_STATUS_LEVELS[np.clip(health_class, 0, 3)]
+    return np.stack([tree.predict(X, check_input=False) for tree in trees]).astype(np.float64)
+
+
+def predict_batch(
+    models: Mapping[str, LoadedModel | None],
+    values: Mapping[str, Any],
+    n_rows: int,
+    names: tuple[str, ...] = MODEL_NAMES,
+) -> dict[str, np.ndarray]:
+    outputs = {}
+    for name in names:
+        model = models.get(name)
+        if model is None:
+            outputs[name] = np.full(n_rows, FALLBACK_OUTPUTS[name])
+        else:
+            outputs[name] = predict_outputs(model, feature_matrix(model.feature_columns, values, n_rows))
+    return outputs
@@ -0,0 +1,137 @@
+from __future__ import annotations
+
+import re
+from typing import Any
+
+from ml.metrics import REGISTRY, Counter
+
+MAX_LINES = 3
+MIN_BULLETS = 2
+# Substring matches, as before: "bullets", "lines" and "information" count.
+META_KEYWORDS = re.compile("bullet|line|format|example|instruction")
+STOP_MARKERS = re.compile("example input|example output")
+NUMBERED = re.compile(r"\d+\.")
+SKIP_PREFIXES = ("example:", "note:", "here are", "sure", "output:", "status:")
+
+GENERATIONS = REGISTRY.register(
+    Counter(
+        "ml_llm_generations_total",
+        "LLM generations by attempt (first, retry) and result (valid, a failure reason, error, skipped_budget).",
+        ("attempt", "result"),
+    )
+)
+TOKENS = REGISTRY.register(
+    Counter("ml_llm_tokens_total", "Generated LLM tokens by whether the text was served or discarded.", ("use",))
+)
+EARLY_STOPS = REGISTRY.register(
+    Counter(
+        "ml_llm_early_stops_total",
+        "Generations stopped before max_new_tokens because the outcome was already decided.",
+        ("reason",),
+    )
+)
+
+
+class OutputValidator:
+    # Cleans and validates LLM output one line at a time, so the same rules
+    # run over a finished text or over the token stream during generation.
+    # Cleaning keeps at most MAX_LINES lines and stops at an "example
+    # input/output" marker, so once `done` is set no further text can change
+    # the result and generation can stop.
+
+    def __init__(self) -> None:
+        self.lines: list[str] = []
+        self.bullets = 0
+        self.failure: str | None = None
+        self.done = False
+        # "complete" (MAX_LINES kept), "stop_marker" or "end" when settled
+        # without a failure along the way.
+        self.stop_reason: str | None = None
+        self.tokens = 0
+        self._pending = ""
+
+    def feed_line(self, line: str) -> None:
+        if self.done:
+            return
+        stripped = line.strip()
+        if not stripped:
+            return
+        lower = stripped.lower()
+        if STOP_MARKERS.search(lower):
+            self._settle("stop_marker")
+            return
+        # Meta-commentary and bare headings ("Water Conservation:") are dropped.
+        if lower.startswith(SKIP_PREFIXES) or (stripped.endswith(":") and len(stripped.split()) < 5):
+            return
+        self.lines.append(line)
+        if stripped.startswith(("-", "•")) or NUMBERED.match(stripped):
+            self.bullets += 1
+            if META_KEYWORDS.search(lower):
+                self.failure = "meta_keyword"
+                self.done = True
+                return
+        if len(self.lines) >= MAX_LINES:
+            self._settle("complete")
+        elif self.bullets + MAX_LINES - len(self.lines) < MIN_BULLETS:
+            # Too few lines left to reach MIN_BULLETS bullets.
+            self.failure = "not_enough_bullets"
+            self.done = True
+
+    def _settle(self, reason: str) -> None:
+        self.done = True
+        if self.bullets < MIN_BULLETS:
+            self.failure = "not_enough_bullets" if self.lines else "empty_output"
+        self.stop_reason = reason
+
+    def feed(self, text: str) -> bool:
+        # Streamed text; only complete lines are judged. True once the
+        # outcome is decided.
+        *complete, self._pending = (self._pending + text).split("\n")
+        for line in complete:
+            self.feed_line(line)
+        return self.done
+
+    def text(self) -> str:
+        return "\n".join(self.lines)
+
+
+def validate_output(text: str) -> tuple[str, str | None]:
+    # Single pass over a finished generation: the cleaned text and the reason
+    # it is unusable (None when it can be served).
+    validator = OutputValidator()
+    for line in text.strip().splitlines():
+        validator.feed_line(line)
+        if validator.done:
+            break
+    if not validator.done:
+        validator._settle("end")
+    return validator.text(), validator.failure
+
+
+class StreamStop:
+    # transformers stopping criterion feeding the validator as tokens arrive.
+    # Only the current line's tokens are re-decoded each step (decoding a
+    # lone token loses sentencepiece spacing), so the cost per step is
+    # bounded by the line length, not the output length.
+
+    def __init__(self, tokenizer: Any, prompt_length: int, validator: OutputValidator) -> None:
+        self.tokenizer = tokenizer
+        self.prompt_length = prompt_length
+        self.validator = validator
+        self._line_start = prompt_length
+        self._emitted = 0
+
+    def __call__(self, input_ids: Any, scores: Any, **kwargs: Any) -> Any:
+        import torch
+
+        self.validator.tokens = input_ids.shape[1] - self.prompt_length
+        text = self.tokenizer.decode(input_ids[0, self._line_start :], skip_special_tokens=True)
+        new_text = text[self._emitted :]
+        self._emitted = len(text)
+        if "\n" in new_text:
+            self._line_start = input_ids.shape[1]
+            self._emitted = 0
+        done = self.validator.feed(new_text)
+        if done:
+            EARLY_STOPS.inc(reason=self.validator.failure or self.validator.stop_reason)
+        return torch.full((input_ids.shape[0],), done, dtype=torch.bool, device=input_ids.device)
@@ -0,0 +1,48 @@
+from __future__ import annotations
+
+import atexit
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+
+_listener: logging.handlers.QueueListener | None = None
+
+
+def get_logger(name: str) -> logging.Logger:
+    configure_logging()
+    return logging.getLogger(name)
+
+
+def configure_logging() -> None:
+    # Records are handed to a background thread through a queue, so request
+    # threads never block on stdout. ML_LOG_LEVEL gates the DEBUG chatter.
+    global _listener
+    if _listener is not None:
+        return
+    level = os.getenv("ML_LOG_LEVEL", "INFO").upper()
+    stream = logging.StreamHandler(sys.stdout)
+    stream.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    _listener = logging.handlers.QueueListener(log_queue, stream, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+    os.register_at_fork(after_in_child=_restart_listener)
+    root = logging.getLogger("ml")
+    root.setLevel(level)
+    root.addHandler(logging.handlers.QueueHandler(log_queue))
+    root.propagate = False
+
+
+def _restart_listener() -> None:
+    # The listener thread does not survive fork(); pre-forked workers get
+    # their own, draining the same queue into the same handlers.
+    global _listener
+    if _listener is None:
+        return
+    # Records still queued at fork time belong to the parent, which prints them.
+    while not _listener.queue.empty():
+        _listener.queue.get_nowait()
+    _listener = logging.handlers.QueueListener(_listener.queue, *_listener.handlers, respect_handler_level=True)
+    _listener.start()
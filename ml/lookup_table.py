@@ -0,0 +1,204 @@
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import math
+import os
+import time
+from typing import Mapping, NamedTuple
+
+import numpy as np
+
+from ml.domains import DOMAINS, get_domain
+from ml.inference import LoadedModel, feature_matrix, load_model, predict_outputs
+from ml.metrics import REGISTRY, Counter
+
+# column -> (low, high, step) of the lattice a table is built over. Full
+# integer resolution on every column would be ~4e8 cells for public and
+# ~1e10 for health, so the wide columns use coarser steps; inputs between
+# lattice points fall back to the model.
+DEFAULT_LATTICES: dict[str, dict[str, tuple[float, float, float]]] = {
+    "public": {
+        "roads_needing_repair": (5, 50, 5),
+        "water_supply_level": (20, 100, 5),
+        "sewer_system_health": (60, 100, 1),
+        "emergency_response_time": (5, 25, 1),
+        "pending_maintenance_tasks": (10, 70, 5),
+        "recent_storm_or_flood": (0, 1, 1),
+    },
+    "health": {
+        "temperature_c": (-10, 50, 5),
+        "rainfall_mm": (0, 200, 10),
+        "aqi": (0, 500, 10),
+        "recent_storm_or_flood": (0, 1, 1),
+        "sewer_system_health": (60, 100, 5),
+        "emergency_response_time": (5, 25, 5),
+    },
+}
+MAX_CELLS = 50_000_000
+CHUNK_ROWS = 65536
+
+LOOKUPS = REGISTRY.register(
+    Counter("ml_lookup_table_requests_total", "Precomputed table lookups by model and result.", ("model", "result"))
+)
+
+
+class Axis(NamedTuple):
+    column: str
+    low: float
+    step: float
+    size: int
+    stride: int
+
+
+class LookupTable(NamedTuple):
+    name: str
+    axes: tuple[Axis, ...]
+    # Dense lattice of indices into levels (the distinct model outputs), so
+    # a table answers with exactly the value the model would return.
+    index: np.ndarray
+    levels: list[float]
+
+    @property
+    def nbytes(self) -> int:
+        return self.index.nbytes + 8 * len(self.levels)
+
+
+def table_paths(model_path: str) -> tuple[str, str]:
+    base = os.path.splitext(model_path)[0]
+    return base + ".table.npy", base + ".table.json"
+
+
+def file_digest(path: str) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as handle:
+        for block in iter(lambda: handle.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def build_table(model: LoadedModel, lattice: Mapping[str, tuple[float, float, float]]) -> LookupTable:
+    missing = set(model.feature_columns) - set(lattice)
+    if missing:
+        raise ValueError(f"Lattice for {model.name} is missing {', '.join(sorted(missing))}")
+    points = [np.arange(low, high + step / 2, step) for low, high, step in (lattice[c] for c in model.feature_columns)]
+    shape = tuple(len(axis) for axis in points)
+    cells = math.prod(shape)
+    if cells > MAX_CELLS:
+        raise ValueError(f"Lattice for {model.name} has {cells:,} cells (limit {MAX_CELLS:,}); use coarser steps")
+
+    # Every lattice point scored once, in row-major order of the lattice.
+    outputs = np.empty(cells, dtype=np.float64)
+    for start in range(0, cells, CHUNK_ROWS):
+        flat = np.arange(start, min(start + CHUNK_ROWS, cells))
+        coordinates = np.unravel_index(flat, shape)
+        values = {column: points[j][coordinates[j]] for j, column in enumerate(model.feature_columns)}
+        outputs[start : start + len(flat)] = predict_outputs(model, feature_matrix(model.feature_columns, values, len(flat)))
+
+    levels, inverse = np.unique(outputs, return_inverse=True)
+    dtype = np.uint8 if len(levels) <= 1 << 8 else np.uint16 if len(levels) <= 1 << 16 else np.uint32
+    strides = np.cumprod((1,) + shape[:0:-1])[::-1]
+    axes = tuple(
+        Axis(column, float(lattice[column][0]), float(lattice[column][2]), size, int(stride))
+        for column, size, stride in zip(model.feature_columns, shape, strides)
+    )
+    return LookupTable(model.name, axes, inverse.astype(dtype).reshape(-1), levels.tolist())
+
+
+def save_table(table: LookupTable, model_path: str) -> None:
+    index_path, meta_path = table_paths(model_path)
+    np.save(index_path, table.index)
+    with open(meta_path, "w", encoding="utf-8") as handle:
+        json.dump(
+            {
+                "model": table.name,
+                "modelDigest": file_digest(model_path),
+                "axes": [axis._asdict() for axis in table.axes],
+                "levels": table.levels,
+            },
+            handle,
+        )
+
+
+def load_table(name: str, model_path: str | None = None) -> LookupTable | None:
+    # Memory-mapped so pre-forked workers share the pages; a table built for
+    # a different model file is ignored.
+    model_path = model_path or DOMAINS[name].model_path
+    index_path, meta_path = table_paths(model_path)
+    if not (os.path.exists(index_path) and os.path.exists(meta_path) and os.path.exists(model_path)):
+        return None
+    with open(meta_path, encoding="utf-8") as handle:
+        meta = json.load(handle)
+    if meta["modelDigest"] != file_digest(model_path):
+        return None
+    axes = tuple(Axis(**axis) for axis in meta["axes"])
+    return LookupTable(name, axes, np.load(index_path, mmap_mode="r"), meta["levels"])
+
+
+def load_tables(names: tuple[str, ...] = tuple(DEFAULT_LATTICES)) -> dict[str, LookupTable]:
+    if os.getenv("ML_LOOKUP_TABLES", "1") == "0":
+        return {}
+    tables = {name: load_table(name) for name in names}
+    return {name: table for name, table in tables.items() if table is not None}
+
+
+def lookup(table: LookupTable, row: Mapping[str, float]) -> float | None:
+    # None when any input is off the lattice (outside its range, between
+    # steps, NaN or infinite); the caller then runs the model.
+    flat = 0
+    for axis in table.axes:
+        position = (row[axis.column] - axis.low) / axis.step
+        index = int(position) if math.isfinite(position) else -1
+        if index != position or not 0 <= index < axis.size:
+            LOOKUPS.inc(model=table.name, result="miss")
+            return None
+        flat += index * axis.stride
+    LOOKUPS.inc(model=table.name, result="hit")
+    return table.levels[table.index[flat]]
+
+
+def _time_per_call(fn, repeat: int = 2000) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Precompute a dense output table for a discrete-input model.")
+    parser.add_argument("models", nargs="*", default=sorted(DEFAULT_LATTICES), help="public and/or health")
+    parser.add_argument(
+        "--step", action="append", default=[], metavar="COLUMN=STEP", help="override a lattice step, e.g. aqi=5"
+    )
+    args = parser.parse_args()
+    steps = dict(item.split("=", 1) for item in args.step)
+    for name in args.models:
+        if name not in DEFAULT_LATTICES:
+            parser.error(f"No lattice defined for {name}; choose from {', '.join(sorted(DEFAULT_LATTICES))}")
+    for column in set(steps) - {column for name in args.models for column in DEFAULT_LATTICES[name]}:
+        parser.error(f"{column} is not an input of {', '.join(args.models)}")
+
+    for name in args.models:
+        model = load_model(name, backend="joblib")
+        if model is None:
+            parser.error(f"{get_domain(name).model_path} does not exist")
+        lattice = {
+            column: (low, high, float(steps.get(column, step)))
+            for column, (low, high, step) in DEFAULT_LATTICES[name].items()
+        }
+        start = time.perf_counter()
+        table = build_table(model, lattice)
+        build_seconds = time.perf_counter() - start
+        save_table(table, get_domain(name).model_path)
+
+        row = {axis.column: axis.low + axis.step * (axis.size // 2) for axis in table.axes}
+        X = feature_matrix(model.feature_columns, row)
+        assert lookup(table, row) == float(predict_outputs(model, X)[0])
+        table_seconds = _time_per_call(lambda: lookup(table, row), 20000)
+        model_seconds = _time_per_call(lambda: predict_outputs(model, X), 200)
+        print(
+            f"{name}: {len(table.index):,} cells, {len(table.levels)} distinct outputs, "
+            f"{table.nbytes / 2**20:.1f} MiB, built in {build_seconds:.1f}s; "
+            f"lookup {table_seconds * 1e6:.2f} us vs model {model_seconds * 1e6:.0f} us"
+        )
@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import collections
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, NamedTuple
+
+import numpy as np
+
+from ml.domains import DOMAINS
+from ml.inference import MODEL_NAMES, LoadedModel, load_model
+from ml.lookup_table import file_digest
+
+LATENCY_WINDOW = 1024
+
+
+class ModelStatus(NamedTuple):
+    name: str
+    state: str  # "loaded", "missing" or "failed"
+    backend: str | None
+    path: str
+    # First 12 hex digits of the artifact's blake2b digest, so two workers
+    # (or two deploys) can be compared at a glance.
+    version: str | None
+    modified_at: str | None
+    load_seconds: float
+    memory_bytes: int
+    error: str | None
+
+
+def required_models() -> tuple[str, ...]:
+    # ML_REQUIRED_MODELS=water,traffic narrows which models gate readiness;
+    # the rest may fall back to FALLBACK_OUTPUTS without failing /readyz.
+    value = os.getenv("ML_REQUIRED_MODELS")
+    if value is None:
+        return MODEL_NAMES
+    names = tuple(name.strip() for name in value.split(",") if name.strip())
+    unknown = set(names) - set(MODEL_NAMES)
+    if unknown:
+        raise ValueError(f"ML_REQUIRED_MODELS names unknown models: {', '.join(sorted(unknown))}")
+    return names
+
+
+def estimator_nbytes(estimator: Any) -> int:
+    # Node and value arrays of every tree; the Python wrappers around them
+    # are small next to these.
+    trees = getattr(estimator, "estimators_", None)
+    if trees is None:
+        return 0
+    total = 0
+    for tree in np.ravel(trees):
+        state = tree.tree_.__getstate__()
+        total += state["nodes"].nbytes + state["values"].nbytes
+    return total
+
+
+def load_with_status(name: str) -> tuple[LoadedModel | None, ModelStatus]:
+    path = DOMAINS[name].model_path
+    start = time.perf_counter()
+    try:
+        model = load_model(name)
+    except Exception as exc:
+        error = f"{type(exc).__name__}: {exc}"
+        return None, ModelStatus(name, "failed", None, path, None, None, time.perf_counter() - start, 0, error)
+    seconds = time.perf_counter() - start
+    if model is None:
+        return None, ModelStatus(name, "missing", None, path, None, None, seconds, 0, f"{path} not found")
+
+    backend = "joblib"
+    memory = estimator_nbytes(model.estimator)
+    if hasattr(model.estimator, "session"):
+        from ml.onnx_backend import onnx_path
+
+        backend, path = "onnx", onnx_path(path)
+        memory = os.path.getsize(path)
+    modified = datetime.fromtimestamp(os.path.getmtime(path), tz=timezone.utc).isoformat()
+    status = ModelStatus(name, "loaded", backend, path, file_digest(path)[:12], modified, seconds, memory, None)
+    return model, status
+
+
+def load_all(threads: int = 1) -> dict[str, tuple[LoadedModel | None, ModelStatus]]:
+    # Unpickling holds the GIL, but reading and decompressing the arrays does
+    # not, so a few threads overlap the six loads.
+    with ThreadPoolExecutor(max_workers=max(threads, 1), thread_name_prefix="model-load") as pool:
+        return dict(zip(MODEL_NAMES, pool.map(load_with_status, MODEL_NAMES)))
+
+
+class LatencyWindow:
+    # The last LATENCY_WINDOW predict latencies of one model, so /models shows
+    # how the model behaves now rather than since start-up.
+
+    def __init__(self, size: int = LATENCY_WINDOW) -> None:
+        self._samples: collections.deque[float] = collections.deque(maxlen=size)
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def observe(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+            self.count += 1
+
+    def summary(self) -> dict[str, Any]:
+        with self._lock:
+            samples = np.array(self._samples)
+            count = self.count
+        if not len(samples):
+            return {"count": count, "window": 0, "p50Ms": None, "p95Ms": None, "p99Ms": None}
+        p50, p95, p99 = np.percentile(samples * 1000.0, [50, 95, 99]).tolist()
+        return {"count": count, "window": len(samples), "p50Ms": p50, "p95Ms": p95, "p99Ms": p99}
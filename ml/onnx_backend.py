@@ -0,0 +1,171 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Any
+
+import numpy as np
+
+from ml.domains import DOMAINS, Domain, get_domain
+from ml.inference import LoadedModel, load_model, predict_outputs
+from ml.logging_setup import get_logger
+from ml.schema import FEATURE_DTYPE
+
+logger = get_logger("ml.onnx_backend")
+
+TARGET_OPSET = {"": 17, "ai.onnx.ml": 3}
+# Forests run in float32 inside onnxruntime, so regression outputs differ
+# from sklearn's float64 accumulation in the last few digits.
+REGRESSION_ATOL = 1e-3
+PROBA_ATOL = 1e-4
+MAX_LABEL_MISMATCH = 0.001
+
+
+def onnx_path(model_path: str) -> str:
+    return os.path.splitext(model_path)[0] + ".onnx"
+
+
+def _require(module: str, package: str) -> Any:
+    import importlib
+
+    try:
+        return importlib.import_module(module)
+    except ImportError as exc:
+        # Raised rather than exiting: the serving loader thread reports it as
+        # a failed model load.
+        raise ImportError(f"ONNX export/serving needs {package} (pip install {package}).") from exc
+
+
+class OnnxModel:
+    # Stands in for the sklearn estimator inside LoadedModel: predict and
+    # predict_proba run the exported graph, so predict_outputs is unchanged.
+
+    def __init__(self, session: Any, classes: list[int] | None) -> None:
+        self.session = session
+        self.input_name = session.get_inputs()[0].name
+        self.output_names = [output.name for output in session.get_outputs()]
+        if classes is not None:
+            self.classes_ = np.asarray(classes)
+
+    def _run(self, X: np.ndarray) -> list[np.ndarray]:
+        return self.session.run(None, {self.input_name: np.ascontiguousarray(X, dtype=FEATURE_DTYPE)})
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        outputs = self._run(X)
+        if hasattr(self, "classes_"):
+            return outputs[0]
+        return outputs[0][:, 0].astype(np.float64)
+
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        return self._run(X)[1].astype(np.float64)
+
+
+def session_options(threads: int | None = None) -> Any:
+    ort = _require("onnxruntime", "onnxruntime")
+    options = ort.SessionOptions()
+    # Serving concurrency comes from the request executors, so one intra-op
+    # thread per call by default; raise ML_ONNX_THREADS for bulk scoring.
+    options.intra_op_num_threads = threads or int(os.getenv("ML_ONNX_THREADS", "1"))
+    options.inter_op_num_threads = 1
+    options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    return options
+
+
+def load_onnx_model(name: str, path: str | None = None, threads: int | None = None) -> LoadedModel | None:
+    path = onnx_path(path or DOMAINS[name].model_path)
+    if not os.path.exists(path):
+        logger.warning("%s not found; serving %s from joblib. Run python -m ml.onnx_backend first.", path, name)
+        return None
+    ort = _require("onnxruntime", "onnxruntime")
+    session = ort.InferenceSession(path, session_options(threads), providers=["CPUExecutionProvider"])
+    metadata = session.get_modelmeta().custom_metadata_map
+    classes = json.loads(metadata["classes"]) if "classes" in metadata else None
+    return LoadedModel(name, OnnxModel(session, classes), tuple(json.loads(metadata["feature_columns"])))
+
+
+def export_model(domain: Domain) -> str:
+    skl2onnx = _require("skl2onnx", "skl2onnx")
+    from skl2onnx.common.data_types import FloatTensorType
+
+    model = load_model(domain.name, backend="joblib")
+    if model is None:
+        raise FileNotFoundError(domain.model_path)
+    estimator = model.estimator
+    is_classifier = hasattr(estimator, "classes_")
+    options = {id(estimator): {"zipmap": False}} if is_classifier else None
+    onx = skl2onnx.convert_sklearn(
+        estimator,
+        initial_types=[("X", FloatTensorType([None, len(model.feature_columns)]))],
+        options=options,
+        target_opset=TARGET_OPSET,
+    )
+    metadata = {"feature_columns": json.dumps(model.feature_columns)}
+    if is_classifier:
+        metadata["classes"] = json.dumps(estimator.classes_.tolist())
+    for key, value in metadata.items():
+        prop = onx.metadata_props.add()
+        prop.key, prop.value = key, value
+    path = onnx_path(domain.model_path)
+    with open(path, "wb") as handle:
+        handle.write(onx.SerializeToString())
+    return path
+
+
+def held_out_features(domain: Domain, columns: tuple[str, ...], max_rows: int, test_fraction: float = 0.2) -> np.ndarray:
+    # The same hashed sample_id split ml.train_out_of_core holds out.
+    from ml.datasets import iter_merged_chunks
+    from ml.train_out_of_core import is_test_row
+
+    parts, rows = [], 0
+    for chunk in iter_merged_chunks(domain.sources, 200000):
+        test = chunk[is_test_row(chunk["sample_id"].to_numpy(), test_fraction)]
+        parts.append(test[list(columns)].to_numpy(dtype=FEATURE_DTYPE))
+        rows += len(test)
+        if rows >= max_rows:
+            break
+    return np.concatenate(parts)[:max_rows]
+
+
+def check_parity(domain: Domain, max_rows: int = 20000) -> dict[str, float]:
+    reference = load_model(domain.name, backend="joblib")
+    exported = load_onnx_model(domain.name)
+    X = held_out_features(domain, reference.feature_columns, max_rows)
+    expected = predict_outputs(reference, X)
+    actual = predict_outputs(exported, X)
+    report = {"rows": len(X), "max_abs_diff": float(np.max(np.abs(expected - actual), initial=0.0))}
+    if domain.task == "classification":
+        labels = reference.estimator.predict(X)
+        report["label_mismatch"] = float(np.mean(labels != exported.estimator.predict(X)))
+        proba_diff = np.abs(reference.estimator.predict_proba(X) - exported.estimator.predict_proba(X))
+        report["max_proba_diff"] = float(proba_diff.max(initial=0.0))
+        report["ok"] = report["label_mismatch"] <= MAX_LABEL_MISMATCH and report["max_proba_diff"] <= PROBA_ATOL
+    else:
+        report["ok"] = report["max_abs_diff"] <= REGRESSION_ATOL
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the trained forests to ONNX and check parity with sklearn.")
+    parser.add_argument("domains", nargs="*", default=sorted(DOMAINS), help="default: all")
+    parser.add_argument("--parity-rows", type=int, default=20000, help="held-out rows compared per model")
+    args = parser.parse_args()
+
+    failed = []
+    try:
+        for name in args.domains:
+            domain = get_domain(name)
+            start = time.perf_counter()
+            path = export_model(domain)
+            print(f"{name}: wrote {path} ({os.path.getsize(path) / 2**20:.1f} MiB) in {time.perf_counter() - start:.1f}s")
+            report = check_parity(domain, args.parity_rows)
+            print("  parity " + " ".join(f"{key}={value}" for key, value in report.items()))
+            if not report["ok"]:
+                failed.append(name)
+    except ImportError as exc:
+        sys.exit(str(exc))
+    if failed:
+        sys.exit(f"Parity check failed for {', '.join(failed)}")
@@ -0,0 +1,218 @@
+from __future__ import annotations
+
+import time
+from typing import Mapping, NamedTuple, Sequence
+
+import numpy as np
+
+from ml.inference import FALLBACK_OUTPUTS, MODEL_NAMES, LoadedModel, feature_matrix, predict_outputs
+
+MAX_EVALUATIONS = 500000
+MAX_TOP_K = 50
+
+
+class Control(NamedTuple):
+    column: str
+    low: float
+    high: float
+    # Cost per unit of absolute change from the base value.
+    cost_per_unit: float = 0.0
+
+
+class Objective(NamedTuple):
+    # Minimise weight * output, or only the part above threshold when set.
+    # A negative weight maximises.
+    model: str
+    weight: float = 1.0
+    threshold: float | None = None
+
+
+class SearchResult(NamedTuple):
+    values: np.ndarray  # (k, n_controls) best distinct interventions, best first
+    scores: np.ndarray
+    costs: np.ndarray
+    outputs: dict[str, np.ndarray]  # model name -> (k,)
+    evaluations: int
+    generations: int
+    elapsed: float
+    stopped_by: str
+
+
+def _evaluate(
+    models: Mapping[str, LoadedModel | None],
+    base_row: Mapping[str, float],
+    base_outputs: Mapping[str, float],
+    controls: Sequence[Control],
+    values: np.ndarray,
+) -> dict[str, np.ndarray]:
+    # One batched predict per model that consumes a controlled column; the
+    # rest keep their base prediction.
+    n_rows = len(values)
+    row = dict(base_row)
+    for index, control in enumerate(controls):
+        row[control.column] = values[:, index]
+    columns = {control.column for control in controls}
+    outputs = {}
+    for name in MODEL_NAMES:
+        model = models.get(name)
+        if model is None or not columns & set(model.feature_columns):
+            outputs[name] = np.full(n_rows, base_outputs[name])
+        else:
+            outputs[name] = predict_outputs(model, feature_matrix(model.feature_columns, row, n_rows))
+    return outputs
+
+
+def _score(outputs: Mapping[str, np.ndarray], objectives: Sequence[Objective]) -> np.ndarray:
+    score = np.zeros(len(next(iter(outputs.values()))))
+    for objective in objectives:
+        value = outputs[objective.model]
+        if objective.threshold is not None:
+            value = np.maximum(value - objective.threshold, 0.0)
+        score += objective.weight * value
+    return score
+
+
+def optimize(
+    models: Mapping[str, LoadedModel | None],
+    base_row: Mapping[str, float],
+    controls: Sequence[Control],
+    objectives: Sequence[Objective],
+    budget: float | None = None,
+    population: int = 256,
+    generations: int = 30,
+    max_evaluations: int = 20000,
+    patience: int = 5,
+    time_limit: float | None = None,
+    top_k: int = 5,
+    seed: int | None = None,
+) -> SearchResult:
+    # Evolutionary search in the unit cube of the controls: each generation
+    # keeps the best quarter and refills the population with crossover plus
+    # Gaussian mutation whose step shrinks over time. Candidates over budget
+    # are pulled back towards the base values clipped into bounds until they
+    # fit. Stops on generations, evaluations, patience or time.
+    if not 1 <= max_evaluations <= MAX_EVALUATIONS:
+        raise ValueError(f"max_evaluations must be between 1 and {MAX_EVALUATIONS}")
+    # The first generation is allocated before the evaluation cap applies.
+    if not 4 <= population <= max_evaluations:
+        raise ValueError("population must be between 4 and max_evaluations")
+    if generations < 1:
+        raise ValueError("generations must be at least 1")
+    if not 1 <= top_k <= MAX_TOP_K:
+        raise ValueError(f"top_k must be between 1 and {MAX_TOP_K}")
+    if budget is not None and budget < 0:
+        raise ValueError("budget must be non-negative")
+    start = time.perf_counter()
+    rng = np.random.default_rng(seed)
+    low = np.array([control.low for control in controls])
+    span = np.array([control.high - control.low for control in controls])
+    unit_cost = np.array([control.cost_per_unit for control in controls])
+    base = np.array([base_row[control.column] for control in controls], dtype=np.float64)
+    scale = np.where(span > 0, span, 1.0)
+    # The cheapest in-bounds point; cost is linear along the segment from it
+    # to any candidate, since every coordinate moves away from the base.
+    anchor = low + np.clip((base - low) / scale, 0.0, 1.0) * span
+    anchor_cost = np.abs(anchor - base) @ unit_cost
+    base_outputs = {}
+    for name in MODEL_NAMES:
+        model = models.get(name)
+        if model is None:
+            base_outputs[name] = FALLBACK_OUTPUTS[name]
+        else:
+            base_outputs[name] = float(predict_outputs(model, feature_matrix(model.feature_columns, base_row))[0])
+
+    def to_values(unit: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        values = low + unit * span
+        costs = np.abs(values - base) @ unit_cost
+        if budget is not None:
+            over = costs > budget
+            if over.any():
+                # When even the anchor is over budget the candidate stays there.
+                extra = np.maximum(costs[over] - anchor_cost, 1e-12)
+                shrink = np.clip((budget - anchor_cost) / extra, 0.0, 1.0)
+                values[over] = anchor + (values[over] - anchor) * shrink[:, None]
+                costs[over] = np.abs(values[over] - base) @ unit_cost
+        return values, costs
+
+    unit = rng.random((population, len(controls)))
+    # Seed the search with "do nothing" (base values clipped into bounds).
+    unit[0] = (anchor - low) / scale
+
+    archive_values, archive_scores, archive_costs = [], [], []
+    archive_outputs: dict[str, list[np.ndarray]] = {name: [] for name in MODEL_NAMES}
+    pool_unit = np.empty((0, len(controls)))
+    pool_scores = np.empty(0)
+    pool_costs = np.empty(0)
+    evaluations = 0
+    best = np.inf
+    stale = 0
+    stopped_by = "generations"
+    sigma = 0.2
+    generation = 0
+    while True:
+        unit = unit[: max_evaluations - evaluations]
+        values, costs = to_values(unit)
+        outputs = _evaluate(models, base_row, base_outputs, controls, values)
+        scores = _score(outputs, objectives)
+        evaluations += len(unit)
+        generation += 1
+
+        archive_values.append(values)
+        archive_scores.append(scores)
+        archive_costs.append(costs)
+        for name in MODEL_NAMES:
+            archive_outputs[name].append(outputs[name])
+
+        generation_best = float(scores.min())
+        if generation_best < best - 1e-9:
+            best = generation_best
+            stale = 0
+        else:
+            stale += 1
+        if generation >= generations:
+            break
+        if evaluations >= max_evaluations:
+            stopped_by = "evaluations"
+            break
+        if stale >= patience:
+            stopped_by = "patience"
+            break
+        if time_limit is not None and time.perf_counter() - start >= time_limit:
+            stopped_by = "time"
+            break
+
+        # The best quarter survives unchanged (and is not re-evaluated); ties
+        # on score prefer the cheaper intervention.
+        # Budget repair moved some candidates; breed from where they ended up.
+        pool_unit = np.concatenate([pool_unit, (values - low) / scale])
+        pool_scores = np.concatenate([pool_scores, scores])
+        pool_costs = np.concatenate([pool_costs, costs])
+        order = np.lexsort((pool_costs, pool_scores))[: max(2, population // 4)]
+        pool_unit, pool_scores, pool_costs = pool_unit[order], pool_scores[order], pool_costs[order]
+
+        n_children = population - len(pool_unit)
+        parents = pool_unit[rng.integers(0, len(pool_unit), (n_children, 2))]
+        mask = rng.random((n_children, len(controls))) < 0.5
+        children = np.where(mask, parents[:, 0], parents[:, 1])
+        children += rng.normal(0.0, sigma, children.shape)
+        unit = np.clip(children, 0.0, 1.0)
+        sigma = max(sigma * 0.85, 0.01)
+
+    values = np.concatenate(archive_values)
+    scores = np.concatenate(archive_scores)
+    costs = np.concatenate(archive_costs)
+    order = np.lexsort((costs, scores))
+    keep: list[int] = []
+    seen = set()
+    for index in order:
+        key = tuple(np.round(values[index], 6))
+        if key in seen:
+            continue
+        seen.add(key)
+        keep.append(index)
+        if len(keep) == top_k:
+            break
+    outputs = {name: np.concatenate(archive_outputs[name])[keep] for name in MODEL_NAMES}
+    return SearchResult(
+        values[keep], scores[keep], costs[keep], outputs, evaluations, generation, time.perf_counter() - start, stopped_by
+    )
@@ -0,0 +1,112 @@
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import shutil
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any
+
+import numpy as np
+
+from ml.datasets import DATASETS
+from ml.schema import VIOLATION_MODES, apply_schema, violation_mode
+
+SHARD_DIR = "ml/data/shards"
+DEFAULT_SHARD_SIZE = 50000
+
+
+def shard_rng(master_seed: int, dataset_name: str, shard_index: int) -> random.Random:
+    # SeedSequence spawn keys give each (dataset, shard) pair an independent
+    # stream that depends only on the master seed, never on the worker layout.
+    sequence = np.random.SeedSequence(master_seed, spawn_key=(zlib.crc32(dataset_name.encode()), shard_index))
+    return random.Random(int.from_bytes(sequence.generate_state(4).tobytes(), "little"))
+
+
+def _write_shard(
+    name: str,
+    shard_index: int,
+    start_id: int,
+    n_rows: int,
+    master_seed: int,
+    shard_path: str,
+    on_violation: str,
+    generator_kwargs: dict[str, Any],
+) -> str:
+    source = DATASETS[name]
+    rng = shard_rng(master_seed, name, shard_index)
+    df = source.row_generator(n_rows, rng=rng, start_id=start_id, **generator_kwargs)
+    df = apply_schema(df, name, on_violation=on_violation)
+    df.to_csv(shard_path, index=False, header=shard_index == 0)
+    return shard_path
+
+
+def build_dataset_parallel(
+    name: str,
+    n_rows: int = 200000,
+    master_seed: int = 0,
+    shard_size: int = DEFAULT_SHARD_SIZE,
+    workers: int | None = None,
+    output_path: str | None = None,
+    shard_dir: str = SHARD_DIR,
+    on_violation: str | None = None,
+    **generator_kwargs: Any,
+) -> str:
+    source = DATASETS[name]
+    output_path = output_path or source.path
+    on_violation = on_violation or violation_mode()
+    shard_root = os.path.join(shard_dir, name)
+    os.makedirs(shard_root, exist_ok=True)
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+
+    shards = []
+    for shard_index, start_id in enumerate(range(0, n_rows, shard_size)):
+        shard_rows = min(shard_size, n_rows - start_id)
+        shard_path = os.path.join(shard_root, f"part-{shard_index:05d}.csv")
+        shards.append(
+            (name, shard_index, start_id, shard_rows, master_seed, shard_path, on_violation, generator_kwargs)
+        )
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        shard_paths = list(pool.map(_write_shard, *zip(*shards)))
+
+    # Shards are concatenated in sample_id order, so the output bytes depend
+    # only on (master_seed, shard_size, n_rows).
+    with open(output_path, "wb") as out:
+        for shard_path in shard_paths:
+            with open(shard_path, "rb") as part:
+                shutil.copyfileobj(part, out)
+    shutil.rmtree(shard_root, ignore_errors=True)
+    return output_path
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Generate synthetic datasets deterministically across processes.")
+    parser.add_argument("datasets", nargs="*", help=f"subset of {sorted(DATASETS)}; defaults to all")
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--shard-size", type=int, default=DEFAULT_SHARD_SIZE)
+    parser.add_argument("--workers", type=int)
+    parser.add_argument(
+        "--on-schema-violation",
+        choices=VIOLATION_MODES,
+        help="out-of-range values: warn and keep (default, or ML_SCHEMA_VIOLATIONS), raise, or clip onto the bounds",
+    )
+    args = parser.parse_args()
+    for name in args.datasets or list(DATASETS):
+        if name not in DATASETS:
+            parser.error(f"unknown dataset {name!r}")
+        path = build_dataset_parallel(
+            name,
+            n_rows=args.rows,
+            master_seed=args.seed,
+            shard_size=args.shard_size,
+            workers=args.workers,
+            on_violation=args.on_schema_violation,
+        )
+        print(f"Wrote {args.rows} {name} rows to {path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,322 @@
+from __future__ import annotations
+
+import collections
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Any
+
+from ml import analytics
+from ml.logging_setup import get_logger
+from ml.metrics import REGISTRY, STAGE_SECONDS, Counter, Gauge
+
+logger = get_logger("ml.prediction_log")
+
+LOG_RECORDS = REGISTRY.register(
+    Counter("ml_prediction_log_records_total", "Prediction log records by outcome.", ("result",))
+)
+LOG_BACKLOG = REGISTRY.register(
+    Gauge("ml_prediction_log_backlog", "Prediction log records waiting in memory or in journal segments.", ("where",))
+)
+
+# (created_at ISO timestamp, inputs JSON, outputs JSON)
+Row = tuple[str, str, str]
+
+
+def _to_json(value: Any) -> str:
+    if isinstance(value, str):
+        return value
+    if hasattr(value, "model_dump_json"):
+        return value.model_dump_json()
+    return json.dumps(value)
+
+
+class SqliteSink:
+    # Local stand-in for Supabase with the same columns as
+    # public.prediction_logs (jsonb stored as text).
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._connection = None
+        self._read_lock = threading.Lock()
+        self._read_connection = None
+
+    def _connect(self) -> Any:
+        import sqlite3
+
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False)
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS prediction_logs ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, admin_id TEXT, inputs TEXT NOT NULL, "
+            "outputs TEXT NOT NULL, created_at TEXT NOT NULL)"
+        )
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS prediction_output_rollups ("
+            "granularity TEXT NOT NULL, bucket_start INTEGER NOT NULL, output TEXT NOT NULL, state TEXT, "
+            "PRIMARY KEY (granularity, bucket_start, output))"
+        )
+        return connection
+
+    def write(self, rows: list[Row]) -> None:
+        if self._connection is None:
+            self._connection = self._connect()
+        cursor = self._connection.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            cursor.executemany("INSERT INTO prediction_logs (created_at, inputs, outputs) VALUES (?, ?, ?)", rows)
+            analytics.update_rollups(cursor, rows, "?")
+        except BaseException:
+            cursor.execute("ROLLBACK")
+            raise
+        cursor.execute("COMMIT")
+
+    def read_rollups(self, granularity: str, start: int, end: int) -> list[tuple[int, str, Any]]:
+        with self._read_lock:
+            if self._read_connection is None:
+                self._read_connection = self._connect()
+            return analytics.read_rollups(self._read_connection.cursor(), granularity, start, end, "?")
+
+
+class PostgresSink:
+    # Multi-row INSERTs into public.prediction_logs over psycopg (v3).
+    # admin_id stays NULL for server-side predictions.
+
+    ROWS_PER_STATEMENT = 1000
+
+    def __init__(self, dsn: str) -> None:
+        self.dsn = dsn
+        self._connection = None
+        self._read_lock = threading.Lock()
+        self._read_connection = None
+
+    def write(self, rows: list[Row]) -> None:
+        import psycopg
+
+        if self._connection is None or self._connection.closed:
+            self._connection = psycopg.connect(self.dsn)
+        try:
+            with self._connection.transaction(), self._connection.cursor() as cursor:
+                for offset in range(0, len(rows), self.ROWS_PER_STATEMENT):
+                    chunk = rows[offset : offset + self.ROWS_PER_STATEMENT]
+                    placeholders = ", ".join(["(%s, %s::jsonb, %s::jsonb)"] * len(chunk))
+                    cursor.execute(
+                        f"INSERT INTO public.prediction_logs (created_at, inputs, outputs) VALUES {placeholders}",
+                        [value for row in chunk for value in row],
+                    )
+                analytics.update_rollups(cursor, rows, "%s", lock=" FOR UPDATE")
+        except psycopg.OperationalError:
+            self._connection.close()
+            raise
+
+    def read_rollups(self, granularity: str, start: int, end: int) -> list[tuple[int, str, Any]]:
+        import psycopg
+
+        with self._read_lock:
+            if self._read_connection is None or self._read_connection.closed:
+                self._read_connection = psycopg.connect(self.dsn, autocommit=True)
+            try:
+                with self._read_connection.cursor() as cursor:
+                    return analytics.read_rollups(cursor, granularity, start, end, "%s")
+            except psycopg.OperationalError:
+                self._read_connection.close()
+                raise
+
+
+class Journal:
+    # Batches are appended to fsync'd segment files before they are sent to
+    # the sink and deleted once the insert commits, so a crash loses at most
+    # the records still in memory; a segment whose insert committed just
+    # before a crash is replayed (at-least-once). Segments are named
+    # <pid>-<seq>.jsonl; those left by dead processes are adopted by renaming
+    # them, which only one live process can win.
+
+    def __init__(self, directory: str, max_segments: int) -> None:
+        self.directory = directory
+        self.max_segments = max_segments
+        self._seq = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _next_path(self) -> str:
+        self._seq += 1
+        return os.path.join(self.directory, f"{os.getpid()}-{time.time_ns()}-{self._seq:06d}.jsonl")
+
+    def append(self, rows: list[Row]) -> str:
+        path = self._next_path()
+        with open(path + ".tmp", "w", encoding="utf-8") as handle:
+            for row in rows:
+                handle.write(json.dumps(row) + "\n")
+            handle.flush()
+            os.fsync(handle.fileno())
+        os.replace(path + ".tmp", path)
+        return path
+
+    @staticmethod
+    def read(path: str) -> list[Row]:
+        with open(path, encoding="utf-8") as handle:
+            return [tuple(json.loads(line)) for line in handle if line.strip()]
+
+    def _segments(self) -> list[str]:
+        names = [name for name in os.listdir(self.directory) if name.endswith(".jsonl")]
+        # <pid>-<ns>-<seq>: order by creation time, then sequence.
+        names.sort(key=lambda name: tuple(int(part) for part in name[: -len(".jsonl")].split("-")[1:]))
+        return [os.path.join(self.directory, name) for name in names]
+
+    def own_segments(self) -> list[str]:
+        prefix = f"{os.getpid()}-"
+        return [path for path in self._segments() if os.path.basename(path).startswith(prefix)]
+
+    def adopt_orphans(self) -> None:
+        for path in self._segments():
+            pid = int(os.path.basename(path).split("-", 1)[0])
+            if pid == os.getpid() or _pid_alive(pid):
+                continue
+            try:
+                os.rename(path, self._next_path())
+            except FileNotFoundError:
+                pass  # another process adopted it first
+
+    def trim(self) -> int:
+        # Oldest segments beyond max_segments are dropped; returns rows lost.
+        segments = self.own_segments()
+        dropped = 0
+        for path in segments[: max(0, len(segments) - self.max_segments)]:
+            dropped += len(self.read(path))
+            os.remove(path)
+        return dropped
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class PredictionLog:
+    # Write-behind log: record() only appends to a bounded in-memory queue
+    # (dropping the oldest record when full) and wakes the flusher once a
+    # batch is ready. The flusher thread journals each batch, then writes
+    # every pending segment to the sink in one transaction per segment. While
+    # the sink is down, batches accumulate as journal segments on disk (up to
+    # max_segments) instead of in memory.
+
+    def __init__(
+        self,
+        sink: Any,
+        journal_dir: str,
+        batch_size: int = 500,
+        flush_interval: float = 1.0,
+        max_pending: int = 10000,
+        max_segments: int = 1000,
+    ) -> None:
+        self.sink = sink
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.journal = Journal(journal_dir, max_segments)
+        self._queue: collections.deque[tuple[float, Any, Any]] = collections.deque(maxlen=max_pending)
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self._pid = 0
+        self._retry_at = 0.0
+
+    @classmethod
+    def from_env(cls) -> PredictionLog | None:
+        url = os.getenv("ML_PREDICTION_LOG_URL")
+        if not url:
+            return None
+        if url.startswith("sqlite:///"):
+            sink: Any = SqliteSink(url[len("sqlite:///") :])
+        elif url.startswith(("postgres://", "postgresql://")):
+            sink = PostgresSink(url)
+        else:
+            raise ValueError(f"Unsupported ML_PREDICTION_LOG_URL scheme: {url}")
+        return cls(
+            sink,
+            os.getenv("ML_PREDICTION_LOG_JOURNAL", "ml/cache/prediction_log_journal"),
+            batch_size=int(os.getenv("ML_PREDICTION_LOG_BATCH", "500")),
+            flush_interval=float(os.getenv("ML_PREDICTION_LOG_FLUSH_SECONDS", "1.0")),
+            max_pending=int(os.getenv("ML_PREDICTION_LOG_MAX_PENDING", "10000")),
+        )
+
+    def record(self, inputs: Any, outputs: Any) -> None:
+        # Called on the request path: no I/O and no serialisation here.
+        if self._pid != os.getpid():
+            self._start()
+        if len(self._queue) == self._queue.maxlen:
+            LOG_RECORDS.inc(result="dropped")
+        self._queue.append((time.time(), inputs, outputs))
+        LOG_RECORDS.inc(result="queued")
+        if len(self._queue) >= self.batch_size:
+            self._wake.set()
+
+    def _start(self) -> None:
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            # A forked worker inherits the parent's queue but not its thread.
+            self._queue.clear()
+            self._stop.clear()
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name="prediction-log", daemon=True)
+            self._thread.start()
+
+    def _drain(self) -> list[Row]:
+        rows = []
+        while self._queue and len(rows) < self.batch_size:
+            created, inputs, outputs = self._queue.popleft()
+            stamp = datetime.fromtimestamp(created, timezone.utc).isoformat()
+            rows.append((stamp, _to_json(inputs), _to_json(outputs)))
+        return rows
+
+    def flush(self) -> None:
+        while self._queue:
+            rows = self._drain()
+            if rows:
+                self.journal.append(rows)
+        dropped = self.journal.trim()
+        if dropped:
+            LOG_RECORDS.inc(dropped, result="dropped")
+        if time.monotonic() < self._retry_at:
+            return
+        for path in self.journal.own_segments():
+            rows = Journal.read(path)
+            try:
+                with STAGE_SECONDS.time(stage="prediction_log_flush"):
+                    self.sink.write(rows)
+            except Exception:
+                logger.warning("Prediction log flush failed; keeping %s for retry.", path, exc_info=True)
+                self._retry_at = time.monotonic() + min(30.0, 5 * self.flush_interval)
+                break
+            os.remove(path)
+            LOG_RECORDS.inc(len(rows), result="written")
+        LOG_BACKLOG.set(len(self._queue), where="memory")
+        LOG_BACKLOG.set(len(self.journal.own_segments()), where="journal_segments")
+
+    def _run(self) -> None:
+        self.journal.adopt_orphans()
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Prediction log flusher error.")
+
+    def close(self) -> None:
+        if self._thread is None or self._pid != os.getpid():
+            return
+        self._stop.set()
+        self._wake.set()
+        self._thread.join(timeout=10)
+        self._retry_at = 0.0
+        self.flush()
@@ -0,0 +1,243 @@
+from __future__ import annotations
+
+import collections
+import itertools
+import os
+import sys
+import threading
+import time
+from typing import Any
+
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import PlainTextResponse
+
+from ml.admin import require_admin
+
+MAX_PROFILE_SECONDS = 300.0
+MAX_STORED_PROFILES = 10
+MIN_INTERVAL_MS = 1.0
+MAX_INTERVAL_MS = 1000.0
+MAX_PROFILE_REQUESTS = 1000
+# An armed request profile that sees no matching request within this long
+# is disarmed; its sampler thread only starts with the first request.
+ARM_TIMEOUT_SECONDS = 600.0
+
+
+class SamplingProfiler:
+    # Wall-clock stack sampler over sys._current_frames(). Output is in the
+    # collapsed-stack format ("root;child;leaf count") read by flamegraph.pl
+    # and speedscope.
+
+    def __init__(self, interval: float = 0.005) -> None:
+        self.interval = interval
+        self.counts: collections.Counter[str] = collections.Counter()
+        self.samples = 0
+        self.sampling_seconds = 0.0
+        self.active = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+
+    @property
+    def started(self) -> bool:
+        return self._thread.ident is not None
+
+    def start(self) -> None:
+        if not self.started:
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self.started:
+            self._thread.join()
+
+    def _run(self) -> None:
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            if not self.active.is_set():
+                continue
+            start = time.perf_counter()
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stack.append(names.get(thread_id, str(thread_id)))
+                self.counts[";".join(reversed(stack))] += 1
+            self.samples += 1
+            self.sampling_seconds += time.perf_counter() - start
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.counts.most_common())
+
+
+class Profile:
+    def __init__(self, profile_id: int, mode: str, interval: float, route: str | None = None, requests: int = 0):
+        self.id = profile_id
+        self.mode = mode
+        self.route = route
+        self.requests_remaining = requests
+        self.in_flight = 0
+        self.status = "running"
+        self.started_at = time.time()
+        self.finished_at: float | None = None
+        self.profiler = SamplingProfiler(interval)
+
+    def finish(self, status: str = "complete") -> None:
+        if self.status != "running":
+            return
+        self.profiler.stop()
+        self.status = status
+        self.finished_at = time.time()
+
+    def expire(self) -> None:
+        # Arming timeout: disarm the route; a request still in flight
+        # finishes the profile when it completes.
+        with _lock:
+            if _armed_routes.get(self.route) is not self:
+                return
+            self.requests_remaining = 0
+            if self.in_flight:
+                return
+            _armed_routes.pop(self.route, None)
+        self.finish("complete" if self.profiler.started else "expired")
+
+    def summary(self) -> dict[str, Any]:
+        return {
+            "id": self.id,
+            "mode": self.mode,
+            "route": self.route,
+            "status": self.status,
+            "requests_remaining": self.requests_remaining,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "samples": self.profiler.samples,
+            "sampler_seconds": round(self.profiler.sampling_seconds, 6),
+        }
+
+
+_lock = threading.Lock()
+_ids = itertools.count(1)
+_profiles: dict[int, Profile] = {}
+_armed_routes: dict[str, Profile] = {}
+
+
+def _store(profile: Profile) -> None:
+    _profiles[profile.id] = profile
+    while len(_profiles) > MAX_STORED_PROFILES:
+        oldest = min(_profiles)
+        if _profiles[oldest].status == "running":
+            break
+        del _profiles[oldest]
+
+
+def start_timed_profile(seconds: float, interval: float = 0.005) -> Profile:
+    with _lock:
+        profile = Profile(next(_ids), "timed", interval)
+        _store(profile)
+    profile.profiler.active.set()
+    profile.profiler.start()
+    timer = threading.Timer(seconds, profile.finish)
+    timer.daemon = True
+    timer.start()
+    return profile
+
+
+def arm_request_profile(route: str, requests: int, interval: float = 0.005) -> Profile:
+    with _lock:
+        if route in _armed_routes:
+            raise ValueError(f"A request profile is already armed for {route}")
+        profile = Profile(next(_ids), "requests", interval, route=route, requests=requests)
+        _store(profile)
+        _armed_routes[route] = profile
+    timer = threading.Timer(ARM_TIMEOUT_SECONDS, profile.expire)
+    timer.daemon = True
+    timer.start()
+    return profile
+
+
+class ProfilingMiddleware:
+    # Pure ASGI middleware: with nothing armed, a request costs one dict
+    # truthiness check before it is passed through untouched.
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if not _armed_routes or scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        with _lock:
+            profile = _armed_routes.get(scope["path"])
+            if profile is not None:
+                if profile.requests_remaining <= 0:
+                    profile = None
+                else:
+                    profile.requests_remaining -= 1
+                    profile.in_flight += 1
+                    profile.profiler.start()
+                    profile.profiler.active.set()
+        if profile is None:
+            await self.app(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            with _lock:
+                profile.in_flight -= 1
+                if profile.in_flight == 0:
+                    profile.profiler.active.clear()
+                    if profile.requests_remaining == 0:
+                        _armed_routes.pop(profile.route, None)
+                        profile.finish()
+
+
+router = APIRouter(prefix="/admin/profile", dependencies=[Depends(require_admin)])
+
+
+def _check_interval(interval_ms: float) -> None:
+    if not MIN_INTERVAL_MS <= interval_ms <= MAX_INTERVAL_MS:
+        raise HTTPException(
+            status_code=422, detail=f"interval_ms must be in [{MIN_INTERVAL_MS}, {MAX_INTERVAL_MS}]"
+        )
+
+
+@router.post("/start")
+def start_profile(seconds: float = 10.0, interval_ms: float = 5.0) -> dict[str, Any]:
+    if not 0 < seconds <= MAX_PROFILE_SECONDS:
+        raise HTTPException(status_code=422, detail=f"seconds must be in (0, {MAX_PROFILE_SECONDS}]")
+    _check_interval(interval_ms)
+    return start_timed_profile(seconds, interval_ms / 1000.0).summary()
+
+
+@router.post("/requests")
+def profile_requests(route: str, count: int = 10, interval_ms: float = 5.0) -> dict[str, Any]:
+    if not 0 < count <= MAX_PROFILE_REQUESTS:
+        raise HTTPException(status_code=422, detail=f"count must be in [1, {MAX_PROFILE_REQUESTS}]")
+    _check_interval(interval_ms)
+    try:
+        return arm_request_profile(route, count, interval_ms / 1000.0).summary()
+    except ValueError as exc:
+        raise HTTPException(status_code=409, detail=str(exc)) from None
+
+
+@router.get("")
+def list_profiles() -> list[dict[str, Any]]:
+    with _lock:
+        return [profile.summary() for profile in _profiles.values()]
+
+
+@router.get("/{profile_id}", response_class=PlainTextResponse)
+def download_profile(profile_id: int) -> PlainTextResponse:
+    profile = _profiles.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail="Unknown profile")
+    if profile.status == "running":
+        raise HTTPException(status_code=409, detail="Profile is still running")
+    return PlainTextResponse(
+        profile.profiler.collapsed(),
+        headers={"Content-Disposition": f'attachment; filename="profile-{profile_id}.collapsed"'},
+    )
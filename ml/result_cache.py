@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+import hashlib
+import mmap
+import multiprocessing
+import os
+import time
+from typing import Iterator
+
+import numpy as np
+
+from ml.metrics import REGISTRY, CallbackMetric
+
+VALUE_BYTES = 512
+WAYS = 4
+MAX_WORKERS = 64
+# Slots when ML_RESULT_CACHE_SLOTS is unset: off under plain uvicorn, where
+# each worker would get a private cache; ml.serve turns it on.
+DEFAULT_SLOTS = 0
+SERVE_DEFAULT_SLOTS = 4096
+
+SLOT_DTYPE = np.dtype([("k0", np.uint64), ("k1", np.uint64), ("expires", np.float64), ("length", np.uint32)])
+STATS_DTYPE = np.dtype([("hits", np.uint64), ("misses", np.uint64)])
+
+
+class CacheBusy(Exception):
+    # The lock was held by another thread or worker; callers count a miss.
+    pass
+
+
+class SharedResultCache:
+    # Set-associative result cache in an anonymous shared mapping. Created in
+    # the parent before the pre-fork launcher forks, every worker sees the
+    # same entries and hit/miss counters. Keys are 128-bit blake2b digests;
+    # values larger than VALUE_BYTES are not cached. get/put are called on
+    # the event loop, so they never wait for the lock.
+
+    def __init__(self, slots: int, ttl_seconds: float) -> None:
+        self.n_sets = max(1, slots // WAYS)
+        self.ttl_seconds = ttl_seconds
+        n_slots = self.n_sets * WAYS
+        meta_bytes = n_slots * SLOT_DTYPE.itemsize
+        stats_bytes = MAX_WORKERS * STATS_DTYPE.itemsize
+        self._buffer = mmap.mmap(-1, meta_bytes + stats_bytes + n_slots * VALUE_BYTES)
+        self._meta = np.ndarray((self.n_sets, WAYS), dtype=SLOT_DTYPE, buffer=self._buffer)
+        self._stats = np.ndarray((MAX_WORKERS,), dtype=STATS_DTYPE, buffer=self._buffer, offset=meta_bytes)
+        self._values = np.ndarray(
+            (self.n_sets, WAYS, VALUE_BYTES),
+            dtype=np.uint8,
+            buffer=self._buffer,
+            offset=meta_bytes + stats_bytes,
+        )
+        self._lock = multiprocessing.Lock()
+        self.worker_index = 0
+
+    @classmethod
+    def from_env(cls) -> SharedResultCache | None:
+        slots = int(os.getenv("ML_RESULT_CACHE_SLOTS", str(DEFAULT_SLOTS)))
+        if slots <= 0:
+            return None
+        return cls(slots, float(os.getenv("ML_RESULT_CACHE_TTL", "300")))
+
+    def _key(self, namespace: str, key: bytes) -> tuple[int, int]:
+        digest = hashlib.blake2b(key, digest_size=16, person=namespace.encode()[:16]).digest()
+        return int.from_bytes(digest[:8], "little"), int.from_bytes(digest[8:], "little")
+
+    def get(self, namespace: str, key: bytes) -> bytes | None:
+        k0, k1 = self._key(namespace, key)
+        row = k0 % self.n_sets
+        if not self._lock.acquire(block=False):
+            raise CacheBusy
+        try:
+            meta = self._meta[row]
+            for way in range(WAYS):
+                if meta["k0"][way] == k0 and meta["k1"][way] == k1 and meta["expires"][way] > time.time():
+                    self._stats["hits"][self.worker_index] += 1
+                    return self._values[row, way, : meta["length"][way]].tobytes()
+            self._stats["misses"][self.worker_index] += 1
+            return None
+        finally:
+            self._lock.release()
+
+    def put(self, namespace: str, key: bytes, value: bytes) -> None:
+        if len(value) > VALUE_BYTES:
+            return
+        k0, k1 = self._key(namespace, key)
+        row = k0 % self.n_sets
+        if not self._lock.acquire(block=False):
+            return  # skipped; the next miss for this key stores it
+        try:
+            meta = self._meta[row]
+            matches = np.flatnonzero((meta["k0"] == k0) & (meta["k1"] == k1))
+            # Reuse the key's own way, else evict the entry closest to expiry.
+            way = int(matches[0]) if len(matches) else int(np.argmin(meta["expires"]))
+            self._values[row, way, : len(value)] = np.frombuffer(value, dtype=np.uint8)
+            meta[way] = (k0, k1, time.time() + self.ttl_seconds, len(value))
+        finally:
+            self._lock.release()
+
+    def stats(self) -> dict[str, float]:
+        hits = int(self._stats["hits"].sum())
+        misses = int(self._stats["misses"].sum())
+        return {"hits": hits, "misses": misses, "hit_rate": hits / (hits + misses) if hits + misses else 0.0}
+
+    def worker_counts(self) -> Iterator[tuple[int, int, int]]:
+        for index, row in enumerate(self._stats):
+            if row["hits"] or row["misses"]:
+                yield index, int(row["hits"]), int(row["misses"])
+
+    def register_metrics(self) -> None:
+        def requests() -> Iterator[tuple[tuple[int, str], int]]:
+            for index, hits, misses in self.worker_counts():
+                yield (index, "hit"), hits
+                yield (index, "miss"), misses
+
+        REGISTRY.register(
+            CallbackMetric(
+                "ml_result_cache_requests_total",
+                "Shared result cache lookups across all workers.",
+                "counter",
+                ("worker", "result"),
+                requests,
+            )
+        )
+        REGISTRY.register(
+            CallbackMetric(
+                "ml_result_cache_hit_ratio",
+                "Shared result cache hit ratio across all workers.",
+                "gauge",
+                (),
+                lambda: [((), self.stats()["hit_rate"])],
+            )
+        )
@@ -0,0 +1,196 @@
+from __future__ import annotations
+
+import os
+import random
+from typing import TYPE_CHECKING, Iterable, NamedTuple
+
+import numpy as np
+
+if TYPE_CHECKING:
+    # Serving only needs the specs and FEATURE_DTYPE; pandas is imported by
+    # the table helpers that use it.
+    import pandas as pd
+
+
+class ColumnSpec(NamedTuple):
+    dtype: str
+    low: float
+    high: float
+
+
+class SchemaError(ValueError):
+    pass
+
+
+SAMPLE_ID = ColumnSpec("int32", 0, np.iinfo(np.int32).max)
+
+# Ranges follow ml/model_output_ranges.md. peak_hour_multiplier is generated
+# in tenths (12-22 == 1.2-2.2), and total_buses is the fixed fleet size.
+SCHEMAS: dict[str, dict[str, ColumnSpec]] = {
+    "weather": {
+        "sample_id": SAMPLE_ID,
+        "temperature_c": ColumnSpec("int8", -10, 50),
+        "humidity": ColumnSpec("int8", 0, 100),
+        "wind_speed_kmh": ColumnSpec("int8", 0, 60),
+        "rainfall_mm": ColumnSpec("int16", 0, 200),
+        "rainfall_last_12_months_mm": ColumnSpec("int16", 0, 3000),
+        "recent_storm_or_flood": ColumnSpec("int8", 0, 1),
+        "aqi": ColumnSpec("int16", 0, 500),
+    },
+    "transportation": {
+        "sample_id": SAMPLE_ID,
+        "buses_operating": ColumnSpec("int16", 120, 280),
+        "total_buses": ColumnSpec("int16", 0, 300),
+        "avg_vehicles_per_hour": ColumnSpec("int16", 3000, 9000),
+        "peak_hour_multiplier": ColumnSpec("int8", 12, 22),
+        "congested_west": ColumnSpec("int8", 0, 1),
+        "congested_south": ColumnSpec("int8", 0, 1),
+        "congested_east": ColumnSpec("int8", 0, 1),
+        "congested_north": ColumnSpec("int8", 0, 1),
+        "congested_central": ColumnSpec("int8", 0, 1),
+    },
+    "agriculture": {
+        "sample_id": SAMPLE_ID,
+        "crop_yield_last_year": ColumnSpec("int8", 50, 110),
+        "current_stock_level": ColumnSpec("int8", 20, 100),
+        "supply_chain_efficiency": ColumnSpec("int8", 50, 100),
+        "import_dependency": ColumnSpec("int8", 5, 40),
+    },
+    "energy": {
+        "sample_id": SAMPLE_ID,
+        "current_usage_mw": ColumnSpec("int16", 600, 1300),
+        "avg_usage_last_year": ColumnSpec("int16", 700, 1100),
+        "peak_demand_mw": ColumnSpec("int16", 900, 1500),
+        "grid_stability": ColumnSpec("int8", 75, 100),
+        "renewable_percentage": ColumnSpec("int8", 10, 40),
+    },
+    "public_services": {
+        "sample_id": SAMPLE_ID,
+        "roads_needing_repair": ColumnSpec("int8", 5, 50),
+        "water_supply_level": ColumnSpec("int8", 20, 100),
+        "sewer_system_health": ColumnSpec("int8", 60, 100),
+        "emergency_response_time": ColumnSpec("int8", 5, 25),
+        "pending_maintenance_tasks": ColumnSpec("int8", 10, 70),
+    },
+}
+
+# Forests split on float32 thresholds, so feature matrices are assembled in
+# float32 directly instead of being converted inside every predict call.
+FEATURE_DTYPE = np.float32
+
+
+def table_dtypes(table: str) -> dict[str, str]:
+    return {column: spec.dtype for column, spec in SCHEMAS[table].items()}
+
+
+def column_spec(column: str) -> ColumnSpec:
+    for columns in SCHEMAS.values():
+        if column in columns:
+            return columns[column]
+    raise KeyError(column)
+
+
+# What generation does with values outside the declared ranges: "warn"
+# reports them and keeps the rows as drawn, "raise" fails, and "clip" moves
+# them onto the bounds. Clipping changes the training distribution, so it is
+# only done on request.
+VIOLATION_MODES = ("warn", "raise", "clip")
+
+
+def violation_mode() -> str:
+    mode = os.getenv("ML_SCHEMA_VIOLATIONS", "warn")
+    if mode not in VIOLATION_MODES:
+        raise ValueError(f"ML_SCHEMA_VIOLATIONS must be one of {', '.join(VIOLATION_MODES)}, got {mode!r}")
+    return mode
+
+
+def range_violations(df: pd.DataFrame, table: str) -> list[str]:
+    problems = []
+    for column, spec in SCHEMAS[table].items():
+        values = df[column]
+        outside = int(((values < spec.low) | (values > spec.high)).sum())
+        if outside:
+            problems.append(
+                f"{column}: {outside} rows outside {spec.low}..{spec.high} (observed {values.min()}..{values.max()})"
+            )
+    return problems
+
+
+def _check_columns(df: pd.DataFrame, table: str) -> None:
+    missing = [column for column in SCHEMAS[table] if column not in df.columns]
+    if missing:
+        raise SchemaError(f"{table} table violates schema: " + "; ".join(f"{column}: missing" for column in missing))
+
+
+def validate(df: pd.DataFrame, table: str) -> None:
+    _check_columns(df, table)
+    problems = range_violations(df, table)
+    if problems:
+        raise SchemaError(f"{table} table violates schema: " + "; ".join(problems))
+
+
+def clip_to_schema(df: pd.DataFrame, table: str) -> pd.DataFrame:
+    for column, spec in SCHEMAS[table].items():
+        if column in df.columns:
+            df[column] = df[column].clip(spec.low, spec.high)
+    return df
+
+
+def apply_schema(df: pd.DataFrame, table: str, on_violation: str = "raise") -> pd.DataFrame:
+    # Validates the rows as generated, then casts to the compact dtypes.
+    if on_violation not in VIOLATION_MODES:
+        raise ValueError(f"on_violation must be one of {', '.join(VIOLATION_MODES)}, got {on_violation!r}")
+    _check_columns(df, table)
+    problems = range_violations(df, table)
+    if problems:
+        message = f"{table} table violates schema: " + "; ".join(problems)
+        if on_violation == "raise":
+            raise SchemaError(message)
+        from ml.logging_setup import get_logger
+
+        if on_violation == "clip":
+            get_logger("ml.schema").warning("%s; clipping to the declared ranges.", message)
+            clip_to_schema(df, table)
+        else:
+            get_logger("ml.schema").warning("%s; keeping the values as generated.", message)
+    # Values kept out of range must still fit the storage dtype; astype
+    # would silently wrap them.
+    for column, spec in SCHEMAS[table].items():
+        info = np.iinfo(spec.dtype)
+        low, high = df[column].min(), df[column].max()
+        if low < info.min or high > info.max:
+            raise SchemaError(f"{table}.{column}: observed {low}..{high} does not fit {spec.dtype}")
+    return df.astype(table_dtypes(table))
+
+
+def read_table(path: str, table: str, **kwargs):
+    import pandas as pd
+
+    return pd.read_csv(path, dtype=table_dtypes(table), **kwargs)
+
+
+def feature_matrix(df: pd.DataFrame, columns: Iterable[str]) -> np.ndarray:
+    return df[list(columns)].to_numpy(dtype=FEATURE_DTYPE)
+
+
+def memory_report(n_rows: int = 200000, seed: int = 0) -> dict[str, int]:
+    import pandas as pd
+
+    from ml.datasets import DATASETS
+
+    rng = random.Random(seed)
+    wide, compact = None, None
+    for name, source in DATASETS.items():
+        df = source.row_generator(n_rows, rng=rng)
+        typed = apply_schema(df.copy(), name, on_violation=violation_mode())
+        wide = df if wide is None else pd.merge(wide, df, on="sample_id", how="inner")
+        compact = typed if compact is None else pd.merge(compact, typed, on="sample_id", how="inner")
+    before = int(wide.memory_usage(deep=True).sum())
+    after = int(compact.memory_usage(deep=True).sum())
+    print(f"Merged frame ({n_rows} rows, {wide.shape[1]} columns): {before / 2**20:.1f} MiB as int64")
+    print(f"Merged frame with schema dtypes: {after / 2**20:.1f} MiB ({before / after:.1f}x smaller)")
+    return {"rows": n_rows, "bytes_before": before, "bytes_after": after}
+
+
+if __name__ == "__main__":
+    memory_report()
@@ -0,0 +1,174 @@
+from __future__ import annotations
+
+import argparse
+import collections
+import os
+import sys
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Iterator, Mapping
+
+import numpy as np
+import pandas as pd
+
+from ml.inference import (
+    CONGESTION_ROUTES,
+    FIELD_COLUMNS,
+    OUTPUT_FIELDS,
+    LoadedModel,
+    load_models,
+    predict_batch,
+    required_columns,
+)
+
+CONGESTED_ROUTES_FIELD = "transportation.busRoutesCongested"
+
+_models: dict[str, LoadedModel | None] = {}
+
+
+def frame_feature_values(df: pd.DataFrame | Mapping[str, Any]) -> dict[str, np.ndarray]:
+    # Vectorised city_feature_row over a DataFrame or a mapping of column
+    # arrays. Columns may be CityInput paths ("weather.currentRainfall") or
+    # model feature names ("rainfall_mm"); numeric columns are passed through
+    # without copying. weather.rainfallLast12Months holds the yearly total
+    # and transportation.busRoutesCongested a ";"- or ","-separated route list.
+    values = {}
+    for field, column in FIELD_COLUMNS.items():
+        source = field if field in df else column
+        if source in df:
+            values[column] = np.asarray(df[source])
+    if CONGESTED_ROUTES_FIELD in df:
+        routes = pd.Series(df[CONGESTED_ROUTES_FIELD]).fillna("").astype(str).str.lower()
+        for route in CONGESTION_ROUTES:
+            values[f"congested_{route}"] = routes.str.contains(rf"\b{route}\b", regex=True).to_numpy(dtype=np.float64)
+    else:
+        for route in CONGESTION_ROUTES:
+            column = f"congested_{route}"
+            if column in df:
+                values[column] = np.asarray(df[column])
+    return values
+
+
+def _init_worker() -> None:
+    global _models
+    _models = load_models()
+
+
+def score_frame(df: pd.DataFrame, models: dict[str, LoadedModel | None] | None = None) -> pd.DataFrame:
+    models = _models if models is None else models
+    values = frame_feature_values(df)
+    missing = required_columns(models) - set(values)
+    if missing:
+        raise ValueError(f"Input is missing model inputs: {', '.join(sorted(missing))}")
+    outputs = predict_batch(models, values, len(df))
+    return pd.DataFrame({OUTPUT_FIELDS[name]: output for name, output in outputs.items()}, index=df.index)
+
+
+def _is_parquet(path: str) -> bool:
+    return path.endswith((".parquet", ".pq"))
+
+
+def _require_pyarrow() -> Any:
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        sys.exit("Parquet input/output needs pyarrow (pip install pyarrow).")
+    return pyarrow
+
+
+def iter_chunks(path: str, chunksize: int) -> Iterator[pd.DataFrame]:
+    if _is_parquet(path):
+        pa = _require_pyarrow()
+        for batch in pa.parquet.ParquetFile(path).iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunksize)
+
+
+class ChunkWriter:
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._parquet_writer = None
+        self._wrote_header = False
+
+    def write(self, frame: pd.DataFrame) -> None:
+        if _is_parquet(self.path):
+            pa = _require_pyarrow()
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            if self._parquet_writer is None:
+                self._parquet_writer = pa.parquet.ParquetWriter(self.path, table.schema)
+            self._parquet_writer.write_table(table)
+        else:
+            frame.to_csv(self.path, mode="a" if self._wrote_header else "w", header=not self._wrote_header, index=False)
+            self._wrote_header = True
+
+    def close(self) -> None:
+        if self._parquet_writer is not None:
+            self._parquet_writer.close()
+
+
+def score_file(
+    input_path: str,
+    output_path: str,
+    chunksize: int = 100000,
+    workers: int = 0,
+    keep: tuple[str, ...] = (),
+) -> dict[str, float]:
+    # Chunks stream through a process pool with at most 2 * workers chunks in
+    # flight and are written back in input order, so memory stays bounded by
+    # the chunk size whatever the input length. workers=0 scores in-process.
+    writer = ChunkWriter(output_path)
+    pending: collections.deque[tuple[pd.DataFrame, Future | pd.DataFrame]] = collections.deque()
+    rows = 0
+    start = time.perf_counter()
+
+    def drain(limit: int) -> None:
+        nonlocal rows
+        while len(pending) > limit:
+            kept, result = pending.popleft()
+            scored = result.result() if isinstance(result, Future) else result
+            writer.write(pd.concat([kept, scored], axis=1) if len(kept.columns) else scored)
+            rows += len(scored)
+            elapsed = time.perf_counter() - start
+            print(f"\r{rows:,} rows  {rows / elapsed:,.0f} rows/s", end="", file=sys.stderr, flush=True)
+
+    pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) if workers > 0 else None
+    if pool is None:
+        _init_worker()
+    try:
+        for chunk in iter_chunks(input_path, chunksize):
+            missing = [column for column in keep if column not in chunk.columns]
+            if missing:
+                raise ValueError(f"--keep columns not in input: {', '.join(missing)}")
+            kept = chunk[list(keep)]
+            if pool is None:
+                pending.append((kept, score_frame(chunk)))
+            else:
+                pending.append((kept, pool.submit(score_frame, chunk)))
+            drain(2 * workers)
+        drain(0)
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+        writer.close()
+    elapsed = time.perf_counter() - start
+    print(file=sys.stderr)
+    return {"rows": rows, "seconds": elapsed, "rows_per_second": rows / elapsed if elapsed > 0 else 0.0}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Score a CSV/Parquet of CityInput rows with the six models.")
+    parser.add_argument("input", help="CSV or Parquet (.parquet/.pq) with CityInput fields or model feature columns")
+    parser.add_argument("output", help="CSV or Parquet file for the six outputs")
+    parser.add_argument("--chunksize", type=int, default=100000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="scoring processes; 0 = in-process")
+    parser.add_argument("--keep", default="", help="comma-separated input columns copied to the output, e.g. an id")
+    args = parser.parse_args()
+
+    keep = tuple(column for column in args.keep.split(",") if column)
+    try:
+        stats = score_file(args.input, args.output, args.chunksize, args.workers, keep)
+    except ValueError as exc:
+        sys.exit(str(exc))
+    print(f"Scored {stats['rows']:,} rows in {stats['seconds']:.1f}s ({stats['rows_per_second']:,.0f} rows/s)")
@@ -0,0 +1,63 @@
+from __future__ import annotations
+
+from typing import Mapping, Sequence
+
+import numpy as np
+
+from ml.inference import FALLBACK_OUTPUTS, MODEL_NAMES, LoadedModel, feature_matrix, predict_outputs
+from ml.schema import column_spec
+
+MAX_GRID_POINTS = 20000
+
+
+def is_binary_column(column: str) -> bool:
+    try:
+        spec = column_spec(column)
+    except KeyError:
+        return False
+    return spec.low == 0 and spec.high == 1
+
+
+def grid_values(column: str, low: float, high: float, steps: int) -> np.ndarray:
+    # 0/1 flags (recent_storm_or_flood) only ever take their two levels in
+    # serving, so they are swept over [0, 1] instead of interpolated.
+    if is_binary_column(column):
+        return np.array([0.0, 1.0])
+    return np.linspace(low, high, steps)
+
+
+def partial_dependence(
+    models: Mapping[str, LoadedModel | None],
+    base_row: Mapping[str, float],
+    grids: Sequence[tuple[str, np.ndarray]],
+) -> tuple[dict[str, float], list[dict[str, np.ndarray]]]:
+    # grids holds (feature column, values) pairs. Each model is evaluated
+    # once: the base row followed by every grid point of the columns it
+    # consumes. Curves for columns a model ignores are its base prediction.
+    base: dict[str, float] = {}
+    curves: list[dict[str, np.ndarray]] = [{} for _ in grids]
+    for name in MODEL_NAMES:
+        model = models.get(name)
+        if model is None:
+            base[name] = FALLBACK_OUTPUTS[name]
+            for curve, (_, values) in zip(curves, grids):
+                curve[name] = np.full(len(values), FALLBACK_OUTPUTS[name])
+            continue
+
+        spans: dict[int, slice] = {}
+        offset = 1
+        for index, (column, values) in enumerate(grids):
+            if column in model.feature_columns:
+                spans[index] = slice(offset, offset + len(values))
+                offset += len(values)
+        X = feature_matrix(model.feature_columns, base_row, offset)
+        for index, span in spans.items():
+            column, values = grids[index]
+            X[span, model.feature_columns.index(column)] = values
+
+        predictions = predict_outputs(model, X)
+        base[name] = float(predictions[0])
+        for index, (curve, (_, values)) in enumerate(zip(curves, grids)):
+            span = spans.get(index)
+            curve[name] = predictions[span] if span is not None else np.full(len(values), predictions[0])
+    return base, curves
@@ -0,0 +1,191 @@
+from __future__ import annotations
+
+import argparse
+import gc
+import multiprocessing
+import os
+import signal
+import socket
+import time
+from typing import Any, Iterator
+
+from ml.logging_setup import get_logger
+from ml.metrics import REGISTRY, CallbackMetric
+
+logger = get_logger("ml.serve")
+
+MEMORY_FIELDS = {
+    "Rss": "rss",
+    "Pss": "pss",
+    "Private_Clean": "private",
+    "Private_Dirty": "private",
+}
+
+
+def process_memory(pid: int) -> dict[str, int]:
+    # PSS splits pages shared copy-on-write with the parent across every
+    # process mapping them, so summing it over workers gives the real total.
+    memory = {"rss": 0, "pss": 0, "private": 0}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as handle:
+            for line in handle:
+                name, _, rest = line.partition(":")
+                if name in MEMORY_FIELDS:
+                    memory[MEMORY_FIELDS[name]] += int(rest.split()[0]) * 1024
+    except (OSError, ValueError):
+        pass
+    return memory
+
+
+def _bind(host: str, port: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _run_worker(index: int, sock: socket.socket, log_level: str) -> None:
+    import uvicorn
+
+    from ml import api_server
+
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    if api_server.result_cache is not None:
+        api_server.result_cache.worker_index = index
+    config = uvicorn.Config(api_server.app, log_level=log_level, access_log=False)
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def _spawn(index: int, sock: socket.socket, pids: Any, log_level: str) -> int:
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            _run_worker(index, sock, log_level)
+        except BaseException:
+            logger.exception("Worker %d crashed.", index)
+            code = 1
+        finally:
+            os._exit(code)
+    pids[index] = pid
+    return pid
+
+
+def _register_memory_metrics(pids: Any) -> None:
+    parent = os.getpid()
+
+    def memory() -> Iterator[tuple[tuple[str, str, str], int]]:
+        processes = [("parent", parent)]
+        processes += [(str(index), pid) for index, pid in enumerate(pids) if pid]
+        for worker, pid in processes:
+            for kind, value in process_memory(pid).items():
+                yield (worker, str(pid), kind), value
+
+    REGISTRY.register(
+        CallbackMetric(
+            "ml_worker_memory_bytes",
+            "Memory of the pre-fork parent and each worker (rss, pss, private).",
+            "gauge",
+            ("worker", "pid", "kind"),
+            memory,
+        )
+    )
+
+
+def _report(pids: Any, cache: Any) -> None:
+    mib = 1024 * 1024
+    for index, pid in enumerate(pids):
+        if pid:
+            memory = process_memory(pid)
+            logger.info(
+                "worker %d pid=%d rss=%.1fMiB pss=%.1fMiB private=%.1fMiB",
+                index,
+                pid,
+                memory["rss"] / mib,
+                memory["pss"] / mib,
+                memory["private"] / mib,
+            )
+    if cache is not None:
+        stats = cache.stats()
+        logger.info(
+            "result cache hits=%d misses=%d hit_rate=%.1f%%",
+            stats["hits"],
+            stats["misses"],
+            stats["hit_rate"] * 100.0,
+        )
+
+
+def serve(host: str, port: int, workers: int, report_interval: float = 60.0, log_level: str = "warning") -> None:
+    # Every model is loaded in the parent before the workers are forked, so
+    # the forests are shared copy-on-write instead of being unpickled once
+    # per process as with `uvicorn --workers`.
+    from ml.result_cache import SERVE_DEFAULT_SLOTS
+
+    # The shared result cache is created at import, before the fork.
+    os.environ.setdefault("ML_RESULT_CACHE_SLOTS", str(SERVE_DEFAULT_SLOTS))
+    from ml import api_server
+
+    api_server.load_serving_state()
+    sock = _bind(host, port)
+    pids = multiprocessing.Array("q", workers, lock=False)
+    _register_memory_metrics(pids)
+    # Keep the collector from touching (and so copying) the imported objects.
+    gc.collect()
+    gc.freeze()
+
+    for index in range(workers):
+        _spawn(index, sock, pids, log_level)
+    logger.info("Serving on %s:%d with %d pre-forked workers.", host, port, workers)
+
+    stopping = False
+
+    def stop(signum: int, frame: Any) -> None:
+        nonlocal stopping
+        stopping = True
+        for pid in pids:
+            if pid:
+                os.kill(pid, signal.SIGTERM)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    next_report = time.monotonic() + report_interval
+    while True:
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            break
+        if pid:
+            index = pids[:].index(pid)
+            pids[index] = 0
+            if not stopping:
+                logger.warning("Worker %d (pid %d) exited with status %d; restarting.", index, pid, status)
+                _spawn(index, sock, pids, log_level)
+            continue
+        if report_interval > 0 and time.monotonic() >= next_report:
+            _report(pids, api_server.result_cache)
+            next_report += report_interval
+        time.sleep(0.2)
+    sock.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Pre-fork multi-process server for the ML API.")
+    parser.add_argument("--host", default=os.getenv("ML_SERVE_HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("ML_SERVE_PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=int(os.getenv("ML_SERVE_WORKERS", str(os.cpu_count() or 1))))
+    parser.add_argument("--report-interval", type=float, default=60.0, help="seconds between memory/cache log lines")
+    parser.add_argument("--log-level", default="warning", help="uvicorn log level")
+    args = parser.parse_args()
+    from ml.result_cache import MAX_WORKERS
+
+    if not 1 <= args.workers <= MAX_WORKERS:
+        parser.error(f"--workers must be between 1 and {MAX_WORKERS}")
+    serve(args.host, args.port, args.workers, args.report_interval, args.log_level)
+
+
+if __name__ == "__main__":
+    main()
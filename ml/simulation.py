@@ -0,0 +1,219 @@
+from __future__ import annotations
+
+import argparse
+import time
+from typing import Mapping, NamedTuple, Sequence
+
+import numpy as np
+
+from ml.inference import FALLBACK_OUTPUTS, MODEL_NAMES, LoadedModel, feature_matrix, load_models, predict_outputs
+from ml.schema import FEATURE_DTYPE, column_spec
+
+# Columns recorded per tick alongside the six model outputs.
+STATE_COLUMNS = (
+    "water_supply_level",
+    "current_stock_level",
+    "pending_maintenance_tasks",
+    "rainfall_mm",
+    "rainfall_last_12_months_mm",
+    "recent_storm_or_flood",
+)
+
+# Matches /current-weather, which flags a storm above 40 mm of rain.
+STORM_RAINFALL_MM = 40.0
+
+
+class SimulationConfig(NamedTuple):
+    days: int = 365
+    wet_day_probability: float = 0.3
+    # Supply points gained per mm of rain and lost per point of predicted
+    # water shortage.
+    water_refill_per_mm: float = 0.1
+    water_drain_per_shortage: float = 0.01
+    # Stock points restocked per day at 100% supply chain efficiency and
+    # consumed per day at a 0% food price change (scaled by 1 + change/100).
+    stock_restock: float = 1.4
+    stock_consumption: float = 1.0
+    # New maintenance tasks per point of cleanup probability, extra tasks on
+    # storm days, and tasks crews close per day.
+    maintenance_per_cleanup: float = 0.02
+    maintenance_per_storm: float = 5.0
+    maintenance_completed: float = 2.0
+
+
+class Event(NamedTuple):
+    # Scripted change to a feature column for days [start_day, start_day + days).
+    # value overrides the column, delta is added each day; scenarios limits
+    # the event to those scenario indices.
+    column: str
+    start_day: int
+    days: int = 1
+    value: float | None = None
+    delta: float | None = None
+    scenarios: Sequence[int] | None = None
+
+
+class SimulationResult(NamedTuple):
+    outputs: dict[str, np.ndarray]  # model name -> (days, scenarios)
+    state: dict[str, np.ndarray]  # STATE_COLUMNS -> (days, scenarios)
+
+
+def default_initial_state() -> dict[str, float]:
+    # Mid-range values of every model feature, in the units models train on.
+    columns = {column for name in MODEL_NAMES for column in _domain_columns(name)}
+    return {column: (column_spec(column).low + column_spec(column).high) / 2.0 for column in columns}
+
+
+def _domain_columns(name: str) -> tuple[str, ...]:
+    from ml.domains import DOMAINS
+
+    return DOMAINS[name].feature_columns
+
+
+def _apply_events(state: dict[str, np.ndarray], events: Sequence[Event], day: int) -> None:
+    for event in events:
+        if not event.start_day <= day < event.start_day + event.days:
+            continue
+        target = slice(None) if event.scenarios is None else np.asarray(event.scenarios)
+        if event.value is not None:
+            state[event.column][target] = event.value
+        if event.delta is not None:
+            state[event.column][target] += event.delta
+
+
+def _unique_rows(X: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    # Viewing each row as one opaque value is ~5x faster than np.unique(axis=0).
+    rows = np.ascontiguousarray(X).view(np.dtype((np.void, X.dtype.itemsize * X.shape[1]))).ravel()
+    _, index, inverse = np.unique(rows, return_index=True, return_inverse=True)
+    return X[index], inverse.reshape(-1)
+
+
+def simulate(
+    models: Mapping[str, LoadedModel | None],
+    initial: Mapping[str, float | np.ndarray],
+    n_scenarios: int,
+    config: SimulationConfig = SimulationConfig(),
+    events: Sequence[Event] = (),
+    seed: int | None = None,
+) -> SimulationResult:
+    # All scenarios advance in lock-step: every tick is one batched predict
+    # per model over n_scenarios rows. A model whose inputs did not change
+    # since the previous tick reuses its previous outputs.
+    rng = np.random.default_rng(seed)
+    state = {
+        column: np.broadcast_to(np.asarray(value, dtype=np.float64), (n_scenarios,)).copy()
+        for column, value in initial.items()
+    }
+    annual_rain = state["rainfall_last_12_months_mm"].copy()
+    wet_day_mean = annual_rain / 365.0 / config.wet_day_probability
+
+    outputs = {name: np.empty((config.days, n_scenarios), dtype=FEATURE_DTYPE) for name in MODEL_NAMES}
+    history = {column: np.empty((config.days, n_scenarios), dtype=FEATURE_DTYPE) for column in STATE_COLUMNS}
+    previous: dict[str, tuple[np.ndarray, np.ndarray]] = {}
+
+    for day in range(config.days):
+        wet = rng.random(n_scenarios) < config.wet_day_probability
+        state["rainfall_mm"] = np.where(wet, rng.exponential(wet_day_mean), 0.0)
+        state["recent_storm_or_flood"] = np.zeros(n_scenarios)
+        _apply_events(state, events, day)
+        # Derived after events so scripted rain counts towards both.
+        state["rainfall_last_12_months_mm"] += state["rainfall_mm"] - state["rainfall_last_12_months_mm"] / 365.0
+        state["recent_storm_or_flood"] = np.maximum(
+            state["recent_storm_or_flood"], state["rainfall_mm"] > STORM_RAINFALL_MM
+        )
+
+        predicted = {}
+        for name in MODEL_NAMES:
+            model = models.get(name)
+            if model is None:
+                predicted[name] = np.full(n_scenarios, FALLBACK_OUTPUTS[name])
+                outputs[name][day] = predicted[name]
+                continue
+            X = feature_matrix(model.feature_columns, state, n_scenarios)
+            last = previous.get(name)
+            if last is not None and np.array_equal(last[0], X):
+                predicted[name] = last[1]
+            else:
+                # Scenarios often share identical rows (dry days leave most
+                # inputs at their base values), so score each distinct row once.
+                unique, inverse = _unique_rows(X)
+                predicted[name] = predict_outputs(model, unique)[inverse]
+                previous[name] = (X, predicted[name])
+            outputs[name][day] = predicted[name]
+        for column in STATE_COLUMNS:
+            history[column][day] = state[column]
+
+        # Tomorrow's state from today's predictions.
+        state["water_supply_level"] = np.clip(
+            state["water_supply_level"]
+            + config.water_refill_per_mm * state["rainfall_mm"]
+            - config.water_drain_per_shortage * predicted["water"],
+            0.0,
+            100.0,
+        )
+        state["current_stock_level"] = np.clip(
+            state["current_stock_level"]
+            + config.stock_restock * state["supply_chain_efficiency"] / 100.0
+            - config.stock_consumption * (1.0 + predicted["food"] / 100.0),
+            0.0,
+            100.0,
+        )
+        state["pending_maintenance_tasks"] = np.maximum(
+            state["pending_maintenance_tasks"]
+            + config.maintenance_per_cleanup * predicted["public"]
+            + config.maintenance_per_storm * state["recent_storm_or_flood"]
+            - config.maintenance_completed,
+            0.0,
+        )
+    return SimulationResult(outputs, history)
+
+
+def summarize(series: np.ndarray, quantiles: Sequence[float] = (0.1, 0.5, 0.9)) -> dict[str, np.ndarray]:
+    # Per-day mean and quantiles across scenarios of a (days, scenarios) array.
+    summary = {"mean": series.mean(axis=1, dtype=np.float64)}
+    for q, values in zip(quantiles, np.quantile(series, quantiles, axis=1)):
+        summary[f"p{round(q * 100)}"] = values
+    return summary
+
+
+def _parse_event(text: str) -> Event:
+    # column:start_day:days:value, or a leading + / - on the value for a delta.
+    column, start_day, days, amount = text.split(":")
+    if amount[0] in "+-":
+        return Event(column, int(start_day), int(days), delta=float(amount))
+    return Event(column, int(start_day), int(days), value=float(amount))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Roll the six models forward over many scenarios.")
+    parser.add_argument("--scenarios", type=int, default=1000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--wet-day-probability", type=float, default=SimulationConfig().wet_day_probability)
+    parser.add_argument("--set", action="append", default=[], metavar="COLUMN=VALUE", help="initial feature value")
+    parser.add_argument(
+        "--event",
+        action="append",
+        default=[],
+        metavar="COLUMN:START:DAYS:VALUE",
+        help="scripted event; prefix VALUE with + or - to add a daily delta instead of overriding",
+    )
+    args = parser.parse_args()
+
+    initial = default_initial_state()
+    for item in args.set:
+        column, value = item.split("=", 1)
+        if column not in initial:
+            parser.error(f"Unknown feature column {column}")
+        initial[column] = float(value)
+    events = [_parse_event(text) for text in args.event]
+
+    models = load_models()
+    config = SimulationConfig(days=args.days, wet_day_probability=args.wet_day_probability)
+    start = time.perf_counter()
+    result = simulate(models, initial, args.scenarios, config, events, seed=args.seed)
+    elapsed = time.perf_counter() - start
+    print(f"Simulated {args.scenarios} scenarios x {args.days} days in {elapsed:.2f}s")
+    for label, series in list(result.outputs.items()) + list(result.state.items()):
+        final = summarize(series[-1:])
+        print(f"{label:28s} " + " ".join(f"{key}={values[0]:9.2f}" for key, values in final.items()))
@@ -0,0 +1,205 @@
+from __future__ import annotations
+
+import argparse
+import hashlib
+import itertools
+import json
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any
+
+import numpy as np
+
+from ml.datasets import ensure_dataset, hash_sample_ids, iter_merged_chunks
+from ml.domains import DOMAINS, Domain, get_domain, load_label_function
+from ml.schema import feature_matrix
+
+SWEEP_CACHE_DIR = "ml/cache/sweeps"
+SWEEP_RESULTS_PATH = "ml/sweeps/results.sqlite"
+
+DEFAULT_GRID: dict[str, list[Any]] = {
+    "n_estimators": [50, 100, 200],
+    "max_depth": [None, 12, 20],
+    "min_samples_leaf": [1, 5],
+}
+
+LATENCY_REPEATS = 50
+
+
+def _cache_key(domain: Domain, n_folds: int) -> str:
+    digest = hashlib.sha1()
+    digest.update(f"{domain.name}:{n_folds}:{','.join(domain.feature_columns)}".encode())
+    for name in domain.sources:
+        stat = os.stat(ensure_dataset(name))
+        digest.update(f"{name}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+    return digest.hexdigest()[:16]
+
+
+def prepare_fold_cache(
+    domain: Domain,
+    n_folds: int = 5,
+    cache_dir: str = SWEEP_CACHE_DIR,
+    chunksize: int = 200000,
+) -> str:
+    path = os.path.join(cache_dir, domain.name, _cache_key(domain, n_folds))
+    if os.path.exists(os.path.join(path, "folds.npy")):
+        return path
+    os.makedirs(path, exist_ok=True)
+    label_fn = load_label_function(domain)
+    features, labels, folds = [], [], []
+    for chunk in iter_merged_chunks(domain.sources, chunksize):
+        features.append(feature_matrix(chunk, domain.feature_columns))
+        labels.append(chunk.apply(label_fn, axis=1).to_numpy())
+        hashed = hash_sample_ids(chunk["sample_id"].to_numpy())
+        folds.append(((hashed * np.uint64(n_folds)) >> np.uint64(32)).astype(np.int8))
+    np.save(os.path.join(path, "X.npy"), np.concatenate(features))
+    np.save(os.path.join(path, "y.npy"), np.concatenate(labels))
+    # folds.npy is written last and marks the cache entry as complete.
+    np.save(os.path.join(path, "folds.npy"), np.concatenate(folds))
+    return path
+
+
+def expand_grid(grid: dict[str, list[Any]]) -> list[dict[str, Any]]:
+    keys = sorted(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[key] for key in keys))]
+
+
+def _score(task: str, y_true: np.ndarray, y_pred: np.ndarray) -> float:
+    if task == "classification":
+        return float((y_true == y_pred).mean())
+    return float(np.abs(y_true - y_pred).mean())
+
+
+def run_trial(domain_name: str, cache_path: str, params: dict[str, Any]) -> dict[str, Any]:
+    from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
+
+    domain = get_domain(domain_name)
+    X = np.load(os.path.join(cache_path, "X.npy"), mmap_mode="r")
+    y = np.load(os.path.join(cache_path, "y.npy"), mmap_mode="r")
+    folds = np.load(os.path.join(cache_path, "folds.npy"), mmap_mode="r")
+    estimator_cls = RandomForestClassifier if domain.task == "classification" else RandomForestRegressor
+
+    fit_seconds, latencies, batch_rates, scores = [], [], [], []
+    for fold in np.unique(folds):
+        test_mask = folds == fold
+        # n_jobs=1: the process pool is the only source of parallelism, so
+        # cpu_cap bounds the total cores used by the sweep.
+        model = estimator_cls(random_state=42, n_jobs=1, **params)
+        start = time.perf_counter()
+        model.fit(X[~test_mask], y[~test_mask])
+        fit_seconds.append(time.perf_counter() - start)
+
+        X_test = np.ascontiguousarray(X[test_mask])
+        start = time.perf_counter()
+        y_pred = model.predict(X_test)
+        batch_rates.append(len(X_test) / max(time.perf_counter() - start, 1e-9))
+        scores.append(_score(domain.task, np.asarray(y[test_mask]), y_pred))
+
+        single_row = X_test[:1]
+        timings = []
+        for _ in range(LATENCY_REPEATS):
+            start = time.perf_counter()
+            model.predict(single_row)
+            timings.append(time.perf_counter() - start)
+        latencies.append(float(np.median(timings)))
+
+    return {
+        "domain": domain_name,
+        "params": params,
+        "folds": len(fit_seconds),
+        "fit_seconds": float(np.mean(fit_seconds)),
+        "predict_latency_ms": float(np.mean(latencies)) * 1000.0,
+        "predict_rows_per_second": float(np.mean(batch_rates)),
+        "score_name": "accuracy" if domain.task == "classification" else "mae",
+        "score": float(np.mean(scores)),
+    }
+
+
+def _open_results(path: str) -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.execute(
+        """
+        create table if not exists sweep_results (
+            run_id text not null,
+            domain text not null,
+            params text not null,
+            folds integer not null,
+            fit_seconds real not null,
+            predict_latency_ms real not null,
+            predict_rows_per_second real not null,
+            score_name text not null,
+            score real not null,
+            created_at text default current_timestamp
+        )
+        """
+    )
+    return conn
+
+
+def run_sweep(
+    domain_names: list[str],
+    grid: dict[str, list[Any]] | None = None,
+    n_folds: int = 5,
+    cpu_cap: int | None = None,
+    results_path: str = SWEEP_RESULTS_PATH,
+) -> list[dict[str, Any]]:
+    grid = grid or DEFAULT_GRID
+    cpu_cap = cpu_cap or int(os.getenv("SWEEP_CPU_CAP", os.cpu_count() or 1))
+    run_id = time.strftime("%Y%m%dT%H%M%S")
+    cache_paths = {name: prepare_fold_cache(get_domain(name), n_folds=n_folds) for name in domain_names}
+    trials = [(name, params) for name in domain_names for params in expand_grid(grid)]
+    print(f"Sweep {run_id}: {len(trials)} trials on {cpu_cap} processes")
+
+    results = []
+    conn = _open_results(results_path)
+    try:
+        with ProcessPoolExecutor(max_workers=min(cpu_cap, len(trials))) as pool:
+            futures = [pool.submit(run_trial, name, cache_paths[name], params) for name, params in trials]
+            for future in as_completed(futures):
+                result = future.result()
+                results.append(result)
+                conn.execute(
+                    "insert into sweep_results (run_id, domain, params, folds, fit_seconds, predict_latency_ms,"
+                    " predict_rows_per_second, score_name, score) values (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (
+                        run_id,
+                        result["domain"],
+                        json.dumps(result["params"], sort_keys=True),
+                        result["folds"],
+                        result["fit_seconds"],
+                        result["predict_latency_ms"],
+                        result["predict_rows_per_second"],
+                        result["score_name"],
+                        result["score"],
+                    ),
+                )
+                conn.commit()
+                print(
+                    f"{result['domain']} {result['params']}: {result['score_name']}={result['score']:.3f} "
+                    f"fit={result['fit_seconds']:.2f}s latency={result['predict_latency_ms']:.2f}ms"
+                )
+    finally:
+        conn.close()
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Cross-validated hyperparameter sweep over the domain forests.")
+    parser.add_argument("domains", nargs="*", help=f"subset of {sorted(DOMAINS)}; defaults to all")
+    parser.add_argument("--folds", type=int, default=5)
+    parser.add_argument("--cpu-cap", type=int)
+    parser.add_argument("--grid", help="JSON object mapping parameter names to candidate lists")
+    parser.add_argument("--results", default=SWEEP_RESULTS_PATH)
+    args = parser.parse_args()
+    grid = json.loads(args.grid) if args.grid else None
+    domain_names = args.domains or sorted(DOMAINS)
+    for name in domain_names:
+        get_domain(name)
+    run_sweep(domain_names, grid=grid, n_folds=args.folds, cpu_cap=args.cpu_cap, results_path=args.results)
+
+
+if __name__ == "__main__":
+    main()
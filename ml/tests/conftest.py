@@ -0,0 +1,43 @@
+from __future__ import annotations
+
+import sqlite3
+
+import pytest
+
+from ml.prediction_log import SqliteSink
+
+
+class FlakySink:
+    # Wraps a sink and fails the next `failures` writes.
+
+    def __init__(self, sink: SqliteSink, failures: int = 0) -> None:
+        self.sink = sink
+        self.failures = failures
+        self.batches: list[int] = []
+
+    def write(self, rows: list) -> None:
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("sink unavailable")
+        self.sink.write(rows)
+        self.batches.append(len(rows))
+
+
+@pytest.fixture
+def sqlite_sink(tmp_path) -> SqliteSink:
+    return SqliteSink(str(tmp_path / "prediction_log.db"))
+
+
+@pytest.fixture
+def journal_dir(tmp_path) -> str:
+    return str(tmp_path / "journal")
+
+
+def logged_inputs(sink: SqliteSink) -> list[str]:
+    connection = sqlite3.connect(sink.path)
+    try:
+        return [row[0] for row in connection.execute("SELECT inputs FROM prediction_logs ORDER BY id")]
+    except sqlite3.OperationalError:
+        return []  # table not created yet
+    finally:
+        connection.close()
@@ -0,0 +1,34 @@
+from __future__ import annotations
+
+import numpy as np
+import pytest
+
+from ml.inference import MODEL_NAMES
+from ml.optimizer import Control, Objective, optimize
+
+
+def test_budget_repair_keeps_interventions_in_bounds():
+    # Base value above the control's range: pulling over-budget candidates back
+    # toward it used to push them past `high`.
+    models = {name: None for name in MODEL_NAMES}
+    controls = [Control("aqi", 50.0, 100.0, 1.0), Control("buses_operating", 0.0, 500.0, 1.0)]
+    result = optimize(
+        models,
+        {"aqi": 165.0, "buses_operating": 240.0},
+        controls,
+        [Objective(MODEL_NAMES[0])],
+        budget=66.0,
+        population=64,
+        generations=5,
+        top_k=10,
+        seed=0,
+    )
+    low = np.array([control.low for control in controls])
+    high = np.array([control.high for control in controls])
+    assert np.all((result.values >= low) & (result.values <= high))
+    assert np.allclose(result.costs, np.abs(result.values - [165.0, 240.0]).sum(axis=1))
+
+
+def test_negative_budget_is_rejected():
+    with pytest.raises(ValueError):
+        optimize({}, {"aqi": 165.0}, [Control("aqi", 50.0, 100.0, 1.0)], [Objective(MODEL_NAMES[0])], budget=-1.0)
@@ -0,0 +1,96 @@
+from __future__ import annotations
+
+import json
+import os
+import subprocess
+import sys
+import time
+
+from ml.prediction_log import LOG_RECORDS, Journal, PredictionLog
+from ml.tests.conftest import FlakySink, logged_inputs
+
+
+def wait_for(condition, timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.01)
+    return condition()
+
+
+def test_flushes_a_full_batch_in_one_insert(sqlite_sink, journal_dir):
+    sink = FlakySink(sqlite_sink)
+    log = PredictionLog(sink, journal_dir, batch_size=5, flush_interval=60.0)
+    try:
+        for i in range(5):
+            log.record({"i": i}, {"out": i})
+        assert wait_for(lambda: len(logged_inputs(sqlite_sink)) == 5)
+        assert sink.batches == [5]
+        assert logged_inputs(sqlite_sink) == [json.dumps({"i": i}) for i in range(5)]
+    finally:
+        log.close()
+
+
+def test_flushes_a_partial_batch_on_the_interval(sqlite_sink, journal_dir):
+    log = PredictionLog(sqlite_sink, journal_dir, batch_size=1000, flush_interval=0.05)
+    try:
+        for i in range(3):
+            log.record({"i": i}, {"out": i})
+        assert wait_for(lambda: len(logged_inputs(sqlite_sink)) == 3)
+    finally:
+        log.close()
+
+
+def test_full_queue_drops_the_oldest_records(sqlite_sink, journal_dir):
+    log = PredictionLog(sqlite_sink, journal_dir, batch_size=1000, flush_interval=60.0, max_pending=3)
+    dropped = LOG_RECORDS.value(result="dropped")
+    for i in range(5):
+        log.record({"i": i}, {"out": i})
+    assert LOG_RECORDS.value(result="dropped") - dropped == 2
+    log.close()
+    assert logged_inputs(sqlite_sink) == [json.dumps({"i": i}) for i in (2, 3, 4)]
+
+
+def test_failed_flush_keeps_the_segment_and_retries_it(sqlite_sink, journal_dir):
+    sink = FlakySink(sqlite_sink, failures=1)
+    log = PredictionLog(sink, journal_dir, batch_size=1000, flush_interval=60.0)
+    # Queued directly: flush() is driven by the test, not the flusher thread.
+    log._queue.extend((time.time(), {"i": i}, {"out": i}) for i in range(4))
+
+    log.flush()
+    segments = log.journal.own_segments()
+    assert len(segments) == 1
+    assert len(Journal.read(segments[0])) == 4
+    assert logged_inputs(sqlite_sink) == []
+
+    # Still inside the back-off window: nothing is retried yet.
+    log.flush()
+    assert sink.batches == []
+    assert log.journal.own_segments() == segments
+
+    log._retry_at = 0.0
+    log.flush()
+    assert sink.batches == [4]
+    assert log.journal.own_segments() == []
+    assert logged_inputs(sqlite_sink) == [json.dumps({"i": i}) for i in range(4)]
+
+
+def test_adopts_and_replays_a_dead_process_segment(sqlite_sink, journal_dir):
+    child = subprocess.run([sys.executable, "-c", "import os; print(os.getpid())"], capture_output=True, text=True)
+    dead_pid = int(child.stdout)
+    os.makedirs(journal_dir, exist_ok=True)
+    orphan = os.path.join(journal_dir, f"{dead_pid}-{time.time_ns()}-000001.jsonl")
+    rows = [("2026-01-01T00:00:00+00:00", json.dumps({"i": i}), json.dumps({"out": i})) for i in range(3)]
+    with open(orphan, "w", encoding="utf-8") as handle:
+        handle.writelines(json.dumps(row) + "\n" for row in rows)
+
+    log = PredictionLog(sqlite_sink, journal_dir, batch_size=1000, flush_interval=60.0)
+    assert log.journal.own_segments() == []
+    log.journal.adopt_orphans()
+    assert not os.path.exists(orphan)
+    assert len(log.journal.own_segments()) == 1
+
+    log.flush()
+    assert log.journal.own_segments() == []
+    assert logged_inputs(sqlite_sink) == [row[1] for row in rows]
@@ -0,0 +1,14 @@
+from __future__ import annotations
+
+import numpy as np
+
+from ml.inference import FALLBACK_OUTPUTS, MODEL_NAMES
+from ml.simulation import SimulationConfig, default_initial_state, simulate
+
+
+def test_missing_models_report_their_fallback_outputs():
+    models = {name: None for name in MODEL_NAMES}
+    result = simulate(models, default_initial_state(), 50, SimulationConfig(days=5), seed=0)
+    for name in MODEL_NAMES:
+        assert result.outputs[name].shape == (5, 50)
+        assert np.array_equal(result.outputs[name], np.full((5, 50), FALLBACK_OUTPUTS[name], dtype=np.float32))
@@ -6,7 +6,9 @@ from sklearn.ensemble import RandomForestRegressor
 from sklearn.metrics import mean_absolute_error, r2_score
 from sklearn.model_selection import train_test_split
 
+from ml.domains import ENERGY_FEATURES
 from ml.generate_energy_data import build_energy_dataset
+from ml.schema import read_table
 from ml.weather_data_pipeline import build_weather_dataset
 
 
@@ -17,8 +19,8 @@ def load_or_create_dataset() -> pd.DataFrame:
         build_energy_dataset(output_path=energy_path)
     if not os.path.exists(weather_path):
         build_weather_dataset(output_path=weather_path)
-    energy = pd.read_csv(energy_path)
-    weather = pd.read_csv(weather_path)
+    energy = read_table(energy_path, "energy")
+    weather = read_table(weather_path, "weather")
     df = pd.merge(energy, weather, on="sample_id", how="inner")
     return df
 
@@ -43,14 +45,7 @@ def compute_energy_price_change(row: pd.Series) -> float:
 def train_energy_price_model() -> RandomForestRegressor:
     df = load_or_create_dataset()
     df["price_change_percent"] = df.apply(compute_energy_price_change, axis=1)
-    feature_columns = [
-        "current_usage_mw",
-        "avg_usage_last_year",
-        "peak_demand_mw",
-        "grid_stability",
-        "renewable_percentage",
-        "recent_storm_or_flood",
-    ]
+    feature_columns = list(ENERGY_FEATURES)
     X = df[feature_columns]
     y = df["price_change_percent"]
     X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
@@ -6,8 +6,10 @@ from sklearn.ensemble import RandomForestRegressor
 from sklearn.metrics import mean_absolute_error, r2_score
 from sklearn.model_selection import train_test_split
 
+from ml.domains import FOOD_FEATURES
 from ml.generate_agriculture_data import build_agriculture_dataset
 from ml.generate_public_services_data import build_public_services_dataset
+from ml.schema import read_table
 from ml.weather_data_pipeline import build_weather_dataset
 
 
@@ -21,9 +23,9 @@ def load_or_create_dataset() -> pd.DataFrame:
         build_agriculture_dataset(output_path=agriculture_path)
     if not os.path.exists(public_path):
         build_public_services_dataset(output_path=public_path)
-    weather = pd.read_csv(weather_path)
-    agriculture = pd.read_csv(agriculture_path)
-    public = pd.read_csv(public_path)
+    weather = read_table(weather_path, "weather")
+    agriculture = read_table(agriculture_path, "agriculture")
+    public = read_table(public_path, "public_services")
     df = pd.merge(weather, agriculture, on="sample_id", how="inner")
     df = pd.merge(df, public, on="sample_id", how="inner")
     return df
@@ -64,15 +66,7 @@ def compute_food_price_change(row: pd.Series) -> float:
 def train_food_price_model() -> RandomForestRegressor:
     df = load_or_create_dataset()
     df["price_change_percent"] = df.apply(compute_food_price_change, axis=1)
-    feature_columns = [
-        "rainfall_mm",
-        "rainfall_last_12_months_mm",
-        "crop_yield_last_year",
-        "current_stock_level",
-        "supply_chain_efficiency",
-        "import_dependency",
-        "recent_storm_or_flood",
-    ]
+    feature_columns = list(FOOD_FEATURES)
     X = df[feature_columns]
     y = df["price_change_percent"]
     X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
@@ -0,0 +1,200 @@
+from __future__ import annotations
+
+import argparse
+import math
+import os
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
+
+from ml.datasets import count_rows, ensure_dataset, hash_sample_ids, iter_merged_chunks
+from ml.domains import DOMAINS, Domain, get_domain, load_label_function
+from ml.drift import write_profile
+
+
+def is_test_row(sample_ids: np.ndarray, test_fraction: float) -> np.ndarray:
+    return hash_sample_ids(sample_ids) < np.uint64(int(test_fraction * 2**32))
+
+
+def plan_trees_per_chunk(n_estimators: int, n_chunks: int) -> np.ndarray:
+    # Spread the ensemble evenly over the chunks. With more chunks than trees,
+    # evenly spaced chunks get one tree each, so the merged forest (and RSS)
+    # never grows past n_estimators trees however many rows are streamed.
+    slots = (np.arange(n_estimators) * n_chunks) // n_estimators
+    return np.bincount(slots, minlength=n_chunks)
+
+
+def _new_forest(domain: Domain, n_estimators: int, random_state: int, n_jobs: int):
+    if domain.task == "classification":
+        return RandomForestClassifier(n_estimators=n_estimators, random_state=random_state, n_jobs=n_jobs)
+    return RandomForestRegressor(n_estimators=n_estimators, random_state=random_state, n_jobs=n_jobs)
+
+
+def _label_chunk(chunk: pd.DataFrame, label_fn) -> np.ndarray:
+    return chunk.apply(label_fn, axis=1).to_numpy()
+
+
+def fit_chunked_forest(
+    domain: Domain,
+    chunksize: int = 200000,
+    n_estimators: int = 200,
+    test_fraction: float = 0.2,
+    random_state: int = 42,
+    n_jobs: int = -1,
+):
+    label_fn = load_label_function(domain)
+    feature_columns = list(domain.feature_columns)
+    total_rows = count_rows(ensure_dataset(domain.sources[0]))
+    n_chunks = max(1, math.ceil(total_rows / chunksize))
+    trees_per_chunk = plan_trees_per_chunk(n_estimators, n_chunks)
+
+    forest = None
+    carried_trees = 0
+    for index, chunk in enumerate(iter_merged_chunks(domain.sources, chunksize)):
+        if index >= n_chunks:
+            break
+        n_trees = int(trees_per_chunk[index]) + carried_trees
+        if n_trees == 0:
+            continue
+        train_mask = ~is_test_row(chunk["sample_id"].to_numpy(), test_fraction)
+        train_rows = chunk.loc[train_mask]
+        del chunk
+        X = train_rows[feature_columns]
+        y = _label_chunk(train_rows, label_fn)
+        del train_rows
+        if domain.classes and set(np.unique(y)) != set(domain.classes):
+            # Trees from a chunk missing a class cannot be merged into the
+            # ensemble; hand its share of trees to the next chunk instead.
+            carried_trees = n_trees
+            print(f"Chunk {index + 1}/{n_chunks}: missing classes, deferring {n_trees} trees")
+            continue
+        carried_trees = 0
+        sub_forest = _new_forest(domain, n_trees, random_state + index, n_jobs)
+        sub_forest.fit(X, y)
+        del X, y
+        if forest is None:
+            forest = sub_forest
+        else:
+            forest.estimators_.extend(sub_forest.estimators_)
+            forest.n_estimators = len(forest.estimators_)
+        print(f"Chunk {index + 1}/{n_chunks}: {forest.n_estimators} trees")
+
+    if carried_trees:
+        print(f"Dropped {carried_trees} trees: no later chunk contained every class")
+    if forest is None:
+        raise ValueError(f"No training rows found for domain {domain.name!r}")
+    return forest
+
+
+def evaluate_chunked(
+    forest,
+    domain: Domain,
+    chunksize: int = 200000,
+    test_fraction: float = 0.2,
+) -> dict[str, float]:
+    label_fn = load_label_function(domain)
+    feature_columns = list(domain.feature_columns)
+    n = 0
+    abs_error = 0.0
+    squared_error = 0.0
+    y_sum = 0.0
+    y_sq_sum = 0.0
+    classes = list(getattr(forest, "classes_", []))
+    confusion = np.zeros((len(classes), len(classes)), dtype=np.int64)
+    for chunk in iter_merged_chunks(domain.sources, chunksize):
+        test_mask = is_test_row(chunk["sample_id"].to_numpy(), test_fraction)
+        if not test_mask.any():
+            continue
+        test_rows = chunk.loc[test_mask]
+        y = _label_chunk(test_rows, label_fn)
+        y_pred = forest.predict(test_rows[feature_columns])
+        n += len(y)
+        if domain.task == "classification":
+            true_idx = np.searchsorted(classes, y)
+            pred_idx = np.searchsorted(classes, y_pred)
+            np.add.at(confusion, (true_idx, pred_idx), 1)
+        else:
+            y = y.astype(np.float64)
+            abs_error += float(np.abs(y - y_pred).sum())
+            squared_error += float(((y - y_pred) ** 2).sum())
+            y_sum += float(y.sum())
+            y_sq_sum += float((y**2).sum())
+
+    if n == 0:
+        return {"rows": 0}
+    if domain.task == "classification":
+        tp = np.diag(confusion).astype(np.float64)
+        support = confusion.sum(axis=1).astype(np.float64)
+        predicted = confusion.sum(axis=0).astype(np.float64)
+        precision = np.divide(tp, predicted, out=np.zeros_like(tp), where=predicted > 0)
+        recall = np.divide(tp, support, out=np.zeros_like(tp), where=support > 0)
+        denom = precision + recall
+        f1 = np.divide(2 * precision * recall, denom, out=np.zeros_like(tp), where=denom > 0)
+        if len(classes) == 2:
+            f1_score = float(f1[1])
+        else:
+            f1_score = float((f1 * support).sum() / support.sum())
+        return {"rows": n, "accuracy": float(tp.sum() / n), "f1": f1_score}
+    total_variance = y_sq_sum - (y_sum**2) / n
+    r2 = 1.0 - squared_error / total_variance if total_variance > 0 else 0.0
+    return {"rows": n, "mae": abs_error / n, "r2": r2}
+
+
+def train_out_of_core(
+    domain_name: str,
+    chunksize: int = 200000,
+    n_estimators: int = 200,
+    test_fraction: float = 0.2,
+    random_state: int = 42,
+    n_jobs: int = -1,
+    evaluate: bool = True,
+    output_path: str | None = None,
+):
+    domain = get_domain(domain_name)
+    forest = fit_chunked_forest(
+        domain,
+        chunksize=chunksize,
+        n_estimators=n_estimators,
+        test_fraction=test_fraction,
+        random_state=random_state,
+        n_jobs=n_jobs,
+    )
+    if evaluate:
+        scores = evaluate_chunked(forest, domain, chunksize=chunksize, test_fraction=test_fraction)
+        for key, value in scores.items():
+            print(f"{domain.name.capitalize()} model (out-of-core) {key}: {value:.3f}")
+    model_path = output_path or domain.model_path
+    os.makedirs(os.path.dirname(model_path), exist_ok=True)
+    joblib.dump(forest, model_path)
+    print(f"Saved {domain.name} model to {model_path}")
+    print(f"Saved {domain.name} input profile to {write_profile(domain, chunksize, model_path)}")
+    return forest
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Train a domain forest by streaming dataset chunks from disk.")
+    parser.add_argument("domain", choices=sorted(DOMAINS))
+    parser.add_argument("--chunksize", type=int, default=200000)
+    parser.add_argument("--n-estimators", type=int, default=200)
+    parser.add_argument("--test-fraction", type=float, default=0.2)
+    parser.add_argument("--random-state", type=int, default=42)
+    parser.add_argument("--n-jobs", type=int, default=-1)
+    parser.add_argument("--no-eval", action="store_true")
+    parser.add_argument("--output")
+    args = parser.parse_args()
+    train_out_of_core(
+        args.domain,
+        chunksize=args.chunksize,
+        n_estimators=args.n_estimators,
+        test_fraction=args.test_fraction,
+        random_state=args.random_state,
+        n_jobs=args.n_jobs,
+        evaluate=not args.no_eval,
+        output_path=args.output,
+    )
+
+
+if __name__ == "__main__":
+    main()
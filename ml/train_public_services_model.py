@@ -6,7 +6,9 @@ from sklearn.ensemble import RandomForestClassifier
 from sklearn.metrics import accuracy_score, f1_score
 from sklearn.model_selection import train_test_split
 
+from ml.domains import PUBLIC_FEATURES
 from ml.generate_public_services_data import build_public_services_dataset
+from ml.schema import read_table
 from ml.weather_data_pipeline import build_weather_dataset
 
 
@@ -17,8 +19,8 @@ def load_or_create_dataset() -> pd.DataFrame:
         build_weather_dataset(output_path=weather_path)
     if not os.path.exists(public_path):
         build_public_services_dataset(output_path=public_path)
-    weather = pd.read_csv(weather_path)
-    public = pd.read_csv(public_path)
+    weather = read_table(weather_path, "weather")
+    public = read_table(public_path, "public_services")
     df = pd.merge(weather, public, on="sample_id", how="inner")
     return df
 
@@ -43,14 +45,7 @@ def compute_cleanup_needed(row: pd.Series) -> int:
 def train_public_services_model() -> RandomForestClassifier:
     df = load_or_create_dataset()
     df["cleanup_needed"] = df.apply(compute_cleanup_needed, axis=1)
-    feature_columns = [
-        "roads_needing_repair",
-        "water_supply_level",
-        "sewer_system_health",
-        "emergency_response_time",
-        "pending_maintenance_tasks",
-        "recent_storm_or_flood",
-    ]
+    feature_columns = list(PUBLIC_FEATURES)
     X = df[feature_columns]
     y = df["cleanup_needed"]
 
@@ -6,8 +6,10 @@ from sklearn.ensemble import RandomForestRegressor
 from sklearn.metrics import mean_absolute_error, r2_score
 from sklearn.model_selection import train_test_split
 
+from ml.domains import TRAFFIC_FEATURES
 from ml.generate_transportation_data import build_transportation_dataset
 from ml.generate_public_services_data import build_public_services_dataset
+from ml.schema import read_table
 from ml.weather_data_pipeline import build_weather_dataset
 
 
@@ -21,9 +23,9 @@ def load_or_create_dataset() -> pd.DataFrame:
         build_transportation_dataset(output_path=transport_path)
     if not os.path.exists(public_path):
         build_public_services_dataset(output_path=public_path)
-    weather = pd.read_csv(weather_path)
-    transport = pd.read_csv(transport_path)
-    public = pd.read_csv(public_path)
+    weather = read_table(weather_path, "weather")
+    transport = read_table(transport_path, "transportation")
+    public = read_table(public_path, "public_services")
     df = pd.merge(weather, transport, on="sample_id", how="inner")
     df = pd.merge(df, public, on="sample_id", how="inner")
     return df
@@ -83,21 +85,7 @@ def compute_congestion_label(row: pd.Series) -> float:
 def train_traffic_model() -> RandomForestRegressor:
     df = load_or_create_dataset()
     df["congestion_level"] = df.apply(compute_congestion_label, axis=1)
-    feature_columns = [
-        "wind_speed_kmh",
-        "rainfall_mm",
-        "recent_storm_or_flood",
-        "aqi",
-        "buses_operating",
-        "avg_vehicles_per_hour",
-        "peak_hour_multiplier",
-        "congested_west",
-        "congested_south",
-        "congested_east",
-        "congested_north",
-        "congested_central",
-        "roads_needing_repair",
-    ]
+    feature_columns = list(TRAFFIC_FEATURES)
     X = df[feature_columns]
     y = df["congestion_level"]
     X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
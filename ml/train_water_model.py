@@ -6,7 +6,9 @@ from sklearn.ensemble import RandomForestRegressor
 from sklearn.metrics import mean_absolute_error, r2_score
 from sklearn.model_selection import train_test_split
 
+from ml.domains import WATER_FEATURES
 from ml.generate_public_services_data import build_public_services_dataset
+from ml.schema import read_table
 from ml.weather_data_pipeline import build_weather_dataset
 
 
@@ -17,8 +19,8 @@ def load_or_create_dataset() -> pd.DataFrame:
         build_weather_dataset(output_path=weather_path)
     if not os.path.exists(public_path):
         build_public_services_dataset(output_path=public_path)
-    weather = pd.read_csv(weather_path)
-    public = pd.read_csv(public_path)
+    weather = read_table(weather_path, "weather")
+    public = read_table(public_path, "public_services")
     df = pd.merge(weather, public, on="sample_id", how="inner")
     return df
 
@@ -40,12 +42,7 @@ def compute_water_shortage_level(row: pd.Series) -> float:
 def train_water_model() -> RandomForestRegressor:
     df = load_or_create_dataset()
     df["shortage_level"] = df.apply(compute_water_shortage_level, axis=1)
-    feature_columns = [
-        "rainfall_last_12_months_mm",
-        "rainfall_mm",
-        "recent_storm_or_flood",
-        "water_supply_level",
-    ]
+    feature_columns = list(WATER_FEATURES)
     X = df[feature_columns]
     y = df["shortage_level"]
     X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
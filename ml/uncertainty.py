@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+from typing import Callable, Mapping, Sequence
+
+import numpy as np
+
+from ml.inference import (
+    FALLBACK_OUTPUTS,
+    MODEL_NAMES,
+    LoadedModel,
+    feature_matrix,
+    per_tree_outputs,
+    predict_outputs,
+)
+
+MAX_SAMPLES = 200000
+CHUNK_ROWS = 8192
+
+# column -> sampler(rng, n) returning an (n,) array
+Sampler = Callable[[np.random.Generator, int], np.ndarray]
+
+
+class StreamingQuantiles:
+    # Mergeable quantile sketch: values are folded into at most
+    # max_centroids weighted centroids of equal rank width, so memory stays
+    # bounded however many chunks are pushed through. Rank error is about
+    # 1 / max_centroids.
+
+    def __init__(self, max_centroids: int = 2048) -> None:
+        self.max_centroids = max_centroids
+        self.means = np.empty(0)
+        self.weights = np.empty(0)
+        self.count = 0
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.low = np.inf
+        self.high = -np.inf
+
+    def update(self, values: np.ndarray) -> None:
+        values = np.asarray(values, dtype=np.float64)
+        self.count += len(values)
+        self.total += float(values.sum())
+        self.total_sq += float(np.square(values).sum())
+        self.low = min(self.low, float(values.min(initial=np.inf)))
+        self.high = max(self.high, float(values.max(initial=-np.inf)))
+        self._fold(np.concatenate([self.means, values]), np.concatenate([self.weights, np.ones(len(values))]))
+
+    def merge(self, other: StreamingQuantiles) -> None:
+        self.count += other.count
+        self.total += other.total
+        self.total_sq += other.total_sq
+        self.low = min(self.low, other.low)
+        self.high = max(self.high, other.high)
+        self._fold(np.concatenate([self.means, other.means]), np.concatenate([self.weights, other.weights]))
+
+    def _fold(self, means: np.ndarray, weights: np.ndarray) -> None:
+        order = np.argsort(means, kind="stable")
+        means, weights = means[order], weights[order]
+        if len(means) > self.max_centroids:
+            cumulative = np.cumsum(weights)
+            bucket = ((cumulative - weights / 2) / cumulative[-1] * self.max_centroids).astype(np.int64)
+            bucket_weights = np.bincount(bucket, weights, minlength=self.max_centroids)
+            bucket_sums = np.bincount(bucket, weights * means, minlength=self.max_centroids)
+            keep = bucket_weights > 0
+            means, weights = bucket_sums[keep] / bucket_weights[keep], bucket_weights[keep]
+        self.means, self.weights = means, weights
+
+    def quantiles(self, qs: Sequence[float]) -> np.ndarray:
+        if self.count == 0:
+            return np.full(len(qs), np.nan)
+        ranks = np.cumsum(self.weights) - self.weights / 2
+        estimates = np.interp(np.asarray(qs) * self.count, ranks, self.means)
+        return np.clip(estimates, self.low, self.high)
+
+    def mean(self) -> float:
+        return self.total / self.count if self.count else float("nan")
+
+    def std(self) -> float:
+        if not self.count:
+            return float("nan")
+        return float(np.sqrt(max(self.total_sq / self.count - self.mean() ** 2, 0.0)))
+
+
+def normal_sampler(mean: float, std: float, low: float | None = None, high: float | None = None) -> Sampler:
+    def sample(rng: np.random.Generator, n: int) -> np.ndarray:
+        values = rng.normal(mean, std, n)
+        return np.clip(values, low, high) if low is not None or high is not None else values
+
+    return sample
+
+
+def uniform_sampler(low: float, high: float) -> Sampler:
+    return lambda rng, n: rng.uniform(low, high, n)
+
+
+def bernoulli_sampler(p: float) -> Sampler:
+    return lambda rng, n: (rng.random(n) < p).astype(np.float64)
+
+
+def monte_carlo(
+    models: Mapping[str, LoadedModel | None],
+    base_row: Mapping[str, float],
+    samplers: Mapping[str, Sampler],
+    n_samples: int,
+    seed: int | None = None,
+    tree_variance: bool = False,
+) -> tuple[dict[str, StreamingQuantiles], dict[str, float]]:
+    # Samples are drawn and scored CHUNK_ROWS at a time; only the quantile
+    # sketches and running sums outlive a chunk. Models that consume none of
+    # the sampled columns are scored once on the base row.
+    rng = np.random.default_rng(seed)
+    sketches = {name: StreamingQuantiles() for name in MODEL_NAMES}
+    tree_sums = {name: 0.0 for name in MODEL_NAMES}
+    constants: dict[str, tuple[float, float]] = {}
+    for name in MODEL_NAMES:
+        model = models.get(name)
+        if model is None:
+            constants[name] = (FALLBACK_OUTPUTS[name], 0.0)
+        elif not set(samplers) & set(model.feature_columns):
+            X = feature_matrix(model.feature_columns, base_row)
+            spread = float(per_tree_outputs(model, X).var(axis=0)[0]) if tree_variance else 0.0
+            constants[name] = (float(predict_outputs(model, X)[0]), spread)
+
+    remaining = n_samples
+    while remaining > 0:
+        n_rows = min(CHUNK_ROWS, remaining)
+        values = dict(base_row)
+        for column, sampler in samplers.items():
+            values[column] = sampler(rng, n_rows)
+        for name in MODEL_NAMES:
+            if name in constants:
+                output, spread = constants[name]
+                sketches[name].update(np.full(n_rows, output))
+                tree_sums[name] += spread * n_rows
+                continue
+            model = models[name]
+            X = feature_matrix(model.feature_columns, values, n_rows)
+            sketches[name].update(predict_outputs(model, X))
+            if tree_variance:
+                tree_sums[name] += float(per_tree_outputs(model, X).var(axis=0).sum())
+        remaining -= n_rows
+
+    return sketches, {name: total / n_samples for name, total in tree_sums.items()}
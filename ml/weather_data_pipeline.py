@@ -5,6 +5,8 @@ from typing import Optional, Tuple
 import pandas as pd
 import requests
 
+from ml.schema import apply_schema, violation_mode
+
 
 def _get_env(key: str, default: Optional[str] = None) -> Optional[str]:
     value = os.getenv(key)
@@ -13,8 +15,12 @@ def _get_env(key: str, default: Optional[str] = None) -> Optional[str]:
     return value
 
 
+def _openweather_base_url() -> str:
+    return (_get_env("OPENWEATHER_BASE_URL", "https://api.openweathermap.org") or "").rstrip("/")
+
+
 def fetch_openweather_sample(api_key: str, city: str) -> Tuple[float, float, float, float, float]:
-    url = "https://api.openweathermap.org/data/2.5/weather"
+    url = f"{_openweather_base_url()}/data/2.5/weather"
     params = {"q": city, "appid": api_key, "units": "metric"}
     response = requests.get(url, params=params, timeout=10)
     response.raise_for_status()
@@ -31,7 +37,7 @@ def fetch_openweather_sample(api_key: str, city: str) -> Tuple[float, float, flo
 
 
 def fetch_openweather_aqi(api_key: str, lat: float, lon: float) -> float:
-    url = "https://api.openweathermap.org/data/2.5/air_pollution"
+    url = f"{_openweather_base_url()}/data/2.5/air_pollution"
     params = {"lat": lat, "lon": lon, "appid": api_key}
     response = requests.get(url, params=params, timeout=10)
     if not response.ok:
@@ -53,19 +59,22 @@ def generate_synthetic_weather_rows(
     base_wind_speed: float = 10.0,
     base_rainfall: float = 2.0,
     base_aqi: float = 120.0,
+    rng: Optional[random.Random] = None,
+    start_id: int = 0,
 ) -> pd.DataFrame:
+    rng = random if rng is None else rng
     rows = []
     for i in range(n_rows):
-        temperature = random.gauss(base_temperature, 5.0)
-        humidity = max(10.0, min(100.0, random.gauss(base_humidity, 15.0)))
-        wind_speed = max(0.0, random.gauss(base_wind_speed, 4.0))
-        rainfall = max(0.0, random.gauss(base_rainfall, 10.0))
-        aqi = max(20.0, random.gauss(base_aqi, 40.0))
+        temperature = rng.gauss(base_temperature, 5.0)
+        humidity = max(10.0, min(100.0, rng.gauss(base_humidity, 15.0)))
+        wind_speed = max(0.0, rng.gauss(base_wind_speed, 4.0))
+        rainfall = max(0.0, rng.gauss(base_rainfall, 10.0))
+        aqi = max(20.0, rng.gauss(base_aqi, 40.0))
         recent_storm = 1 if rainfall > 40.0 else 0
-        total_rainfall_12m = max(400.0, random.gauss(1500.0, 400.0))
+        total_rainfall_12m = max(400.0, rng.gauss(1500.0, 400.0))
         rows.append(
             {
-                "sample_id": i,
+                "sample_id": start_id + i,
                 "temperature_c": int(round(temperature)),
                 "humidity": int(round(humidity)),
                 "wind_speed_kmh": int(round(wind_speed)),
@@ -105,6 +114,7 @@ def build_weather_dataset(n_rows: int = 200000, output_path: str = "ml/data/weat
         base_rainfall=base_rainfall,
         base_aqi=base_aqi,
     )
+    df = apply_schema(df, "weather", on_violation=violation_mode())
     df.to_csv(output_path, index=False)
     return df
 
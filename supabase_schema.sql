@@ -47,6 +47,23 @@ create policy "Admins can insert logs"
   on prediction_logs for insert
   with check ( exists ( select 1 from profiles where id = auth.uid() and role = 'admin' ) );
 
+-- Hourly/daily rollups of prediction_logs outputs, maintained by the ML
+-- service in the same transaction as its inserts (state is a mergeable
+-- count/sum/min/max/quantile sketch).
+create table public.prediction_output_rollups (
+  granularity text not null check (granularity in ('hour', 'day')),
+  bucket_start bigint not null, -- Unix seconds, UTC
+  output text not null,
+  state jsonb,
+  primary key (granularity, bucket_start, output)
+);
+
+alter table public.prediction_output_rollups enable row level security;
+
+create policy "Admins can view output rollups"
+  on prediction_output_rollups for select
+  using ( exists ( select 1 from profiles where id = auth.uid() and role = 'admin' ) );
+
 -- 3. Create Reports Table
 create table public.reports (
   id uuid default uuid_generate_v4() primary key,